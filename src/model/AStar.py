@@ -1,66 +1,712 @@
+import heapq
+from math import inf, sqrt
+
+import numpy as np
+
 from model.Geometry import Point
-from model.Map import Map, Biomes
 from model.Perlin import Perlin
 
-class Node:
-    def __init__(self, position, parent=None):
-        self.position = position
-        self.parent = parent
-        self.g = 0
-        self.h = 0
-        self.f = 0
+SQRT2 = sqrt(2)
+MAX_EXPANSIONS = 20000 # Nodes expanded before giving up, an unreachable target would explore the whole world
+JUMP_MARGIN = 32 # Cells around the start and the end where jump point search can go, as many as A* has in a search box
+JUMP_MIN_DISTANCE = 16 # Cells between the start and the end under which A* is faster than building the jump point search
+JUMP_MIN_SHARE = 0.5 # Walkable cells of the jump point search area that must cost the same, the others being expanded as in A*
+
+# (dx, dy, cost), straight moves first
+NEIGHBORS = [(0, -1, 1), (0, 1, 1), (-1, 0, 1), (1, 0, 1), (-1, -1, SQRT2), (-1, 1, SQRT2), (1, -1, SQRT2), (1, 1, SQRT2)]
+
+class Obstacles:
+    # Movement costs of the cells of the map, inf for the blocked ones, built chunk by chunk when the search reaches them
+    __slots__ = ["map", "profile", "allowed_ids", "chunks", "arrays", "terrain", "pathfinders"]
+
+    def __init__(self, map, profile = "walk", allowed_structures = ()) -> None:
+        self.map = map
+        self.profile = profile # Movement profile of the map giving the cost of each biome
+        # Structures that can be walked through, such as the one the human goes to
+        self.allowed_ids = [map.occupancy.ids[structure] for structure in allowed_structures if structure in map.occupancy.ids]
+        self.chunks = {} # {(x, y) (chunk coords): [[float]]}
+        self.arrays = {} # {(x, y) (chunk coords): float array}, the same costs for the vectorized searches
+        self.terrain = {} # {(x, y) (chunk coords): [[bool]]}, cells blocked by their biome whatever the structures on them
+        self.pathfinders = {} # {(min x, min y, max x, max y): GridPathfinder}, reused by the searches in the same bounds
+
+    def get_chunk(self, chunk_x, chunk_y):
+        chunk = self.chunks.get((chunk_x, chunk_y), None)
+        if chunk is None:
+            costs = self.map.get_cost_chunk((chunk_x, chunk_y), self.profile)
+            self.terrain[(chunk_x, chunk_y)] = np.isinf(costs).tolist()
+            grid = self.map.occupancy.chunks.get((chunk_x, chunk_y), None)
+            if grid is not None:
+                occupied = grid != 0
+                for structure_id in self.allowed_ids:
+                    occupied &= grid != structure_id
+                costs = np.where(occupied, np.inf, costs)
+            chunk = costs.tolist()
+            self.chunks[(chunk_x, chunk_y)] = chunk
+            self.arrays[(chunk_x, chunk_y)] = costs
+        return chunk
+
+    def get_array(self, chunk_x, chunk_y):
+        self.get_chunk(chunk_x, chunk_y)
+        return self.arrays[(chunk_x, chunk_y)]
+
+    def forget_chunk(self, chunk_coords):
+        self.chunks.pop(chunk_coords, None)
+        self.arrays.pop(chunk_coords, None)
+        self.terrain.pop(chunk_coords, None)
+        chunk_x, chunk_y = chunk_coords
+        for bounds in list(self.pathfinders.keys()):
+            if bounds[0] // Perlin.CHUNK_SIZE <= chunk_x <= bounds[2] // Perlin.CHUNK_SIZE and bounds[1] // Perlin.CHUNK_SIZE <= chunk_y <= bounds[3] // Perlin.CHUNK_SIZE:
+                del self.pathfinders[bounds]
+
+    def get_cost(self, x, y):
+        return self.get_chunk(x // Perlin.CHUNK_SIZE, y // Perlin.CHUNK_SIZE)[x % Perlin.CHUNK_SIZE][y % Perlin.CHUNK_SIZE]
+
+    def is_blocked(self, x, y):
+        return self.get_chunk(x // Perlin.CHUNK_SIZE, y // Perlin.CHUNK_SIZE)[x % Perlin.CHUNK_SIZE][y % Perlin.CHUNK_SIZE] == inf
+
+    def is_terrain_blocked(self, x, y):
+        # Blocked by the biome, not only by a structure
+        self.get_chunk(x // Perlin.CHUNK_SIZE, y // Perlin.CHUNK_SIZE)
+        return self.terrain[(x // Perlin.CHUNK_SIZE, y // Perlin.CHUNK_SIZE)][x % Perlin.CHUNK_SIZE][y % Perlin.CHUNK_SIZE]
+
+def octile(x1, y1, x2, y2):
+    dx = abs(x1 - x2)
+    dy = abs(y1 - y2)
+    return dx + dy + (SQRT2 - 2) * min(dx, dy)
+
+def get_neighbors(x, y, obstacles, bounds = None, ends = ()):
+    # Walkable neighbors (cell, cost) of a cell, inside the bounds (min x, min y, max x, max y) if any.
+    # The cost of a move is its length times the cost of the cell it enters.
+    # The cells in ends are walkable when a structure blocks them, not when their biome does
+    neighbors = []
+    for dx, dy, cost in NEIGHBORS:
+        neighbor_x = x + dx
+        neighbor_y = y + dy
+        if bounds is not None and (neighbor_x < bounds[0] or neighbor_y < bounds[1] or neighbor_x > bounds[2] or neighbor_y > bounds[3]):
+            continue
+        neighbor = (neighbor_x, neighbor_y)
+        cell_cost = obstacles.get_cost(neighbor_x, neighbor_y)
+        if cell_cost == inf:
+            if neighbor not in ends or obstacles.is_terrain_blocked(neighbor_x, neighbor_y):
+                continue
+            cell_cost = 1
+        # No corner cutting: both cells along a diagonal must be free
+        if dx != 0 and dy != 0 and (obstacles.is_blocked(neighbor_x, y) or obstacles.is_blocked(x, neighbor_y)):
+            continue
+        neighbors.append((neighbor, cost * cell_cost))
+    return neighbors
+
+def rebuild_path(parents, cell):
+    path = []
+    while cell is not None:
+        path.append(cell)
+        cell = parents[cell]
+    return path[::-1]
+
+def get_path_cost(cells, obstacles = None):
+    # Length of a path of neighbor cells, weighted by the cost of the cells it enters if obstacles are given
+    cost = 0
+    for (x1, y1), (x2, y2) in zip(cells, cells[1:]):
+        move_cost = SQRT2 if x1 != x2 and y1 != y2 else 1
+        if obstacles is not None:
+            cell_cost = obstacles.get_cost(x2, y2)
+            move_cost *= 1 if cell_cost == inf else cell_cost
+        cost += move_cost
+    return cost
+
+class AStarSearch:
+    # A* search that can be stopped after a number of expansions and resumed later, so that a long search is spread over several frames
+    __slots__ = ["end", "obstacles", "bounds", "max_expansions", "g_scores", "parents", "closed", "open_heap", "expansions", "finished", "result"]
 
-CELL_CENTER = Point(Map.CELL_SIZE, Map.CELL_SIZE) // 2
+    def __init__(self, start, end, obstacles, max_expansions = MAX_EXPANSIONS, bounds = None) -> None:
+        self.end = end
+        self.obstacles = obstacles
+        self.bounds = bounds
+        self.max_expansions = max_expansions
+        self.g_scores = {start: 0}
+        self.parents = {start: None}
+        self.closed = set()
+        self.open_heap = [(octile(start[0], start[1], end[0], end[1]), 0, start)]
+        self.expansions = 0
+        self.finished = False
+        self.result = None # Cells (x, y) from start to end included once finished, None if end is unreachable within the expansion budget
+        # An end on an impassable biome is never reached, whatever the budget
+        if start != end and obstacles.is_terrain_blocked(end[0], end[1]):
+            self.finished = True
 
-def AStar(start, end, map):
-    open_list = []
-    closed_list = []
+    def step(self, budget):
+        # Expands up to budget nodes and returns how many were expanded
+        end = self.end
+        end_x, end_y = end
+        g_scores = self.g_scores
+        parents = self.parents
+        closed = self.closed
+        open_heap = self.open_heap
 
-    start_node = Node(start)
-    end_node = Node(end)
+        expansions = 0
+        while not self.finished and expansions < budget:
+            if not open_heap or self.expansions + expansions >= self.max_expansions:
+                self.finished = True
+                break
+            _, g, current = heapq.heappop(open_heap)
+            if current in closed:
+                continue
+            if current == end:
+                self.result = self.get_cells(current)
+                self.finished = True
+                break
+
+            closed.add(current)
+            expansions += 1
+            for neighbor, cost in self.get_successors(current, parents[current]):
+                if neighbor in closed:
+                    continue
+                neighbor_g = g + cost
+                if neighbor_g < g_scores.get(neighbor, inf):
+                    g_scores[neighbor] = neighbor_g
+                    parents[neighbor] = current
+                    heapq.heappush(open_heap, (neighbor_g + octile(neighbor[0], neighbor[1], end_x, end_y), neighbor_g, neighbor))
+
+        self.expansions += expansions
+        return expansions
+
+    def get_successors(self, cell, parent):
+        return get_neighbors(cell[0], cell[1], self.obstacles, self.bounds, (self.end,))
 
-    open_list.append(start_node)
+    def get_cells(self, cell):
+        return rebuild_path(self.parents, cell)
 
-    count = 0
-    while open_list:
-        current_node = open_list[0]
-        current_index = 0
+class JumpPointSearch(AStarSearch):
+    # A* over jump points, for bounded areas where most walkable cells cost the same.
+    # Straight and diagonal runs over the cells of that cost are crossed without expanding their cells, up to the cells where a shorter path could turn.
+    # The runs also stop beside the cells of another cost, which are expanded one by one as in A*.
+    # The cells where a straight run stops are marked beforehand in byte strings, searched with find instead of cell by cell
+    __slots__ = ["origin", "cost", "costs", "columns", "borders", "stops"]
 
-        for index, node in enumerate(open_list):
-            if node.f < current_node.f:
-                current_node = node
-                current_index = index
+    def __init__(self, start, end, obstacles, max_expansions = MAX_EXPANSIONS, bounds = None) -> None:
+        super().__init__(start, end, obstacles, max_expansions, bounds)
+        # Costs of the cells of the bounds with a blocked border, indexed from origin
+        min_x, min_y, max_x, max_y = bounds
+        self.origin = (min_x - 1, min_y - 1)
+        costs = np.full((max_x - min_x + 3, max_y - min_y + 3), inf)
+        costs[1:-1, 1:-1] = get_cost_grid(obstacles, bounds)
+        self.cost, _ = get_main_cost(costs)
+        # Cells crossed by the runs
+        walkable = costs == self.cost
+        end_x = end[0] - self.origin[0]
+        end_y = end[1] - self.origin[1]
+        if costs[end_x, end_y] == inf:
+            walkable[end_x, end_y] = not obstacles.is_terrain_blocked(end[0], end[1])
+        # Walkable cells beside a cell of another cost, expanded in every direction
+        other = (costs != self.cost) & (costs != inf) & ~walkable
+        border = np.zeros_like(walkable)
+        border[1:-1, 1:-1] = other[:-2, :-2] | other[:-2, 1:-1] | other[:-2, 2:] | other[1:-1, :-2] | other[1:-1, 2:] | other[2:, :-2] | other[2:, 1:-1] | other[2:, 2:]
+        border &= walkable
 
-        open_list.pop(current_index)
-        closed_list.append(current_node)
+        # A straight run stops on a blocked cell, on the end, on a border cell, or on a cell beside a free cell that follows a blocked one
+        blocked = ~walkable
+        stop = blocked | border
+        stop[end_x, end_y] = True
+        right = stop.copy()
+        right[1:, 1:-1] |= (walkable[1:, :-2] & blocked[:-1, :-2]) | (walkable[1:, 2:] & blocked[:-1, 2:])
+        left = stop.copy()
+        left[:-1, 1:-1] |= (walkable[:-1, :-2] & blocked[1:, :-2]) | (walkable[:-1, 2:] & blocked[1:, 2:])
+        down = stop.copy()
+        down[1:-1, 1:] |= (walkable[:-2, 1:] & blocked[:-2, :-1]) | (walkable[2:, 1:] & blocked[2:, :-1])
+        up = stop.copy()
+        up[1:-1, :-1] |= (walkable[:-2, :-1] & blocked[:-2, 1:]) | (walkable[2:, :-1] & blocked[2:, 1:])
+        self.costs = costs.tolist() # costs[x][y]
+        self.columns = [column.tobytes() for column in walkable] # columns[x][y]
+        self.borders = [column.tobytes() for column in border]
+        self.stops = { # {(dx, dy): [bytes]}, by row for the horizontal runs and by column for the vertical ones
+            (1, 0): [row.tobytes() for row in right.T],
+            (-1, 0): [row.tobytes() for row in left.T],
+            (0, 1): [column.tobytes() for column in down],
+            (0, -1): [column.tobytes() for column in up]
+        }
 
-        if current_node.position == end_node.position:
-            path = []
-            current = current_node
-            while current is not None:
-                path.append(current.position * Map.CELL_SIZE + CELL_CENTER)
-                current = current.parent
-            return path[::-1]
+    def is_walkable(self, x, y):
+        return self.columns[x - self.origin[0]][y - self.origin[1]] == 1
 
-        neighbors = []
-        for new_position in [Point(0, -1), Point(0, 1), Point(-1, 0), Point(1, 0), Point(-1, -1), Point(-1, 1), Point(1, -1), Point(1, 1)]:
-            node_position = current_node.position + new_position
+    def is_border(self, x, y):
+        return self.borders[x - self.origin[0]][y - self.origin[1]] == 1
 
-            new_node = Node(node_position, current_node)
-            neighbors.append(new_node)
+    def jump_straight(self, x, y, dx, dy):
+        # Next stop of a straight run from a cell, the border of the bounds stopping every run
+        i = x - self.origin[0]
+        j = y - self.origin[1]
+        if dx > 0:
+            i = self.stops[(1, 0)][j].find(1, i + 1)
+        elif dx < 0:
+            i = self.stops[(-1, 0)][j].rfind(1, 0, i)
+        elif dy > 0:
+            j = self.stops[(0, 1)][i].find(1, j + 1)
+        else:
+            j = self.stops[(0, -1)][i].rfind(1, 0, j)
+        if self.columns[i][j] != 1:
+            return None
+        return (i + self.origin[0], j + self.origin[1])
 
-        for neighbor in neighbors:
-            if neighbor in closed_list:
+    def jump(self, x, y, dx, dy):
+        # Next jump point from a cell in a direction, None if the run ends on an obstacle
+        if dx == 0 or dy == 0:
+            return self.jump_straight(x, y, dx, dy)
+        is_walkable = self.is_walkable
+        end_x, end_y = self.end
+        while True:
+            # No corner cutting: both cells along a diagonal must be free
+            if not (is_walkable(x + dx, y) and is_walkable(x, y + dy)):
+                return None
+            x += dx
+            y += dy
+            if not is_walkable(x, y):
+                return None
+            if x == end_x and y == end_y or self.is_border(x, y):
+                return (x, y)
+            if self.jump_straight(x, y, dx, 0) is not None or self.jump_straight(x, y, 0, dy) is not None:
+                return (x, y)
+
+    def get_directions(self, cell, parent):
+        # Directions worth following from a cell given the direction it was reached from
+        if parent is None:
+            return [(dx, dy) for dx, dy, _ in NEIGHBORS]
+        x, y = cell
+        dx = (x > parent[0]) - (x < parent[0])
+        dy = (y > parent[1]) - (y < parent[1])
+        is_walkable = self.is_walkable
+        directions = []
+        if dx != 0 and dy != 0:
+            if is_walkable(x, y + dy):
+                directions.append((0, dy))
+            if is_walkable(x + dx, y):
+                directions.append((dx, 0))
+            if is_walkable(x, y + dy) and is_walkable(x + dx, y):
+                directions.append((dx, dy))
+        elif dx != 0:
+            if is_walkable(x + dx, y):
+                directions.append((dx, 0))
+                if is_walkable(x, y + 1):
+                    directions.append((dx, 1))
+                if is_walkable(x, y - 1):
+                    directions.append((dx, -1))
+            if is_walkable(x, y + 1):
+                directions.append((0, 1))
+            if is_walkable(x, y - 1):
+                directions.append((0, -1))
+        else:
+            if is_walkable(x, y + dy):
+                directions.append((0, dy))
+                if is_walkable(x + 1, y):
+                    directions.append((1, dy))
+                if is_walkable(x - 1, y):
+                    directions.append((-1, dy))
+            if is_walkable(x + 1, y):
+                directions.append((1, 0))
+            if is_walkable(x - 1, y):
+                directions.append((-1, 0))
+        return directions
+
+    def get_successors(self, cell, parent):
+        x, y = cell
+        i = x - self.origin[0]
+        j = y - self.origin[1]
+        successors = []
+        if self.columns[i][j] == 1:
+            border = self.borders[i][j] == 1
+            for dx, dy in self.get_directions(cell, None if border else parent):
+                jump_point = self.jump(x, y, dx, dy)
+                if jump_point is not None:
+                    successors.append((jump_point, self.cost * octile(x, y, jump_point[0], jump_point[1])))
+            if not border:
+                return successors
+
+        # On or beside a cell of another cost: its neighbors as in A*
+        costs = self.costs
+        end_x = self.end[0] - self.origin[0]
+        end_y = self.end[1] - self.origin[1]
+        for dx, dy, length in NEIGHBORS:
+            cost = costs[i + dx][j + dy]
+            if cost == inf:
+                if i + dx != end_x or j + dy != end_y or self.columns[end_x][end_y] != 1:
+                    continue
+                cost = 1
+            if dx != 0 and dy != 0 and (costs[i + dx][j] == inf or costs[i][j + dy] == inf):
                 continue
+            successors.append(((x + dx, y + dy), length * cost))
+        return successors
+
+    def get_cells(self, cell):
+        # Every cell between the jump points, which are linked by straight or diagonal runs
+        jump_points = rebuild_path(self.parents, cell)
+        cells = [jump_points[0]]
+        for (x1, y1), (x2, y2) in zip(jump_points, jump_points[1:]):
+            dx = (x2 > x1) - (x2 < x1)
+            dy = (y2 > y1) - (y2 < y1)
+            x, y = x1, y1
+            while x != x2 or y != y2:
+                x += dx
+                y += dy
+                cells.append((x, y))
+        return cells
+
+class GridPathfinder:
+    # A* over a fixed grid of movement costs (inf for the blocked cells) or of booleans (True for the blocked cells), indexed [x, y].
+    # Positions in pixels are turned into cells arithmetically, and the scores and parents are kept in flat arrays
+    # allocated once and reused by every search on the grid, a cell being reset by the first search that reaches it
+    __slots__ = ["width", "height", "cell_size", "origin", "costs", "g_scores", "parents", "visits", "closed", "search_id"]
+
+    def __init__(self, grid, cell_size = 1, origin = (0, 0)) -> None:
+        grid = np.asarray(grid)
+        if grid.dtype == bool:
+            grid = np.where(grid, inf, 1.0)
+        self.width, self.height = grid.shape
+        self.cell_size = cell_size # Pixels of a cell
+        self.origin = (int(origin[0]), int(origin[1])) # Cell (x, y) of grid[0, 0]
+        self.costs = grid.ravel().tolist() # costs[x * height + y]
+        size = self.width * self.height
+        self.g_scores = [inf] * size
+        self.parents = [-1] * size
+        self.visits = [0] * size # Search that last set the score and the parent of each cell
+        self.closed = [0] * size # Search that last expanded each cell
+        self.search_id = 0
+
+    def get_cell(self, position):
+        # Cell (x, y) of a position in pixels
+        return (int(position[0]) // self.cell_size, int(position[1]) // self.cell_size)
+
+    def contains(self, cell):
+        return 0 <= cell[0] - self.origin[0] < self.width and 0 <= cell[1] - self.origin[1] < self.height
+
+    def is_blocked(self, cell):
+        return self.costs[(cell[0] - self.origin[0]) * self.height + cell[1] - self.origin[1]] == inf
+
+    def find_cells(self, start, end, max_expansions = MAX_EXPANSIONS):
+        # Cells (x, y) from start to end included, None if end is outside the grid or unreachable within the expansion budget.
+        # Same moves and costs as AStarSearch, the end being walkable even when it is blocked
+        if start == end:
+            return [start]
+        if not self.contains(start) or not self.contains(end):
+            return None
+
+        width = self.width
+        height = self.height
+        origin_x, origin_y = self.origin
+        costs = self.costs
+        g_scores = self.g_scores
+        parents = self.parents
+        visits = self.visits
+        closed = self.closed
+        self.search_id += 1
+        search_id = self.search_id
 
-            neighbor.g = current_node.g + 1
-            neighbor.h = abs(neighbor.position.x - end_node.position.x) + abs(neighbor.position.y - end_node.position.y)
-            neighbor.f = neighbor.g + neighbor.h
+        start_index = (start[0] - origin_x) * height + start[1] - origin_y
+        end_x = end[0] - origin_x
+        end_y = end[1] - origin_y
+        end_index = end_x * height + end_y
+        g_scores[start_index] = 0
+        parents[start_index] = -1
+        visits[start_index] = search_id
+        open_heap = [(octile(start[0], start[1], end[0], end[1]), 0, start_index)]
 
-            if neighbor in open_list:
-                if neighbor.g > current_node.g:
+        expansions = 0
+        while open_heap and expansions < max_expansions:
+            _, g, current = heapq.heappop(open_heap)
+            if closed[current] == search_id:
+                continue
+            if current == end_index:
+                return self.rebuild_path(current)
+
+            closed[current] = search_id
+            expansions += 1
+            x, y = divmod(current, height)
+            for dx, dy, move_cost in NEIGHBORS:
+                neighbor_x = x + dx
+                neighbor_y = y + dy
+                if neighbor_x < 0 or neighbor_y < 0 or neighbor_x >= width or neighbor_y >= height:
+                    continue
+                neighbor = current + dx * height + dy
+                if closed[neighbor] == search_id:
                     continue
+                cell_cost = costs[neighbor]
+                if cell_cost == inf:
+                    if neighbor != end_index:
+                        continue
+                    cell_cost = 1
+                # No corner cutting: both cells along a diagonal must be free
+                if dx != 0 and dy != 0 and (costs[current + dx * height] == inf or costs[current + dy] == inf):
+                    continue
+                neighbor_g = g + move_cost * cell_cost
+                if visits[neighbor] != search_id or neighbor_g < g_scores[neighbor]:
+                    visits[neighbor] = search_id
+                    g_scores[neighbor] = neighbor_g
+                    parents[neighbor] = current
+                    heapq.heappush(open_heap, (neighbor_g + octile(neighbor_x, neighbor_y, end_x, end_y), neighbor_g, neighbor))
+        return None
+
+    def rebuild_path(self, index):
+        cells = []
+        while index != -1:
+            x, y = divmod(index, self.height)
+            cells.append((x + self.origin[0], y + self.origin[1]))
+            index = self.parents[index]
+        return cells[::-1]
+
+def get_cost_grid(obstacles, bounds):
+    # Costs of the cells in the bounds (min x, min y, max x, max y), grid[0, 0] being the first cell
+    min_x, min_y, max_x, max_y = bounds
+    grid = np.empty((max_x - min_x + 1, max_y - min_y + 1))
+    for chunk_x in range(min_x // Perlin.CHUNK_SIZE, max_x // Perlin.CHUNK_SIZE + 1):
+        for chunk_y in range(min_y // Perlin.CHUNK_SIZE, max_y // Perlin.CHUNK_SIZE + 1):
+            # Part of the chunk in the bounds
+            first_x = max(chunk_x * Perlin.CHUNK_SIZE, min_x)
+            first_y = max(chunk_y * Perlin.CHUNK_SIZE, min_y)
+            last_x = min((chunk_x + 1) * Perlin.CHUNK_SIZE - 1, max_x)
+            last_y = min((chunk_y + 1) * Perlin.CHUNK_SIZE - 1, max_y)
+            costs = obstacles.get_array(chunk_x, chunk_y)[first_x % Perlin.CHUNK_SIZE:last_x % Perlin.CHUNK_SIZE + 1, first_y % Perlin.CHUNK_SIZE:last_y % Perlin.CHUNK_SIZE + 1]
+            grid[first_x - min_x:last_x - min_x + 1, first_y - min_y:last_y - min_y + 1] = costs
+    return grid
+
+def get_grid_pathfinder(obstacles, bounds):
+    # GridPathfinder over the cells in the bounds, built once for the obstacles
+    bounds = tuple(bounds)
+    pathfinder = obstacles.pathfinders.get(bounds, None)
+    if pathfinder is None:
+        pathfinder = GridPathfinder(get_cost_grid(obstacles, bounds), 1, bounds[:2])
+        obstacles.pathfinders[bounds] = pathfinder
+    return pathfinder
+
+def search(start, end, obstacles, max_expansions = MAX_EXPANSIONS, bounds = None):
+    # Cells (x, y) from start to end included, None if end is unreachable within the expansion budget
+    if start == end:
+        return [start]
+    if obstacles.is_terrain_blocked(end[0], end[1]):
+        return None
+    if bounds is not None:
+        return get_grid_pathfinder(obstacles, bounds).find_cells(start, end, max_expansions)
+
+    astar_search = AStarSearch(start, end, obstacles, max_expansions, bounds)
+    while not astar_search.finished:
+        astar_search.step(max_expansions)
+    return astar_search.result
+
+def jump_point_search(start, end, obstacles, max_expansions = MAX_EXPANSIONS, bounds = None):
+    # Same as search, the bounds being required and most walkable cells in them having the same cost
+    if start == end:
+        return [start]
+
+    jps = JumpPointSearch(start, end, obstacles, max_expansions, bounds)
+    while not jps.finished:
+        jps.step(max_expansions)
+    return jps.result
+
+def get_main_cost(costs):
+    # Most common cost of the walkable cells of an array and the share of the walkable cells having it, (None, 0) if none is walkable
+    values, counts = np.unique(costs[costs != inf], return_counts = True)
+    if values.size == 0:
+        return None, 0
+    index = counts.argmax()
+    return values[index].item(), counts[index] / counts.sum()
+
+def get_jump_cost(map, bounds, profile = "walk"):
+    # Cost of the cells crossed by the runs of a jump point search in the bounds (min x, min y, max x, max y),
+    # None if too few walkable cells have it for the jumps to pay off
+    min_x, min_y, max_x, max_y = bounds
+    costs = []
+    for chunk_x in range(min_x // Perlin.CHUNK_SIZE, max_x // Perlin.CHUNK_SIZE + 1):
+        for chunk_y in range(min_y // Perlin.CHUNK_SIZE, max_y // Perlin.CHUNK_SIZE + 1):
+            first_x = chunk_x * Perlin.CHUNK_SIZE
+            first_y = chunk_y * Perlin.CHUNK_SIZE
+            costs.append(map.get_cost_chunk((chunk_x, chunk_y), profile)[max(min_x - first_x, 0):max_x - first_x + 1, max(min_y - first_y, 0):max_y - first_y + 1].ravel())
+    cost, share = get_main_cost(np.concatenate(costs))
+    if share < JUMP_MIN_SHARE:
+        return None
+    return cost
+
+def get_jump_bounds(map, start, end, profile = "walk"):
+    # Bounds of the jump point search between start and end, None when A* is faster: the cells are close or too few have the same cost
+    if max(abs(start[0] - end[0]), abs(start[1] - end[1])) < JUMP_MIN_DISTANCE:
+        return None
+    bounds = (min(start[0], end[0]) - JUMP_MARGIN, min(start[1], end[1]) - JUMP_MARGIN, max(start[0], end[0]) + JUMP_MARGIN, max(start[1], end[1]) + JUMP_MARGIN)
+    if get_jump_cost(map, bounds, profile) is None:
+        return None
+    return bounds
+
+def search_with_jumps(start, end, obstacles, max_expansions = MAX_EXPANSIONS, bounds = None, jump_bounds = None):
+    # Jump point search in jump_bounds if given, then A* in bounds if it found no path
+    if jump_bounds is not None:
+        cells = jump_point_search(start, end, obstacles, max_expansions, jump_bounds)
+        if cells is not None:
+            return cells
+    return search(start, end, obstacles, max_expansions, bounds)
+
+def get_search_box(start, end, margin = 1):
+    # Chunks (x, y) of the rectangle around start and end, and its bounds in cells (min x, min y, max x, max y)
+    min_x = min(start[0], end[0]) // Perlin.CHUNK_SIZE - margin
+    min_y = min(start[1], end[1]) // Perlin.CHUNK_SIZE - margin
+    max_x = max(start[0], end[0]) // Perlin.CHUNK_SIZE + margin
+    max_y = max(start[1], end[1]) // Perlin.CHUNK_SIZE + margin
+    chunks = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+    return chunks, (min_x * Perlin.CHUNK_SIZE, min_y * Perlin.CHUNK_SIZE, (max_x + 1) * Perlin.CHUNK_SIZE - 1, (max_y + 1) * Perlin.CHUNK_SIZE - 1)
+
+def dijkstra(starts, ends, obstacles, max_expansions = MAX_EXPANSIONS, bounds = None, stop_at_first = False):
+    # Costs {cell: cost} of the end cells reached from the nearest start, and the parents to rebuild their paths.
+    # Blocked end cells are reached but not walked through
+    costs = {}
+    parents = {}
+    open_heap = []
+    for start in starts:
+        costs[start] = 0
+        parents[start] = None
+        open_heap.append((0, start))
+    heapq.heapify(open_heap)
+    closed = set()
+    reached = {}
+
+    expansions = 0
+    while open_heap and expansions < max_expansions:
+        g, current = heapq.heappop(open_heap)
+        if current in closed:
+            continue
+        closed.add(current)
+        if current in ends:
+            reached[current] = g
+            if stop_at_first or len(reached) == len(ends):
+                break
+            if parents[current] is not None and obstacles.is_blocked(current[0], current[1]):
+                continue
+
+        expansions += 1
+        for neighbor, cost in get_neighbors(current[0], current[1], obstacles, bounds, ends):
+            if neighbor in closed:
+                continue
+            neighbor_g = g + cost
+            if neighbor_g < costs.get(neighbor, inf):
+                costs[neighbor] = neighbor_g
+                parents[neighbor] = current
+                heapq.heappush(open_heap, (neighbor_g, neighbor))
+
+    return reached, parents
+
+def search_nearest(start, ends, obstacles, max_expansions = MAX_EXPANSIONS):
+    # Cells from start to the closest of the end cells by path, None if none is reachable within the expansion budget.
+    # The heuristic is the distance to the closest end in a straight line
+    ends = set(ends)
+    if start in ends:
+        return [start]
+    ends = set(end for end in ends if not obstacles.is_terrain_blocked(end[0], end[1]))
+    if len(ends) == 0:
+        return None
+
+    def heuristic(x, y):
+        return min(octile(x, y, end_x, end_y) for end_x, end_y in ends)
+
+    g_scores = {start: 0}
+    parents = {start: None}
+    closed = set()
+    open_heap = [(heuristic(start[0], start[1]), 0, start)]
+
+    expansions = 0
+    while open_heap and expansions < max_expansions:
+        _, g, current = heapq.heappop(open_heap)
+        if current in closed:
+            continue
+        if current in ends:
+            return rebuild_path(parents, current)
+
+        closed.add(current)
+        expansions += 1
+        for neighbor, cost in get_neighbors(current[0], current[1], obstacles, None, ends):
+            if neighbor in closed:
+                continue
+            neighbor_g = g + cost
+            if neighbor_g < g_scores.get(neighbor, inf):
+                g_scores[neighbor] = neighbor_g
+                parents[neighbor] = current
+                heapq.heappush(open_heap, (neighbor_g + heuristic(neighbor[0], neighbor[1]), neighbor_g, neighbor))
+
+    return None
+
+def line_of_sight(start, end, obstacles):
+    # True if the segment between the centers of two cells only crosses walkable cells, none costlier than the start cell.
+    # Where it goes exactly through a corner, both cells beside it must be free, as for a diagonal move
+    max_cost = obstacles.get_cost(start[0], start[1])
+    if max_cost == inf:
+        max_cost = 1
+    x, y = start
+    dx = abs(end[0] - x)
+    dy = abs(end[1] - y)
+    step_x = 1 if end[0] > x else -1
+    step_y = 1 if end[1] > y else -1
+    error = dx - dy
+    remaining = dx + dy
+    while remaining > 0:
+        if error > 0:
+            x += step_x
+            error -= 2 * dy
+        elif error < 0:
+            y += step_y
+            error += 2 * dx
+        else:
+            if obstacles.is_blocked(x + step_x, y) or obstacles.is_blocked(x, y + step_y):
+                return False
+            x += step_x
+            y += step_y
+            error += 2 * (dx - dy)
+            remaining -= 1
+        remaining -= 1
+        if remaining > 0 and obstacles.get_cost(x, y) > max_cost:
+            return False
+    return True
+
+def remove_collinear(cells):
+    # Cells where the path turns, with the start and the end
+    if len(cells) < 3:
+        return list(cells)
+    waypoints = [cells[0]]
+    for previous, cell, following in zip(cells, cells[1:], cells[2:]):
+        if (cell[0] - previous[0]) * (following[1] - cell[1]) != (cell[1] - previous[1]) * (following[0] - cell[0]):
+            waypoints.append(cell)
+    waypoints.append(cells[-1])
+    return waypoints
+
+def smooth_cells(cells, obstacles):
+    # Waypoints of a path: collinear cells are dropped, then each waypoint goes straight to the farthest next one in sight
+    waypoints = remove_collinear(cells)
+    smoothed = [waypoints[0]]
+    i = 0
+    while i < len(waypoints) - 1:
+        j = i + 1
+        while j + 1 < len(waypoints) and line_of_sight(waypoints[i], waypoints[j + 1], obstacles):
+            j += 1
+        smoothed.append(waypoints[j])
+        i = j
+    return smoothed
+
+def get_allowed_structures(map, cells):
+    # The structures on the start and end cells can be walked through
+    allowed_structures = []
+    for x, y in cells:
+        structure = map.occupancy.get_cell(x, y)
+        if structure is not None:
+            allowed_structures.append(structure)
+    return allowed_structures
+
+def cells_to_path(cells, cell_size):
+    # Path of cell centers in pixels
+    cell_center = Point(cell_size, cell_size) // 2
+    return [Point(x, y) * cell_size + cell_center for x, y in cells]
 
-            open_list.append(neighbor)
+def find_cells(start, end, map, profile = "walk", max_expansions = MAX_EXPANSIONS):
+    # Cells (x, y) from start to end, and the chunks read by the search.
+    # Jump point search is used around start and end when they are far enough and most of the terrain there has the same cost
+    start = (int(start.x), int(start.y))
+    end = (int(end.x), int(end.y))
+    obstacles = Obstacles(map, profile, get_allowed_structures(map, [start, end]))
+    return search_with_jumps(start, end, obstacles, max_expansions, None, get_jump_bounds(map, start, end, profile)), obstacles.chunks.keys()
 
-    return None
\ No newline at end of file
+def AStar(start, end, map, max_expansions = MAX_EXPANSIONS):
+    # Path of cell centers in pixels from the start cell to the end cell, None if there is none
+    cells, _ = find_cells(start, end, map, "walk", max_expansions)
+    if cells is None:
+        return None
+    return cells_to_path(cells, map.CELL_SIZE)
@@ -90,14 +90,13 @@ class AiPlayer(Player):
         pantry = 0
         farm = 0
         mine = 0
-        for building in map.buildings:
-            if building.player == self:
-                if building.type == BuildingType.PANTRY:
-                    pantry += 1
-                if building.type == BuildingType.FARM:
-                    farm += 1
-                if building.type == BuildingType.MINER_CAMP:
-                    mine += 1
+        for building in map.buildings.by_owner(self):
+            if building.type == BuildingType.PANTRY:
+                pantry += 1
+            if building.type == BuildingType.FARM:
+                farm += 1
+            if building.type == BuildingType.MINER_CAMP:
+                mine += 1
         return pantry, farm, mine
 
     def get_technology(self, map: Map):
@@ -162,12 +161,11 @@ class AiPlayer(Player):
         Returns:
             int: The number of humans owned by the AI player.
         """
-        human = 0
-        for human in map.humans:
-            if human.player == self:
-                if human.state == HumanState.IDLE:
-                    human += 1
-        return human
+        idle = 0
+        for human in map.humans.by_owner(self):
+            if human.state == HumanState.IDLE:
+                idle += 1
+        return idle
 
     def get_ennemi(self, map: Map):
         """
@@ -0,0 +1,68 @@
+from model.Perlin import Perlin
+
+# Buildings of each type bucketed by chunk, to find the ones around a cell without going through all of them
+class BuildingIndex:
+    __slots__ = ["chunks"]
+
+    def __init__(self) -> None:
+        self.chunks = {} # {BuildingType: {(x, y) (chunk coords): [Building]}}
+
+    def get_chunk_coords(self, building):
+        return (int(building.coords.x) // Perlin.CHUNK_SIZE, int(building.coords.y) // Perlin.CHUNK_SIZE)
+
+    def add(self, building):
+        self.chunks.setdefault(building.type, {}).setdefault(self.get_chunk_coords(building), []).append(building)
+
+    def remove(self, building):
+        type_chunks = self.chunks.get(building.type, None)
+        if type_chunks is None:
+            return
+        chunk_coords = self.get_chunk_coords(building)
+        buildings = type_chunks.get(chunk_coords, None)
+        if buildings is not None and building in buildings:
+            buildings.remove(building)
+            if len(buildings) == 0:
+                del type_chunks[chunk_coords]
+
+    def query(self, building_types, chunk_coords, radius):
+        # Buildings of the types in the square of chunks of the given radius around a chunk
+        buildings = []
+        for building_type in building_types:
+            type_chunks = self.chunks.get(building_type, None)
+            if type_chunks is None:
+                continue
+            if len(type_chunks) <= (2 * radius + 1) ** 2:
+                for actual_chunk_coords, actual_buildings in type_chunks.items():
+                    if abs(actual_chunk_coords[0] - chunk_coords[0]) <= radius and abs(actual_chunk_coords[1] - chunk_coords[1]) <= radius:
+                        buildings.extend(actual_buildings)
+            else:
+                for x in range(chunk_coords[0] - radius, chunk_coords[0] + radius + 1):
+                    for y in range(chunk_coords[1] - radius, chunk_coords[1] + radius + 1):
+                        buildings.extend(type_chunks.get((x, y), ()))
+        return buildings
+
+    def nearest(self, building_types, cell, count, condition = None, max_radius = 8):
+        # The <count> buildings closest to a cell in a straight line, the ones not meeting the condition being ignored
+        chunk_coords = (int(cell.x) // Perlin.CHUNK_SIZE, int(cell.y) // Perlin.CHUNK_SIZE)
+        buildings = []
+        radius = 0
+        while radius <= max_radius:
+            buildings = [building for building in self.query(building_types, chunk_coords, radius) if condition is None or condition(building)]
+            if len(buildings) >= count:
+                # A building one ring further can still be closer than the ones found in the corners
+                buildings = [building for building in self.query(building_types, chunk_coords, radius + 1) if condition is None or condition(building)]
+                break
+            radius += 1
+        if len(buildings) == 0:
+            buildings = [building for building in self.all(building_types) if condition is None or condition(building)]
+
+        buildings.sort(key = lambda building: building.coords.distance(cell))
+        return buildings[:count]
+
+    def all(self, building_types):
+        for building_type in building_types:
+            for buildings in self.chunks.get(building_type, {}).values():
+                yield from buildings
+
+    def clear(self):
+        self.chunks.clear()
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+
+# LRU cache of chunk arrays bounded by a memory budget in bytes.
+# The most recently used chunk is never evicted, even if it is bigger than the budget.
+class ChunkCache:
+    __slots__ = ["chunks", "max_bytes", "bytes", "sizeof", "evict_callback"]
+
+    def __init__(self, max_bytes, sizeof = None, evict_callback = None) -> None:
+        self.chunks = OrderedDict()
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.sizeof = sizeof if sizeof is not None else lambda chunk: chunk.nbytes
+        self.evict_callback = evict_callback
+
+    def get(self, key, default = None):
+        chunk = self.chunks.get(key, None)
+        if chunk is None:
+            return default
+        self.chunks.move_to_end(key)
+        return chunk
+
+    def __getitem__(self, key):
+        chunk = self.chunks[key]
+        self.chunks.move_to_end(key)
+        return chunk
+
+    def __setitem__(self, key, chunk):
+        old_chunk = self.chunks.pop(key, None)
+        if old_chunk is not None:
+            self.bytes -= self.sizeof(old_chunk)
+        self.chunks[key] = chunk
+        self.bytes += self.sizeof(chunk)
+        self.evict()
+
+    def __contains__(self, key):
+        return key in self.chunks
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def items(self):
+        return self.chunks.items()
+
+    def pop(self, key, default = None):
+        chunk = self.chunks.pop(key, None)
+        if chunk is None:
+            return default
+        self.bytes -= self.sizeof(chunk)
+        return chunk
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.evict()
+
+    def evict(self):
+        while self.bytes > self.max_bytes and len(self.chunks) > 1:
+            key, chunk = self.chunks.popitem(last = False)
+            self.bytes -= self.sizeof(chunk)
+            if self.evict_callback is not None:
+                self.evict_callback(key, chunk)
+
+    def clear(self):
+        self.chunks.clear()
+        self.bytes = 0
@@ -0,0 +1,183 @@
+import heapq
+from math import inf
+
+from model.AStar import Obstacles, search, dijkstra, octile, rebuild_path, get_path_cost, get_grid_pathfinder
+from model.Perlin import Perlin
+
+# Abstract graph of the entrances between chunks (HPA*): long paths are planned from entrance to entrance,
+# then refined cell by cell inside the chunks along the route only.
+# The entrances and the costs between them are computed when a search first reaches a chunk and dropped when it changes.
+class ChunkGraph:
+    __slots__ = ["map", "obstacles", "borders", "chunk_edges", "max_expansions", "max_built_chunks", "built_chunks", "fallbacks"]
+
+    ENTRANCE_SPLIT = 6 # Openings longer than this get an entrance at each end instead of one in the middle
+    MAX_EXPANSIONS = 4000 # Entrances expanded before giving up
+    MAX_BUILT_CHUNKS = 32 # Chunks whose edges a query can build before it falls back to the budgeted A*,
+    BUILT_CHUNKS_PER_DISTANCE = 8 # plus this many per chunk between the start and the end
+
+    def __init__(self, map, profile = "walk", max_expansions = MAX_EXPANSIONS, max_built_chunks = MAX_BUILT_CHUNKS) -> None:
+        self.map = map
+        self.obstacles = Obstacles(map, profile)
+        self.borders = {} # {((x, y), (x, y)) (chunk coords, left or top chunk first): [((x, y), (x, y)) (entrance cell on each side)]}
+        self.chunk_edges = {} # {(x, y) (chunk coords): {(x, y) (entrance cell): [((x, y), cost)]}}
+        self.max_expansions = max_expansions
+        self.max_built_chunks = max_built_chunks
+        self.built_chunks = 0
+        self.fallbacks = 0 # Queries that built too many chunks and were searched with A* instead
+
+    def get_chunk_bounds(self, chunk_coords):
+        return (chunk_coords[0] * Perlin.CHUNK_SIZE, chunk_coords[1] * Perlin.CHUNK_SIZE, (chunk_coords[0] + 1) * Perlin.CHUNK_SIZE - 1, (chunk_coords[1] + 1) * Perlin.CHUNK_SIZE - 1)
+
+    def get_border(self, chunk_a, chunk_b):
+        # Entrances between two chunks, chunk_b being right of or below chunk_a
+        border = self.borders.get((chunk_a, chunk_b), None)
+        if border is None:
+            grid_a = self.obstacles.get_chunk(chunk_a[0], chunk_a[1])
+            grid_b = self.obstacles.get_chunk(chunk_b[0], chunk_b[1])
+            edge = Perlin.CHUNK_SIZE - 1
+            horizontal = chunk_b[0] != chunk_a[0]
+
+            # Openings: runs of cells free on both sides of the border
+            runs = []
+            run_start = None
+            for i in range(Perlin.CHUNK_SIZE + 1):
+                if i == Perlin.CHUNK_SIZE:
+                    free = False
+                elif horizontal:
+                    free = grid_a[edge][i] != inf and grid_b[0][i] != inf
+                else:
+                    free = grid_a[i][edge] != inf and grid_b[i][0] != inf
+                if free and run_start is None:
+                    run_start = i
+                elif not free and run_start is not None:
+                    runs.append((run_start, i - 1))
+                    run_start = None
+
+            border = []
+            for first, last in runs:
+                positions = [(first + last) // 2] if last - first + 1 <= ChunkGraph.ENTRANCE_SPLIT else [first, last]
+                for i in positions:
+                    if horizontal:
+                        cell_a = (chunk_a[0] * Perlin.CHUNK_SIZE + edge, chunk_a[1] * Perlin.CHUNK_SIZE + i)
+                        cell_b = (cell_a[0] + 1, cell_a[1])
+                    else:
+                        cell_a = (chunk_a[0] * Perlin.CHUNK_SIZE + i, chunk_a[1] * Perlin.CHUNK_SIZE + edge)
+                        cell_b = (cell_a[0], cell_a[1] + 1)
+                    border.append((cell_a, cell_b))
+            self.borders[(chunk_a, chunk_b)] = border
+        return border
+
+    def get_edges(self, chunk_coords):
+        # Edges of the entrances of a chunk: to the facing entrance of the next chunk, and to the other entrances of the chunk
+        edges = self.chunk_edges.get(chunk_coords, None)
+        if edges is None:
+            x, y = chunk_coords
+            edges = {}
+            for chunk_a, chunk_b, side in [((x - 1, y), chunk_coords, 1), (chunk_coords, (x + 1, y), 0), ((x, y - 1), chunk_coords, 1), (chunk_coords, (x, y + 1), 0)]:
+                for cells in self.get_border(chunk_a, chunk_b):
+                    edges.setdefault(cells[side], []).append((cells[1 - side], self.obstacles.get_cost(cells[1 - side][0], cells[1 - side][1])))
+
+            # One search per pair of entrances on the same grid of the chunk, short in open chunks
+            entrances = list(edges)
+            pathfinder = get_grid_pathfinder(self.obstacles, self.get_chunk_bounds(chunk_coords))
+            for i, entrance in enumerate(entrances):
+                for other in entrances[i + 1:]:
+                    cells = pathfinder.find_cells(entrance, other, Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE)
+                    if cells is not None:
+                        # The costs of the cells entered differ in each direction
+                        edges[entrance].append((other, get_path_cost(cells, self.obstacles)))
+                        edges[other].append((entrance, get_path_cost(cells[::-1], self.obstacles)))
+
+            self.chunk_edges[chunk_coords] = edges
+            self.built_chunks += 1
+        return edges
+
+    def invalidate_chunk(self, chunk_coords):
+        x, y = chunk_coords
+        self.obstacles.forget_chunk(chunk_coords)
+        for border in [((x - 1, y), chunk_coords), (chunk_coords, (x + 1, y)), ((x, y - 1), chunk_coords), (chunk_coords, (x, y + 1))]:
+            self.borders.pop(border, None)
+        # The entrances of the next chunks on the shared borders may have changed too
+        for actual_chunk_coords in [chunk_coords, (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]:
+            self.chunk_edges.pop(actual_chunk_coords, None)
+
+    def read_chunk(self, chunk_coords, chunks):
+        # The edges of a chunk depend on its borders with the next chunks
+        x, y = chunk_coords
+        chunks.update([chunk_coords, (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)])
+        return self.get_edges(chunk_coords)
+
+    def find_cells(self, start, end, allowed_structures = ()):
+        # Cells (x, y) from start to end and the chunks the result depends on, the cells being None if there is no path
+        start_chunk = (start[0] // Perlin.CHUNK_SIZE, start[1] // Perlin.CHUNK_SIZE)
+        end_chunk = (end[0] // Perlin.CHUNK_SIZE, end[1] // Perlin.CHUNK_SIZE)
+        obstacles = Obstacles(self.map, self.obstacles.profile, allowed_structures)
+        chunks = set()
+        # An end on an impassable biome is never reached, no need to explore the graph around it
+        if obstacles.is_terrain_blocked(end[0], end[1]):
+            chunks.add(end_chunk)
+            return None, chunks
+        max_built_chunks = self.built_chunks + self.max_built_chunks + ChunkGraph.BUILT_CHUNKS_PER_DISTANCE * max(abs(start_chunk[0] - end_chunk[0]), abs(start_chunk[1] - end_chunk[1]))
+
+        # Links from the start to the entrances of its chunk and from the entrances of the end chunk to the end
+        start_bounds = self.get_chunk_bounds(start_chunk)
+        end_bounds = self.get_chunk_bounds(end_chunk)
+        start_links, _ = dijkstra([start], set(self.read_chunk(start_chunk, chunks)), obstacles, Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE, start_bounds)
+        end_links, _ = dijkstra([end], set(self.read_chunk(end_chunk, chunks)), obstacles, Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE, end_bounds)
+
+        g_scores = {start: 0}
+        parents = {start: None}
+        closed = set()
+        open_heap = [(octile(start[0], start[1], end[0], end[1]), 0, start)]
+        abstract_path = None
+        expansions = 0
+        while open_heap and expansions < self.max_expansions:
+            if self.built_chunks > max_built_chunks:
+                # Around an enclosed end, each expansion can reach new chunks: the expansion budget of A* bounds the time instead
+                self.fallbacks += 1
+                cells = search(start, end, obstacles)
+                chunks.update(obstacles.chunks)
+                return cells, chunks
+            _, g, current = heapq.heappop(open_heap)
+            if current in closed:
+                continue
+            if current == end:
+                abstract_path = rebuild_path(parents, current)
+                break
+
+            closed.add(current)
+            expansions += 1
+            links = []
+            if current == start:
+                links.extend(start_links.items())
+            chunk_coords = (current[0] // Perlin.CHUNK_SIZE, current[1] // Perlin.CHUNK_SIZE)
+            links.extend(self.read_chunk(chunk_coords, chunks).get(current, ()))
+            if current in end_links:
+                links.append((end, end_links[current]))
+
+            for neighbor, cost in links:
+                if neighbor in closed:
+                    continue
+                neighbor_g = g + cost
+                if neighbor_g < g_scores.get(neighbor, inf):
+                    g_scores[neighbor] = neighbor_g
+                    parents[neighbor] = current
+                    heapq.heappush(open_heap, (neighbor_g + octile(neighbor[0], neighbor[1], end[0], end[1]), neighbor_g, neighbor))
+
+        if abstract_path is None:
+            return None, chunks
+
+        # Refine each step of the abstract path inside its chunk
+        cells = [start]
+        for a, b in zip(abstract_path, abstract_path[1:]):
+            a_chunk = (a[0] // Perlin.CHUNK_SIZE, a[1] // Perlin.CHUNK_SIZE)
+            b_chunk = (b[0] // Perlin.CHUNK_SIZE, b[1] // Perlin.CHUNK_SIZE)
+            if a_chunk != b_chunk:
+                cells.append(b)
+                continue
+            step = get_grid_pathfinder(obstacles, self.get_chunk_bounds(a_chunk)).find_cells(a, b, Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE)
+            if step is None:
+                return None, chunks
+            cells.extend(step[1:])
+
+        return cells, chunks
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from model.Geometry import Point
+from model.Perlin import Perlin
+
+class ChunkPrefetcher:
+    __slots__ = ["map", "radius", "max_chunks_per_update", "executor", "pending", "prefetched", "last_camera_pos", "direction", "hits", "misses"]
+
+    RADIUS = 2 # Chunks generated ahead of the visible area
+    WORKERS = 2
+    MIN_SPEED = 60 # Pixels per second under which the camera is considered still
+
+    def __init__(self, map, radius = RADIUS, max_chunks_per_update = 4) -> None:
+        self.map = map
+        self.radius = radius
+        self.max_chunks_per_update = max_chunks_per_update
+        self.executor = None
+        self.pending = {} # {Point (chunk coords): Future}
+        self.prefetched = set() # Chunks handed to the map by the prefetcher and not displayed yet
+        self.last_camera_pos = None
+        self.direction = Point.origin()
+        self.hits = 0
+        self.misses = 0
+
+    def generate_noise(self, perlin, chunk_coords):
+        # Runs in a worker thread: only reads the Perlin tables
+        cells = np.arange(Perlin.CHUNK_SIZE)
+        return perlin.generate_noise(Perlin.CHUNK_SIZE * chunk_coords.x + cells, Perlin.CHUNK_SIZE * chunk_coords.y + cells)
+
+    def request(self, chunk_coords):
+        if chunk_coords in self.pending or self.map.map_chunks.get(chunk_coords, None) is not None:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers = ChunkPrefetcher.WORKERS, thread_name_prefix = "chunk_prefetch")
+        self.pending[chunk_coords] = self.executor.submit(self.generate_noise, self.map.perlin_temperature, chunk_coords)
+
+    def collect(self):
+        # Hand the finished chunks to the map, on the main thread
+        done = [chunk_coords for chunk_coords, future in self.pending.items() if future.done()]
+        for chunk_coords in done[:self.max_chunks_per_update]:
+            future = self.pending.pop(chunk_coords)
+            if future.cancelled() or future.exception() is not None:
+                continue
+            if self.map.map_chunks.get(chunk_coords, None) is None:
+                noise = future.result()
+                perlin_chunks = self.map.perlin_temperature.chunks
+                if perlin_chunks.get((chunk_coords.x, chunk_coords.y)) is None:
+                    perlin_chunks[(chunk_coords.x, chunk_coords.y)] = (noise, noise.min(), noise.max())
+                self.map.get_chunk(chunk_coords)
+                self.prefetched.add(chunk_coords)
+
+    def update(self, camera_pos, view_size, duration):
+        self.collect()
+
+        if self.last_camera_pos is not None and duration > 0:
+            movement = camera_pos - self.last_camera_pos
+            speed = movement.distance(Point.origin()) / duration
+            if speed < ChunkPrefetcher.MIN_SPEED:
+                self.direction = Point.origin()
+            else:
+                self.direction = Point((movement.x > 0) - (movement.x < 0), (movement.y > 0) - (movement.y < 0))
+        self.last_camera_pos = camera_pos
+
+        if self.direction == Point.origin() or self.radius <= 0:
+            return
+
+        # Visible chunks, then the band of <radius> chunks beyond the edges the camera moves towards
+        chunk_pixel_size = self.map.CELL_SIZE * Perlin.CHUNK_SIZE
+        tl = (camera_pos - view_size // 2) // chunk_pixel_size
+        br = (camera_pos + view_size // 2) // chunk_pixel_size
+        min_x = int(tl.x) - (self.radius if self.direction.x < 0 else 0)
+        max_x = int(br.x) + (self.radius if self.direction.x > 0 else 0)
+        min_y = int(tl.y) - (self.radius if self.direction.y < 0 else 0)
+        max_y = int(br.y) + (self.radius if self.direction.y > 0 else 0)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                if x < tl.x or x > br.x or y < tl.y or y > br.y:
+                    self.request(Point(x, y))
+
+    def record(self, chunk_coords, missing):
+        # Called for every chunk the view needs
+        if missing:
+            self.misses += 1
+        elif chunk_coords in self.prefetched:
+            self.prefetched.discard(chunk_coords)
+            self.hits += 1
+
+    def clear(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.prefetched.clear()
+        self.last_camera_pos = None
+        self.direction = Point.origin()
@@ -0,0 +1,71 @@
+# Entities by stable id (hid for the humans, sid for the structures), kept in a slot map: a dense list to go through them
+# and the slot of each id in it. A removed entity is replaced by the last one, so adding, removing and finding one is O(1).
+# The entities are also indexed by owner and by type.
+class EntityRegistry:
+    __slots__ = ["entities", "ids", "slots", "groups", "owners", "types"]
+
+    def __init__(self) -> None:
+        self.entities = [] # Dense list of the entities
+        self.ids = [] # ids[slot] is the id of entities[slot]
+        self.slots = {} # {id: slot}
+        self.groups = {} # {id: (owner, type)}
+        self.owners = {} # {owner: {id: entity}}
+        self.types = {} # {type: {id: entity}}
+
+    def add(self, entity_id, entity, owner = None, entity_type = None):
+        if entity_id in self.slots:
+            raise KeyError(f"Entity id {entity_id} already registered")
+        self.slots[entity_id] = len(self.entities)
+        self.entities.append(entity)
+        self.ids.append(entity_id)
+        self.groups[entity_id] = (owner, entity_type)
+        self.owners.setdefault(owner, {})[entity_id] = entity
+        self.types.setdefault(entity_type, {})[entity_id] = entity
+
+    def remove(self, entity_id):
+        # The removed entity, None if the id is not registered
+        slot = self.slots.pop(entity_id, None)
+        if slot is None:
+            return None
+        entity = self.entities[slot]
+        last_entity = self.entities.pop()
+        last_id = self.ids.pop()
+        if slot < len(self.entities):
+            self.entities[slot] = last_entity
+            self.ids[slot] = last_id
+            self.slots[last_id] = slot
+
+        owner, entity_type = self.groups.pop(entity_id)
+        for index, key in [(self.owners, owner), (self.types, entity_type)]:
+            group = index[key]
+            del group[entity_id]
+            if len(group) == 0:
+                del index[key]
+        return entity
+
+    def get(self, entity_id, default = None):
+        slot = self.slots.get(entity_id, None)
+        return default if slot is None else self.entities[slot]
+
+    def by_owner(self, owner):
+        return list(self.owners.get(owner, {}).values())
+
+    def by_type(self, entity_type):
+        return list(self.types.get(entity_type, {}).values())
+
+    def __contains__(self, entity_id):
+        return entity_id in self.slots
+
+    def __iter__(self):
+        return iter(self.entities)
+
+    def __len__(self):
+        return len(self.entities)
+
+    def clear(self):
+        self.entities.clear()
+        self.ids.clear()
+        self.slots.clear()
+        self.groups.clear()
+        self.owners.clear()
+        self.types.clear()
@@ -0,0 +1,182 @@
+import numpy as np
+
+from model.AStar import NEIGHBORS
+from model.Geometry import Point
+from model.Perlin import Perlin
+
+def shift(array, dx, dy, fill):
+    # shifted[x, y] = array[x + dx, y + dy]
+    shifted = np.full_like(array, fill)
+    width, height = array.shape
+    shifted[max(0, -dx):width - max(0, dx), max(0, -dy):height - max(0, dy)] = array[max(0, dx):width - max(0, -dx), max(0, dy):height - max(0, -dy)]
+    return shifted
+
+# Distances of a field relaxed from a snapshot of its costs, in every direction at once until nothing changes.
+# It only reads its own arrays, so that a worker can run it, or the main thread a few iterations per frame.
+class FieldSolver:
+    __slots__ = ["costs", "source", "moves", "distances", "finished"]
+
+    def __init__(self, costs, source) -> None:
+        self.costs = costs
+        self.source = source
+        self.moves = None
+        self.distances = None
+        self.finished = False
+
+    def step(self, iterations):
+        if self.moves is None:
+            # Cost of the move to each neighbor, entering its cell, inf without corner cutting for the diagonals
+            free = self.costs != np.inf
+            self.moves = []
+            for dx, dy, cost in NEIGHBORS:
+                valid = free & shift(free, dx, dy, False)
+                if dx != 0 and dy != 0:
+                    valid &= shift(free, dx, 0, False) & shift(free, 0, dy, False)
+                self.moves.append((dx, dy, np.where(valid, cost * shift(self.costs, dx, dy, np.inf), np.inf)))
+            self.distances = np.full(self.costs.shape, np.inf)
+            self.distances[self.source] = 0
+
+        for _ in range(iterations):
+            new_distances = self.distances
+            for dx, dy, move_costs in self.moves:
+                new_distances = np.minimum(new_distances, shift(self.distances, dx, dy, np.inf) + move_costs)
+            if np.array_equal(new_distances, self.distances):
+                self.finished = True
+                break
+            self.distances = new_distances
+        return self
+
+    def run(self):
+        return self.step(self.costs.size)
+
+# Distance to a building over the chunks around it. Every human going to the building follows the decreasing distance
+# instead of running its own search. The field is rebuilt on the next use after a change in its chunks,
+# by the path service off the main thread, or right away by build when a path is needed at once.
+class FlowField:
+    __slots__ = ["map", "building", "profile", "radius", "origin", "size", "chunks", "distances", "costs", "blocked", "dirty", "builds", "changes", "solver", "solver_changes", "future"]
+
+    RADIUS = 1 # Chunks covered around the chunk of the building
+
+    def __init__(self, map, building, profile = "walk", radius = RADIUS) -> None:
+        self.map = map
+        self.building = building
+        self.profile = profile
+        self.radius = radius
+        chunk_x = int(building.coords.x) // Perlin.CHUNK_SIZE
+        chunk_y = int(building.coords.y) // Perlin.CHUNK_SIZE
+        self.origin = ((chunk_x - radius) * Perlin.CHUNK_SIZE, (chunk_y - radius) * Perlin.CHUNK_SIZE) # First cell of the field
+        self.size = (2 * radius + 1) * Perlin.CHUNK_SIZE
+        self.chunks = [(x, y) for x in range(chunk_x - radius, chunk_x + radius + 1) for y in range(chunk_y - radius, chunk_y + radius + 1)]
+        self.distances = None
+        self.costs = None # Cost of entering each cell of the field
+        self.blocked = None
+        self.dirty = True
+        self.builds = 0
+        self.changes = 0 # Changes in the chunks of the field, to know whether a solver started before one of them
+        self.solver = None # FieldSolver of the build in progress
+        self.solver_changes = 0
+        self.future = None # Worker running the solver, None when it runs on the main thread
+
+    def contains(self, cell):
+        return 0 <= cell[0] - self.origin[0] < self.size and 0 <= cell[1] - self.origin[1] < self.size
+
+    def invalidate_chunk(self, chunk_coords):
+        if chunk_coords in self.chunks:
+            self.dirty = True
+            self.changes += 1
+
+    def get_solver(self):
+        # Solver of a snapshot of the costs of the field, taken on the main thread
+        first_chunk = Point(self.origin[0] // Perlin.CHUNK_SIZE, self.origin[1] // Perlin.CHUNK_SIZE)
+        costs = np.empty((self.size, self.size))
+
+        # Every structure but the building is an obstacle
+        building_id = self.map.occupancy.ids.get(self.building, 0)
+        for x, y in self.chunks:
+            i = (x - first_chunk.x) * Perlin.CHUNK_SIZE
+            j = (y - first_chunk.y) * Perlin.CHUNK_SIZE
+            costs[i:i + Perlin.CHUNK_SIZE, j:j + Perlin.CHUNK_SIZE] = self.map.get_cost_chunk((x, y), self.profile)
+            grid = self.map.occupancy.chunks.get((x, y), None)
+            if grid is not None:
+                costs[i:i + Perlin.CHUNK_SIZE, j:j + Perlin.CHUNK_SIZE][(grid != 0) & (grid != building_id)] = np.inf
+
+        source = (int(self.building.coords.x) - self.origin[0], int(self.building.coords.y) - self.origin[1])
+        if costs[source] == np.inf:
+            costs[source] = 1
+        return FieldSolver(costs, source)
+
+    def set_solved(self, solver):
+        self.distances = solver.distances
+        self.costs = solver.costs
+        self.blocked = solver.costs == np.inf
+        self.dirty = False
+        self.builds += 1
+
+    def build(self):
+        self.set_solved(self.get_solver().run())
+
+    def start_build(self, executor = None):
+        # Starts a build from the current chunks, run by the executor or by step_build on the main thread
+        if self.solver is not None:
+            return
+        self.solver = self.get_solver()
+        self.solver_changes = self.changes
+        if executor is not None:
+            self.future = executor.submit(self.solver.run)
+
+    def step_build(self, iterations):
+        if self.solver is not None and self.future is None:
+            self.solver.step(iterations)
+
+    def collect_build(self):
+        # Installs the distances of the build once it finished, True if the field is then up to date
+        if self.solver is None:
+            return not self.dirty
+        if self.future is not None and not self.future.done() or self.future is None and not self.solver.finished:
+            return False
+        if self.future is not None:
+            self.future.result()
+        solver = self.solver
+        self.solver = None
+        self.future = None
+        if self.dirty and self.solver_changes == self.changes:
+            self.set_solved(solver)
+        return not self.dirty
+
+    def cancel_build(self):
+        if self.future is not None:
+            self.future.cancel()
+        self.solver = None
+        self.future = None
+
+    def get_cells(self, start):
+        # Cells from start to the building following the decreasing distance, None if the building cannot be reached in the field
+        if not self.contains(start):
+            return None
+        if self.dirty:
+            self.build()
+
+        x = start[0] - self.origin[0]
+        y = start[1] - self.origin[1]
+        cells = [start]
+        distance = self.distances[x, y]
+        while distance != 0:
+            next_cell = None
+            best = np.inf
+            for dx, dy, cost in NEIGHBORS:
+                neighbor_x = x + dx
+                neighbor_y = y + dy
+                if not (0 <= neighbor_x < self.size and 0 <= neighbor_y < self.size) or self.blocked[neighbor_x, neighbor_y]:
+                    continue
+                if dx != 0 and dy != 0 and (self.blocked[neighbor_x, y] or self.blocked[x, neighbor_y]):
+                    continue
+                neighbor_distance = self.distances[neighbor_x, neighbor_y] + cost * self.costs[neighbor_x, neighbor_y]
+                if neighbor_distance < best:
+                    next_cell = (neighbor_x, neighbor_y)
+                    best = neighbor_distance
+            if next_cell is None or self.distances[next_cell] >= distance:
+                return None
+            x, y = next_cell
+            distance = self.distances[next_cell]
+            cells.append((x + self.origin[0], y + self.origin[1]))
+        return cells
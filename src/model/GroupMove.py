@@ -0,0 +1,48 @@
+from model.AStar import Obstacles, search, octile, cells_to_path
+from model.Geometry import Point
+
+# Humans sent to a cell with a single search: the human closest to the center of the group leads,
+# the others join its path and leave it at the end to a slot around the cell, keeping their place in the group.
+# The path of the leader is solved by the path service like the one of a human, the members waiting until set_path.
+class GroupMove:
+    __slots__ = ["map", "members", "center", "leader_start", "goal", "location", "profile"]
+
+    FOLLOW_EXPANSIONS = 500 # Nodes expanded by the short searches of the members joining and leaving the path of the leader
+
+    def __init__(self, map, members, center, leader_start, location, profile = "walk") -> None:
+        self.map = map
+        self.members = members # [(Human, (x, y) (start cell))], the ones whose orders did not change since
+        self.center = center
+        self.leader_start = leader_start
+        self.goal = (int(location.x), int(location.y))
+        self.location = location
+        self.profile = profile
+
+    def remove(self, human):
+        self.members = [member for member in self.members if member[0] is not human]
+
+    def set_path(self, path):
+        # Path of the leader in pixels, None if there is none
+        for human, _ in self.members:
+            self.map.path_service.groups.pop(human, None)
+        cell_size = self.map.CELL_SIZE
+        leader_cells = None if path is None else [(int(point.x) // cell_size, int(point.y) // cell_size) for point in path]
+        obstacles = Obstacles(self.map, self.profile)
+        slots = self.map.get_formation_slots(self.goal, len(self.members), obstacles) if leader_cells is not None else []
+
+        # The slot of each human is the one closest to its place around the center of the group
+        members = list(self.members)
+        center = self.center
+        for slot in slots:
+            human, start = min(members, key = lambda member: octile(member[1][0] - center[0], member[1][1] - center[1], slot[0] - self.goal[0], slot[1] - self.goal[1]))
+            members.remove((human, start))
+            join = search(start, self.leader_start, obstacles, GroupMove.FOLLOW_EXPANSIONS)
+            leave = search(self.goal, slot, obstacles, GroupMove.FOLLOW_EXPANSIONS)
+            if join is None or leave is None:
+                human.set_target_location(Point(*slot))
+            else:
+                human.set_target_location(Point(*slot), cells_to_path(join + leader_cells[1:] + leave[1:], cell_size))
+
+        # Without a path or a slot, the humans search their own path
+        for human, _ in members:
+            human.set_target_location(self.location)
@@ -1,5 +1,4 @@
 from enum import Enum
-from math import inf
 from random import uniform
 
 from model.Entity import Entity
@@ -7,7 +6,7 @@ from model.Structures import StructureType, BuildingType, BuildingState, OreType
 from model.Ressource import RessourceType
 from model.Geometry import Point
 from model.Map import Map
-from model.AStar import AStar
+from model.Perlin import Perlin
 from model.Upgrades import Upgrades
 from model.HumanType import HumanType
 from model.Tools import Directions
@@ -29,10 +28,22 @@ class GatherState(Enum):
     GATHERING = 1
     DEPOSITING = 2
 
+HUMAN_STATES = list(HumanState) # Indexed by the values stored in the human table
+
+def table_column(name, get, set = None):
+    # Attribute of the human kept in a column of the human table
+    def get_value(human):
+        return get(getattr(human.table, name)[human.row])
+    def set_value(human, value):
+        getattr(human.table, name)[human.row] = value if set is None else set(value)
+    return property(get_value, set_value)
+
 class Human(Entity):
-    __slots__ = ["hid", "current_location", "target_location", "building_location", "path", "resource_capacity", "gathering_speed", "damage", "ressource_type", "deposit_speed", "speed", "progression", "going_to_work", "going_to_target", "going_to_deposit", "state", "work", "gather_state", "map", "player", "target_entity", "death_callback"]
+    __slots__ = ["hid", "table", "row", "target_location", "building_location", "resource_capacity", "gathering_speed", "damage", "ressource_type", "deposit_speed", "going_to_target", "work", "gather_state", "map", "player", "target_entity", "death_callback", "route", "route_ends", "route_versions"]
 
     CELL_CENTER = Point(Map.CELL_SIZE, Map.CELL_SIZE) // 2
+    NEAREST_BUILDINGS = 8 # Candidates of find_nearest_building, closest in a straight line
+    FIGHT_RANGE = 2 # Cells within which a fighting human hits its enemies
 
     HID = 0
 
@@ -40,8 +51,11 @@ class Human(Entity):
         super().__init__(health, {})
         Human.HID += 1
         self.hid = Human.HID
+        self.table = map.human_table # The position, the path and the state of the human are in its row of the table
+        self.row = self.table.add(self)
         self.type = type
         self.current_location = location - location % Map.CELL_SIZE + Human.CELL_CENTER
+        self.cell = map.get_cell(self.current_location) # Cell of the human in the spatial hash of the map
         self.target_location = None
         self.building_location = None
         self.path = None
@@ -51,7 +65,9 @@ class Human(Entity):
         self.ressource_type = None
         self.deposit_speed = 2
         self.speed = speed
-        self.progression = 0
+        self.progression = 0 # Distance walked along the path, in cells
+        self.segment = 0 # Waypoint the current segment of the path starts from
+        self.segment_progression = 0 # Progression at the start of the segment
         self.going_to_work = False
         self.going_to_target = False
         self.going_to_deposit = False
@@ -63,49 +79,138 @@ class Human(Entity):
         self.player = player
         self.target_entity = None
         self.death_callback = death_callback
+        self.waiting_for_path = False
+        self.route = None # Path in pixels from the target to the building of a gatherer, walked both ways on each trip
+        self.route_ends = None # (target location, building location) of the route
+        self.route_versions = None # Versions of the chunks the route crosses when it was found
         self.ressources = {}
 
+    # Views over the row of the human in the table
+    current_location = table_column("positions", lambda position: Point(*position.tolist()), lambda point: (point.x, point.y))
+    cell = table_column("cells", lambda cell: tuple(cell.tolist()))
+    speed = table_column("speeds", float)
+    progression = table_column("progressions", float)
+    segment = table_column("segments", int)
+    segment_progression = table_column("segment_progressions", float)
+    state = table_column("states", lambda state: HUMAN_STATES[state], lambda state: state.value)
+    waiting_for_path = table_column("waiting", bool)
+    going_to_work = table_column("going_to_work", bool)
+    going_to_deposit = table_column("going_to_deposit", bool)
+
+    @property
+    def path(self):
+        return self.table.paths[self.row]
+
+    @path.setter
+    def path(self, path):
+        self.table.paths[self.row] = path
+        self.table.segment_lengths[self.row] = 0
+
+    def is_enemy(self, human):
+        return human.player != self.player and human.health > 0
+
+    def get_enemy_in_range(self):
+        # The target when it is in range, otherwise the nearest enemy in range, from the spatial hash of the map
+        x, y = self.cell
+        enemies = self.map.human_hash.query_radius(x, y, Human.FIGHT_RANGE, self.is_enemy)
+        if len(enemies) == 0:
+            return None
+        if self.target_entity in enemies:
+            return self.target_entity
+        return self.map.human_hash.nearest(x, y, 1, self.is_enemy, Human.FIGHT_RANGE)[0]
+
     def find_nearest_building(self, building_types):
-        buildings = []
-        for building_type in building_types:
-            actual_buildings = self.map.building_type.get(building_type, None)
-            if actual_buildings is not None:
-                for building in actual_buildings:
-                    if building.state != BuildingState.PLACED and building.state != BuildingState.BUILDING:
-                        buildings.append(building)
-
-        nearest_building = None
-        min_path = None
-        min_distance = +inf
-        for building in buildings:
-            path = AStar(self.current_location // Map.CELL_SIZE, building.coords, self.map)
-            distance = +inf if path is None else len(path)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_building = building
-                min_path = path
-
-        return nearest_building.coords, min_path
+        # One search to the closest finished buildings of the types, the first one reached being the nearest
+        cell = self.current_location // Map.CELL_SIZE
+        buildings = self.map.building_index.nearest(building_types, cell, Human.NEAREST_BUILDINGS, lambda building: building.state == BuildingState.BUILT)
+        if len(buildings) == 0:
+            return None, None
+
+        end, path = self.map.find_nearest_path(cell, [building.coords for building in buildings])
+        if end is None:
+            # No building reachable: fall back to the closest one in a straight line
+            return buildings[0].coords, None
+        return end, path
+
+    def has_route(self, target_location):
+        # Whether the round trip to the target is cached and nothing changed on its chunks since
+        if self.route is None or self.route_ends[0] != target_location:
+            return False
+        if not self.map.path_service.is_current(self.route_versions):
+            self.route = None
+            return False
+        return True
+
+    def get_deposit_building(self, target_location, building_types):
+        # Building of the round trip to the target if it is cached, the nearest one otherwise
+        if self.has_route(target_location):
+            return self.route_ends[1]
+        building_location, _ = self.find_nearest_building(building_types)
+        return building_location
+
+    def get_route(self, location):
+        # Cached path to location on a gathering trip, None if it has to be searched
+        if self.work != HumanWork.GATHERING or not self.has_route(self.target_location):
+            return None
+        if self.going_to_target and location == self.route_ends[0]:
+            return self.route[::-1]
+        if not self.going_to_target and location == self.route_ends[1]:
+            return list(self.route)
+        return None
+
+    def set_route(self, path):
+        # Keeps the path of a gatherer from its target to its building, and the versions of the chunks it crosses
+        self.route = list(path)
+        self.route_ends = (self.target_location, self.building_location)
+        chunks = set()
+        cells = [point // Map.CELL_SIZE for point in path]
+        for a, b in zip(cells, cells[1:] + cells[-1:]):
+            # A straight segment stays in the rectangle of its ends
+            for x in range(int(min(a.x, b.x)) // Perlin.CHUNK_SIZE, int(max(a.x, b.x)) // Perlin.CHUNK_SIZE + 1):
+                for y in range(int(min(a.y, b.y)) // Perlin.CHUNK_SIZE, int(max(a.y, b.y)) // Perlin.CHUNK_SIZE + 1):
+                    chunks.add((x, y))
+        self.route_versions = self.map.path_service.get_versions(chunks)
 
     def move(self, duration):
-        old_progression = self.progression
-        self.progression += duration * self.speed
-        path_start = 0
-        path_end = 0
+        # The waypoints of the path can be several cells apart, the human walks along it at the same speed.
+        # The segment it stops in is kept in the table, for HumanTable.move to walk it on the next updates
+        path = self.path
+        old_progression = progression = self.progression
+        progression += duration * self.speed
+        segment = self.segment
+        segment_progression = self.segment_progression
         diff = None
 
-        if self.progression < len(self.path) - 1:
-            self.progression = min(self.progression, len(self.path) - 1)
-            path_start = int(self.progression)
-            path_end = path_start + 1
-            diff = (self.path[path_end] - self.path[path_start])
-            self.current_location = self.path[path_start] + diff * (self.progression % 1)
+        if segment >= len(path) or progression < segment_progression:
+            segment = 0
+            segment_progression = 0
+        while segment < len(path) - 1:
+            diff = path[segment + 1] - path[segment]
+            length = diff.distance(Point.origin()) / Map.CELL_SIZE
+            if progression < segment_progression + length:
+                self.current_location = path[segment] + diff * ((progression - segment_progression) / length)
+                self.table.segment_starts[self.row] = (path[segment].x, path[segment].y)
+                self.table.segment_diffs[self.row] = (diff.x, diff.y)
+                self.table.segment_lengths[self.row] = length
+                break
+            segment += 1
+            segment_progression += length
         else:
-            self.current_location = self.path[-1]
-            self.progression = len(self.path) - 1
-            if len(self.path) > 1:
-                diff = (self.path[-2] - self.path[-1])
+            self.current_location = path[-1]
+            progression = segment_progression
+            self.table.segment_lengths[self.row] = 0
+            diff = None
+            if len(path) > 1:
+                diff = (path[-2] - path[-1])
+        self.progression = progression
+        self.segment = segment
+        self.segment_progression = segment_progression
         
+        location = self.current_location
+        cell = (int(location.x) // Map.CELL_SIZE, int(location.y) // Map.CELL_SIZE)
+        if cell != self.cell:
+            self.map.human_moved(self, cell)
+
         if diff is not None:
             if diff.x > 0:
                 self.orientation = Directions.RIGHT
@@ -117,7 +222,7 @@ class Human(Entity):
                 elif diff.y < 0:
                     self.orientation = Directions.TOP
 
-        return 0 if self.progression < len(self.path) - 1 else duration - (len(self.path) - 1 - old_progression) / self.speed
+        return 0 if segment < len(path) - 1 else duration - (progression - old_progression) / self.speed
     
     def get_ressource_count(self, ressources):
         count = 0
@@ -144,7 +249,7 @@ class Human(Entity):
         self.ressources[self.ressource_type] += min(duration * gathering_speed, capacity)
         duration_left = 0 if self.get_ressource_count(self.ressources) < self.resource_capacity else duration - capacity / gathering_speed
         
-        struct =  self.map.occupied_coords.get(self.target_location, None)
+        struct =  self.map.occupancy.get(self.target_location, None)
         if struct is None or struct.structure_type == StructureType.ORE or struct.structure_type == StructureType.TREE:
             struct_destroyed = False
             if struct is not None:
@@ -176,16 +281,29 @@ class Human(Entity):
         
         return 0 if self.get_ressource_count(self.ressources) > 0 else duration - total_deposit / self.deposit_speed
 
-    def set_target_location(self, location):
+    def set_target_location(self, location, path = None, wait = False):
+        # The path in pixels can be given when it is already known, or later through set_path when waiting, as in a group move
         self.target_location = location
-        self.go_to_location(self.target_location)
+        self.go_to_location(self.target_location, path, wait)
 
     def set_target_entity(self, entity):
         self.target_entity = entity
         self.go_to_location(self.target_entity.current_location)
 
     def create_path(self, location):
-        self.path = AStar(self.current_location // Map.CELL_SIZE, location, self.map)
+        # The path is solved by the path service and set on a later update, the human waits until then
+        self.path = [self.current_location]
+        self.waiting_for_path = True
+        self.map.path_service.request(self, self.current_location // Map.CELL_SIZE, location)
+
+    def set_path(self, path):
+        self.waiting_for_path = False
+        if path is not None and self.work == HumanWork.GATHERING and self.gather_state == GatherState.DEPOSITING and not self.going_to_target and self.map.occupancy.get(self.target_location, None) is not None:
+            self.set_route(path)
+        self.progression = 0
+        self.segment = 0
+        self.segment_progression = 0
+        self.path = path
         if self.path is None:
             self.path = [self.current_location]
         else:
@@ -193,14 +311,14 @@ class Human(Entity):
                 self.path[0] = self.current_location
             self.path[-1] = self.path[-1] + Point(uniform(-1, 1), uniform(-1, 1)) * Map.CELL_SIZE
         
-    def go_to_location(self, location):
+    def go_to_location(self, location, path = None, wait = False):
         if self.work == HumanWork.BUILDING:
-            building = self.map.occupied_coords.get(self.building_location, None)
+            building = self.map.occupancy.get(self.building_location, None)
             if building is not None:
                 building.addWorkers(-1)
 
         self.progression = 0
-        struct = self.map.occupied_coords.get(location, None)
+        struct = self.map.occupancy.get(location, None)
         if struct is None:
             self.state = HumanState.MOVING
             self.work = HumanWork.IDLE
@@ -219,7 +337,7 @@ class Human(Entity):
                             self.gather_state = GatherState.GATHERING
                             self.ressource_type = RessourceType.FOOD
                             self.going_to_target = True
-                            self.building_location, _ = self.find_nearest_building([BuildingType.BASE_CAMP, BuildingType.PANTRY])
+                            self.building_location = self.get_deposit_building(location, [BuildingType.BASE_CAMP, BuildingType.PANTRY])
                         else:
                             self.building_location = location
                 else:
@@ -232,18 +350,30 @@ class Human(Entity):
                 self.gather_state = GatherState.GATHERING
                 self.ressource_type = oreToRessourceType[struct.type]
                 self.going_to_target = True
-                self.building_location, _ = self.find_nearest_building([BuildingType.BASE_CAMP, BuildingType.MINER_CAMP])
+                self.building_location = self.get_deposit_building(location, [BuildingType.BASE_CAMP, BuildingType.MINER_CAMP])
             elif struct.structure_type == StructureType.TREE:
                 self.work = HumanWork.GATHERING
                 self.gather_state = GatherState.GATHERING
                 self.ressource_type = RessourceType.WOOD
                 self.going_to_target = True
-                self.building_location, _ = self.find_nearest_building([BuildingType.BASE_CAMP, BuildingType.LUMBER_CAMP])
-        self.create_path(location)
+                self.building_location = self.get_deposit_building(location, [BuildingType.BASE_CAMP, BuildingType.LUMBER_CAMP])
+        if wait:
+            self.map.path_service.cancel(self)
+            self.path = [self.current_location]
+            self.waiting_for_path = True
+            return
+        if path is None:
+            # Gatherers walk the cached route of their round trip both ways
+            path = self.get_route(location)
+        if path is None:
+            self.create_path(location)
+        else:
+            self.map.path_service.cancel(self)
+            self.set_path(path)
 
     def update(self, duration):
         result = False
-        if self.state != HumanState.IDLE:
+        if self.state != HumanState.IDLE and not self.waiting_for_path:
             position = self.current_location
             if self.state == HumanState.MOVING or self.going_to_work:
                 duration = self.move(duration)
@@ -251,13 +381,13 @@ class Human(Entity):
                     if self.work != HumanWork.IDLE:
                         self.going_to_work = False
                         if self.work == HumanWork.BUILDING:
-                            building = self.map.occupied_coords.get(self.building_location, None)
+                            building = self.map.occupancy.get(self.building_location, None)
                             if building is not None:
                                 building.addWorkers(1)
                     else:
                         self.state = HumanState.IDLE
                         duration = 0
-            while duration > 0:
+            while duration > 0 and not self.waiting_for_path:
                 if self.state == HumanState.WORKING:
                     if self.going_to_deposit:
                         duration = self.move(duration)
@@ -278,7 +408,7 @@ class Human(Entity):
                                 self.going_to_target = True
                                 self.go_to_location(self.target_location)
                     elif self.work == HumanWork.DESTROYING:
-                        struct = self.map.occupied_coords.get(self.target_location, None)
+                        struct = self.map.occupancy.get(self.target_location, None)
                         if struct is not None and struct.structure_type == StructureType.BUILDING:
                             struct.destroy(duration * self.gathering_speed)
                             self.state = HumanState.IDLE
@@ -287,15 +417,17 @@ class Human(Entity):
                         duration = 0
                     elif self.work == HumanWork.HUNTING or self.work == HumanWork.FIGHTING:
                         if self.work == HumanWork.FIGHTING:
-                            if self.target_entity.health > 0:
-                                if self.target_entity.current_location.distance(self.current_location) <= Map.CELL_SIZE * 2:
-                                    if self.target_entity.take_damage(self.damage):
-                                        self.state = HumanState.IDLE
-                                        self.work = HumanWork.IDLE
-                                        self.target_entity = None
-                                        duration = 0
-                                else:
-                                    self.create_path(self.target_entity.current_location)
+                            enemy = self.get_enemy_in_range()
+                            if enemy is not None:
+                                # Another enemy in range is fought while the target is out of range
+                                self.target_entity = enemy
+                                if enemy.take_damage(self.damage):
+                                    self.state = HumanState.IDLE
+                                    self.work = HumanWork.IDLE
+                                    self.target_entity = None
+                                    duration = 0
+                            elif self.target_entity.health > 0:
+                                self.create_path(self.target_entity.current_location)
                             else:
                                 self.state = HumanState.IDLE
                                 self.work = HumanWork.IDLE
@@ -314,6 +446,8 @@ class Human(Entity):
         self.work = HumanWork.IDLE
         self.going_to_work = False
         self.going_to_target = False
+        self.waiting_for_path = False
+        self.map.path_service.cancel(self)
 
     def take_damage(self, damage):
         self.health -= damage
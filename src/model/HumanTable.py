@@ -0,0 +1,83 @@
+import numpy as np
+
+# Simulation state of the humans stored by columns, one row per human, for the walking humans to be moved all at once.
+# The Human objects are views over their row; a removed row is replaced by the last one, whose human gets its new row.
+class HumanTable:
+    __slots__ = ["humans", "paths", "positions", "cells", "speeds", "progressions", "segments", "segment_progressions", "segment_starts", "segment_diffs", "segment_lengths", "states", "waiting", "going_to_work", "going_to_deposit", "moved"]
+
+    CAPACITY = 64 # Rows allocated at first, doubled when they are all used
+    COLUMNS = [("positions", np.float64, 2), ("cells", np.int64, 2), ("speeds", np.float64, 1), ("progressions", np.float64, 1), ("segments", np.int64, 1), ("segment_progressions", np.float64, 1),
+               ("segment_starts", np.float64, 2), ("segment_diffs", np.float64, 2), ("segment_lengths", np.float64, 1), ("states", np.int8, 1), ("waiting", bool, 1), ("going_to_work", bool, 1), ("going_to_deposit", bool, 1), ("moved", bool, 1)]
+    IDLE = 0 # HumanState values
+    MOVING = 1
+
+    def __init__(self, capacity = CAPACITY) -> None:
+        self.humans = [] # humans[row] is the human of the row
+        self.paths = [] # Path in pixels of each row, None if there is none
+        # positions and cells in pixels and cells, progressions in cells walked along the path.
+        # The segment of the path a human walks (start, start to end, length in cells) is kept when the human enters it,
+        # a length of 0 meaning it has to be found again by Human.move
+        for name, dtype, size in HumanTable.COLUMNS:
+            setattr(self, name, np.zeros((capacity, size) if size > 1 else capacity, dtype = dtype))
+
+    def add(self, human):
+        # The row of the new human
+        row = len(self.humans)
+        if row == len(self.states):
+            for name, dtype, size in HumanTable.COLUMNS:
+                column = getattr(self, name)
+                grown = np.zeros((2 * len(column),) + column.shape[1:], dtype = dtype)
+                grown[:row] = column
+                setattr(self, name, grown)
+        self.humans.append(human)
+        self.paths.append(None)
+        for name, _, _ in HumanTable.COLUMNS:
+            getattr(self, name)[row] = 0
+        return row
+
+    def remove(self, human):
+        # The removed human keeps its values in a table of its own, for the references left to it
+        row = human.row
+        table = HumanTable(1)
+        table.humans.append(human)
+        table.paths.append(self.paths[row])
+        for name, _, _ in HumanTable.COLUMNS:
+            getattr(table, name)[0] = getattr(self, name)[row]
+        human.table = table
+        human.row = 0
+
+        last_row = len(self.humans) - 1
+        last_human = self.humans.pop()
+        last_path = self.paths.pop()
+        if row < last_row:
+            self.humans[row] = last_human
+            self.paths[row] = last_path
+            for name, _, _ in HumanTable.COLUMNS:
+                column = getattr(self, name)
+                column[row] = column[last_row]
+            last_human.row = row
+
+    def move(self, duration, cell_size):
+        # Moves the humans walking along their path who stay in the same segment of it, the others being left to Human.move.
+        # Returns the rows whose cell changed and their new cells, the rows moved being flagged in moved
+        count = len(self.humans)
+        states = self.states[:count]
+        walking = (states != HumanTable.IDLE) & ~self.waiting[:count] & ((states == HumanTable.MOVING) | self.going_to_work[:count] | self.going_to_deposit[:count])
+        progressions = self.progressions[:count] + duration * self.speeds[:count]
+        segment_progressions = self.segment_progressions[:count]
+        lengths = self.segment_lengths[:count]
+        moved = walking & (lengths > 0) & (progressions >= segment_progressions) & (progressions < segment_progressions + lengths)
+        self.moved[:count] = moved
+
+        rows = np.flatnonzero(moved)
+        self.progressions[rows] = progressions[rows]
+        # The same operations as Human.move, for the positions to be the same
+        ratios = (progressions[rows] - segment_progressions[rows]) / lengths[rows]
+        self.positions[rows] = self.segment_starts[rows] + self.segment_diffs[rows] * ratios[:, None]
+
+        cells = self.positions[rows].astype(np.int64) // cell_size
+        changed = np.any(cells != self.cells[rows], axis = 1)
+        return rows[changed], cells[changed]
+
+    def __len__(self):
+        return len(self.humans)
@@ -1,12 +1,26 @@
 from enum import Enum
 from math import inf
-import random
+import os
+import tempfile
 
 import matplotlib.pyplot as plt
 import numpy as np
 
 from model.Perlin import Perlin
-from model.Structures import BuildingState, StructureType, Tree, Ore, OreType
+from model.ChunkCache import ChunkCache
+from model.ChunkPrefetcher import ChunkPrefetcher
+from model.Occupancy import Occupancy
+from model.PathCache import PathCache
+from model.AStar import find_cells, search_nearest, octile, smooth_cells, cells_to_path, get_allowed_structures, Obstacles
+from model.ChunkGraph import ChunkGraph
+from model.BuildingIndex import BuildingIndex
+from model.SpatialHash import SpatialHash
+from model.EntityRegistry import EntityRegistry
+from model.HumanTable import HumanTable
+from model.FlowField import FlowField
+from model.GroupMove import GroupMove
+from model.PathService import PathService
+from model.Structures import BuildingState, BuildingType, StructureType, Tree, Ore, OreType, Orientation
 from model.Geometry import Point, Rectangle
 
 
@@ -27,23 +41,73 @@ class Biomes(Enum):
     ICE_FLOE = 14
 
 class Map:
-    __slots__ = ["perlin_temperature", "perlin_humidity", "map_chunks", "trees", "ores", "buildings", "building_type", "structures", "occupied_coords", "chunk_humans", "humans", "chunk_occupied_coords", "temp_humi_biomes"]
+    __slots__ = ["perlin_temperature", "perlin_humidity", "map_chunks", "trees", "ores", "buildings", "building_index", "structures", "occupancy", "chunk_humans", "humans", "human_table", "temp_humi_biomes", "prefetcher", "generated_chunks", "modified_chunks", "spilled_chunks", "spill_directory", "cost_chunks", "path_cache", "chunk_graphs", "flow_fields", "path_service", "smooth_paths", "human_hash", "structure_hash"]
 
     CELL_SIZE = 30
-
-    def __init__(self, seed = 1) -> None:
-        self.perlin_temperature = Perlin(seed, 4, 2, 1, 50, 1)
-        self.perlin_humidity = Perlin(seed + 10, 4, 2, 1, 50, 1)
+    CHUNK_CACHE_BUDGET = 16 * 1024 * 1024 # Bytes of biome chunks kept in memory
+
+    # Height tresholds (upper bounds of each interval) and the biome of each interval
+    HEIGHT_TRESHOLDS = np.array([-4, -2.75, 0, 2.5, 4.5])
+    HEIGHT_BIOMES = np.array([Biomes.LAVA.value, Biomes.VOLCANO.value, Biomes.PLAIN.value, Biomes.FOREST.value, Biomes.MOUNTAIN.value, Biomes.SNOWY_PEAK.value], dtype=np.uint8)
+
+    # Cost of walking into a cell of each biome, indexed by biome value. Costs are at least 1, inf for the impassable biomes
+    WALK_COSTS = np.ones(256, dtype=np.float32)
+    WALK_COSTS[[Biomes.LAVA.value, Biomes.OCEAN.value]] = np.inf
+    WALK_COSTS[[Biomes.VOLCANO.value, Biomes.MOUNTAIN.value]] = 2
+    WALK_COSTS[Biomes.SNOWY_PEAK.value] = 3
+    WALK_COSTS[Biomes.SWAMP.value] = 1.5
+
+    # Biomes humans cannot walk on, indexed by biome value
+    IMPASSABLE = np.isinf(WALK_COSTS)
+
+    # Movement profiles of the path finding: biome costs of each kind of walker
+    PROFILES = {"walk": WALK_COSTS}
+    SMOOTH_PATHS = True # Paths keep only the waypoints where they turn, linked in straight lines
+    HIERARCHICAL_DISTANCE = 2 # Chunks between the start and the end from which paths are planned over the chunk graph
+    FORMATION_RADIUS = 6 # Cells around the destination of a group move where its members can stand
+    FLOW_FIELD_BUILDINGS = [BuildingType.BASE_CAMP, BuildingType.PANTRY, BuildingType.MINER_CAMP, BuildingType.LUMBER_CAMP] # Shared deposit destinations
+
+    # (biome, spawn probability, structure, counted ore types, count treshold, search area size), in generation order
+    # Do not put a treshold over 0.015, it will generate structures only at the start of the chunk
+    STRUCTURE_RULES = [
+        (Biomes.SNOWY_PEAK, 0.005, OreType.CRYSTAL, [OreType.CRYSTAL], 3, 3),
+        (Biomes.MOUNTAIN, 0.01, OreType.COPPER, [OreType.COPPER], 2, 1),
+        (Biomes.FOREST, 0.015, OreType.IRON, [OreType.IRON, OreType.STONE], 2, 1),
+        (Biomes.FOREST, 0.010, OreType.GOLD, [OreType.COPPER, OreType.IRON, OreType.STONE], 2, 2),
+        (Biomes.FOREST, 0.015, StructureType.TREE, None, 15, 1),
+        (Biomes.PLAIN, 0.015, OreType.STONE, [OreType.STONE], 2, 1),
+        (Biomes.PLAIN, 0.01, StructureType.TREE, None, 5, 2),
+        (Biomes.VOLCANO, 0.005, OreType.VULCAN, [OreType.VULCAN], 1, 5)
+    ]
+
+    def __init__(self, seed = 1, chunk_cache_budget = CHUNK_CACHE_BUDGET, noise_cache_budget = Perlin.CACHE_BUDGET) -> None:
+        self.perlin_temperature = Perlin(seed, 4, 2, 1, 50, 1, noise_cache_budget)
+        self.perlin_humidity = Perlin(seed + 10, 4, 2, 1, 50, 1, noise_cache_budget)
         #self.perlin = Perlin(seed, 4, 2, 2, 100, 1)
-        self.map_chunks = {}
+        self.map_chunks = ChunkCache(chunk_cache_budget, evict_callback = self.chunk_evicted)
+        self.generated_chunks = set() # Chunks whose structures have been generated
+        self.modified_chunks = set() # Chunks that differ from the generated ones, spilled to disk when evicted
+        self.spilled_chunks = set()
+        self.spill_directory = None
         self.trees = {} # {Point (chunk coords): [Point]}
         self.ores = {} # {Point (chunk coords): {OreType: [Point]}}
-        self.buildings = []
-        self.building_type = {} # {StructureType: Structure}
-        self.occupied_coords = {} # {Point: Structure}
-        self.chunk_humans = {} # {Point (chunk coords): [Humans]}
-        self.humans = []
-        self.chunk_occupied_coords = {} # {Point (chunk coords): [Point]}
+        self.buildings = EntityRegistry() # Buildings by sid, player and BuildingType
+        self.building_index = BuildingIndex()
+        self.occupancy = Occupancy() # Structure of each occupied cell
+        self.chunk_humans = {} # {Point (chunk coords): {Human: None}}
+        self.humans = EntityRegistry() # Humans by hid, player and HumanType
+        self.human_table = HumanTable() # Simulation state of the humans, moved all at once when they walk
+        self.human_hash = SpatialHash() # Humans by cell, moved when their cell changes
+        self.structure_hash = SpatialHash() # Structures by coords
+        self.prefetcher = ChunkPrefetcher(self)
+        self.cost_chunks = {} # {profile: {(x, y) (chunk coords): float32 array}}, movement costs of the chunks in the cache
+        self.path_cache = PathCache()
+        self.chunk_graphs = {} # {profile: ChunkGraph}
+        self.flow_fields = {} # {Building: FlowField}, walking profile only
+        self.path_service = PathService(self)
+        self.smooth_paths = Map.SMOOTH_PATHS
+        self.occupancy.listeners.append(self.chunk_changed)
+        self.occupancy.structure_listeners.append(self.structure_changed)
 
         self.temp_humi_biomes = { # Rectangle(min_humi, min_temp, max_humi, max_temp): Biome
             Rectangle(-inf,  3  , -2  ,  inf): Biomes.LAVA,
@@ -62,130 +126,186 @@ class Map:
             Rectangle( 2  , -inf,  inf, -2.5): Biomes.ICE_FLOE
         }
     
-    def try_generate_tree(self, chunk_coords, position, treshold, search_area_size, tree_count_treshold):
-        if random.random() < treshold:
-            trees_count = 0
-            values = [0]
-            for i in range(1, search_area_size // 2 + 1):
-                values.append(-i)
-                values.append(i)
-
-            for i in range(search_area_size * search_area_size):
-                chunk_trees = self.trees.get(Point(chunk_coords.x + values[i // search_area_size], chunk_coords.y + values[i % search_area_size]), None)
-                if chunk_trees != None:
-                    trees_count += len(chunk_trees)
-
-            if trees_count < tree_count_treshold:
-                if self.trees.get(chunk_coords, None) == None:
-                    self.trees[chunk_coords] = []
-
-                absolute_position = chunk_coords * Perlin.CHUNK_SIZE + position
-                tree = Tree(absolute_position, self.tree_chopped_callback)
-                found = False
-                i = 0
-                while not found and i < len(tree.points):
-                    if self.occupied_coords.get(tree.points[i] + absolute_position, None) is not None:
-                        found = True
-                    i += 1
-
-                if not found:
-                    self.trees[chunk_coords].append(absolute_position)
-                    for point in tree.points:
-                        self.occupied_coords[absolute_position + point] = tree
-                        chunk_pos = (absolute_position + point) // Perlin.CHUNK_SIZE
-                        if self.chunk_occupied_coords.get(chunk_pos, None) is None:
-                            self.chunk_occupied_coords[chunk_pos] = []
-                        self.chunk_occupied_coords[chunk_pos].append(absolute_position + point)
-
-    def try_generate_ore(self, chunk_coords, position, treshold, search_area_size, search_ores, ores_count_treshold, ore_type):
-        if random.random() < treshold:
-            ores_count = 0
-            values = [0]
-            for i in range(1, search_area_size // 2 + 1):
-                values.append(-i)
-                values.append(i)
-                
-            for i in range(search_area_size * search_area_size):
-                chunk_ores = self.ores.get(Point(chunk_coords.x + values[i // search_area_size], chunk_coords.y + values[i % search_area_size]), None)
-                if chunk_ores != None:
-                    for search_ore in search_ores:
-                        actual_chunk_ores = chunk_ores.get(search_ore, None)
-                        if actual_chunk_ores != None:
-                            ores_count += len(actual_chunk_ores)
-
-            if ores_count < ores_count_treshold:
-                if self.ores.get(chunk_coords, None) == None:
-                    self.ores[chunk_coords] = {}
-                if self.ores[chunk_coords].get(ore_type, None) == None:
-                    self.ores[chunk_coords][ore_type] = []
-
-                absolute_position = chunk_coords * Perlin.CHUNK_SIZE + position
-                ore = Ore(ore_type, absolute_position, self.ore_mined_callback)
-                found = False
-                i = 0
-                while not found and i < len(ore.points):
-                    if self.occupied_coords.get(ore.points[i] + absolute_position, None) is not None:
-                        found = True
-                    i += 1
-
-                if not found:
-                    self.ores[chunk_coords][ore_type].append(absolute_position)
-                    for point in ore.points:
-                        self.occupied_coords[absolute_position + point] = ore
-                        chunk_pos = (absolute_position + point) // Perlin.CHUNK_SIZE
-                        if self.chunk_occupied_coords.get(chunk_pos, None) is None:
-                            self.chunk_occupied_coords[chunk_pos] = []
-                        self.chunk_occupied_coords[chunk_pos].append(absolute_position + point)
-
-
-    def process_chunk(self, chunk_temperature_data, chunk_humidity_data, chunk_coords):
-        processed_chunk = np.empty((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype=int)
-        for i in range(Perlin.CHUNK_SIZE):
-            for j in range(Perlin.CHUNK_SIZE):
-                """
-                humi_temp = Point(chunk_humidity_data[i][j], chunk_temperature_data[i][j])
-                position = Point(i, j)
-
-                for rect, biome in self.temp_humi_biomes.items():
-                    if rect.containsPoint(humi_temp):
-                        processed_chunk[i][j] = biome.value
-                        break"""
-
-                position = Point(i, j)
-                height = chunk_temperature_data[i][j]
-                # Do not put a treshold over 0.015, it will generate structures only at the start of the chunk
-                if height > 4.5:
-                    processed_chunk[i][j] = Biomes.SNOWY_PEAK.value
-                    self.try_generate_ore(chunk_coords, position, 0.005, 3, [OreType.CRYSTAL], 3, OreType.CRYSTAL)
-                elif height > 2.5:
-                    processed_chunk[i][j] = Biomes.MOUNTAIN.value
-                    self.try_generate_ore(chunk_coords, position, 0.01, 1, [OreType.COPPER], 2, OreType.COPPER)
-                elif height > 0:
-                    processed_chunk[i][j] = Biomes.FOREST.value
-                    self.try_generate_ore(chunk_coords, position, 0.015, 1, [OreType.IRON, OreType.STONE], 2, OreType.IRON)
-                    self.try_generate_ore(chunk_coords, position, 0.010, 2, [OreType.COPPER, OreType.IRON, OreType.STONE], 2, OreType.GOLD)
-                    self.try_generate_tree(chunk_coords, position, 0.015, 1, 15)
-                elif height > -2.75:
-                    processed_chunk[i][j] = Biomes.PLAIN.value
-                    self.try_generate_ore(chunk_coords, position, 0.015, 1, [OreType.STONE], 2, OreType.STONE)
-                    self.try_generate_tree(chunk_coords, position, 0.01, 2, 5)
-                elif height > -4:
-                    processed_chunk[i][j] = Biomes.VOLCANO.value
-                    self.try_generate_ore(chunk_coords, position, 0.005, 5, [OreType.VULCAN], 1, OreType.VULCAN)
-                else:
-                    processed_chunk[i][j] = Biomes.LAVA.value
+    def get_chunk_random(self, chunk_coords):
+        # Independent stream for each chunk, derived only from the world seed and the chunk coordinates
+        return np.random.default_rng([self.perlin_temperature.seed & 0xFFFFFFFF, chunk_coords.x & 0xFFFFFFFF, chunk_coords.y & 0xFFFFFFFF])
+
+    def get_structure_limit(self, rng, count_treshold, search_area_size):
+        # Count tresholds used to apply to the search_area_size² chunks around the chunk, they are spread over
+        # the chunk itself so that its structures do not depend on the neighbour chunks generated before it
+        limit = count_treshold / (search_area_size * search_area_size)
+        return int(limit) + int(rng.random() < limit % 1)
+
+    def fits_in_chunk(self, structure, chunk_coords):
+        for point in structure.points:
+            if (structure.coords + point) // Perlin.CHUNK_SIZE != chunk_coords:
+                return False
+        return True
+
+    def try_generate_tree(self, chunk_coords, position, rng, trees_limit):
+        chunk_trees = self.trees.get(chunk_coords, None)
+        trees_count = 0 if chunk_trees is None else len(chunk_trees)
+
+        if trees_count < trees_limit:
+            if self.trees.get(chunk_coords, None) == None:
+                self.trees[chunk_coords] = []
+
+            absolute_position = chunk_coords * Perlin.CHUNK_SIZE + position
+            tree = Tree(absolute_position, self.tree_chopped_callback, Orientation(int(rng.integers(1, 5))))
+            if self.fits_in_chunk(tree, chunk_coords) and self.occupancy.is_free(tree):
+                self.trees[chunk_coords].append(absolute_position)
+                self.occupancy.add(tree)
+
+    def try_generate_ore(self, chunk_coords, position, rng, search_ores, ores_limit, ore_type):
+        ores_count = 0
+        chunk_ores = self.ores.get(chunk_coords, None)
+        if chunk_ores != None:
+            for search_ore in search_ores:
+                actual_chunk_ores = chunk_ores.get(search_ore, None)
+                if actual_chunk_ores != None:
+                    ores_count += len(actual_chunk_ores)
+
+        if ores_count < ores_limit:
+            if self.ores.get(chunk_coords, None) == None:
+                self.ores[chunk_coords] = {}
+            if self.ores[chunk_coords].get(ore_type, None) == None:
+                self.ores[chunk_coords][ore_type] = []
+
+            absolute_position = chunk_coords * Perlin.CHUNK_SIZE + position
+            ore = Ore(ore_type, absolute_position, self.ore_mined_callback, Orientation(int(rng.integers(1, 5))))
+            if self.fits_in_chunk(ore, chunk_coords) and self.occupancy.is_free(ore):
+                self.ores[chunk_coords][ore_type].append(absolute_position)
+                self.occupancy.add(ore)
+
+    def process_chunk(self, chunk_temperature_data, chunk_humidity_data, chunk_coords, generate_structures = True):
+        processed_chunk = Map.HEIGHT_BIOMES[np.digitize(chunk_temperature_data, Map.HEIGHT_TRESHOLDS, right = True)]
+        if generate_structures:
+            self.generate_structures(processed_chunk, chunk_coords)
         return processed_chunk
 
+    def generate_structures(self, processed_chunk, chunk_coords):
+        rng = self.get_chunk_random(chunk_coords)
+        limits = []
+        candidates = []
+        for rule_index, (biome, treshold, structure, _, count_treshold, search_area_size) in enumerate(Map.STRUCTURE_RULES):
+            limits.append(self.get_structure_limit(rng, count_treshold, search_area_size))
+            # One draw per cell of the chunk, kept only on the cells of the rule biome
+            spawn_mask = (processed_chunk == biome.value) & (rng.random(processed_chunk.shape) < treshold)
+            for i, j in np.argwhere(spawn_mask):
+                candidates.append((int(i), int(j), rule_index))
+
+        # Same order as a cell by cell pass over the chunk
+        candidates.sort()
+        for i, j, rule_index in candidates:
+            _, _, structure, search_ores, _, _ = Map.STRUCTURE_RULES[rule_index]
+            position = Point(i, j)
+            if structure == StructureType.TREE:
+                self.try_generate_tree(chunk_coords, position, rng, limits[rule_index])
+            else:
+                self.try_generate_ore(chunk_coords, position, rng, search_ores, limits[rule_index], structure)
+
     def get_chunk(self, chunk_coords):
-        if self.map_chunks.get(chunk_coords, None) is None:
-            chunk_temperature = self.perlin_temperature.get_chunk(chunk_coords.x, chunk_coords.y)
-            #chunk_humidity = self.perlin_humidity.get_chunk(chunk_coords.x, chunk_coords.y)
-            processed_chunk = self.process_chunk(chunk_temperature[0], None, chunk_coords)#chunk_humidity[0], chunk_coords)
-            self.map_chunks[chunk_coords] = processed_chunk
-        return self.map_chunks[chunk_coords]
+        chunk = self.map_chunks.get(chunk_coords, None)
+        if chunk is None:
+            if chunk_coords in self.spilled_chunks:
+                chunk = self.load_spilled_chunk(chunk_coords)
+            else:
+                chunk_temperature = self.perlin_temperature.get_chunk(chunk_coords.x, chunk_coords.y)
+                #chunk_humidity = self.perlin_humidity.get_chunk(chunk_coords.x, chunk_coords.y)
+                # Chunks evicted from the cache are regenerated without their structures, which are still on the map
+                chunk = self.process_chunk(chunk_temperature[0], None, chunk_coords, chunk_coords not in self.generated_chunks)#chunk_humidity[0], chunk_coords)
+                self.generated_chunks.add(chunk_coords)
+            self.map_chunks[chunk_coords] = chunk
+        return chunk
+
+    def set_chunk(self, chunk_coords, chunk):
+        # Replace a chunk by one that cannot be regenerated (loaded or modified by the player)
+        self.map_chunks[chunk_coords] = chunk
+        self.generated_chunks.add(chunk_coords)
+        self.modified_chunks.add(chunk_coords)
+        self.spilled_chunks.discard(chunk_coords)
+        self.drop_cost_chunk((chunk_coords.x, chunk_coords.y))
+        self.chunk_changed((chunk_coords.x, chunk_coords.y))
+
+    def set_biome(self, cell, biome):
+        chunk_coords = cell // Perlin.CHUNK_SIZE
+        chunk = self.get_chunk(chunk_coords)
+        chunk[cell.x % Perlin.CHUNK_SIZE, cell.y % Perlin.CHUNK_SIZE] = biome.value
+        self.modified_chunks.add(chunk_coords)
+        self.drop_cost_chunk((chunk_coords.x, chunk_coords.y))
+        self.chunk_changed((chunk_coords.x, chunk_coords.y))
+
+    def get_spill_path(self, chunk_coords):
+        if self.spill_directory is None:
+            self.spill_directory = tempfile.TemporaryDirectory(prefix = "exodus_chunks_")
+        return os.path.join(self.spill_directory.name, f"{chunk_coords.x}_{chunk_coords.y}.npy")
+
+    def chunk_evicted(self, chunk_coords, chunk):
+        # Unmodified chunks are simply dropped, they are regenerated from the noise when needed again
+        self.drop_cost_chunk((chunk_coords.x, chunk_coords.y))
+        if chunk_coords in self.modified_chunks:
+            np.save(self.get_spill_path(chunk_coords), chunk)
+            self.spilled_chunks.add(chunk_coords)
+
+    def load_spilled_chunk(self, chunk_coords):
+        path = self.get_spill_path(chunk_coords)
+        chunk = np.load(path)
+        os.remove(path)
+        self.spilled_chunks.discard(chunk_coords)
+        return chunk
+
+    def get_chunks(self):
+        # Every chunk generated so far, including the ones evicted from the cache
+        for chunk_coords in list(self.generated_chunks):
+            yield chunk_coords, self.get_chunk(chunk_coords)
+
+    def memory_report(self):
+        # Footprint of the chunk caches, biome chunks are stored as uint8 instead of the former int64
+        cells = Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE
+        biome_chunk_bytes = cells * np.dtype(np.uint8).itemsize
+        return {
+            "biome_chunks": len(self.map_chunks),
+            "biome_chunk_bytes": biome_chunk_bytes,
+            "biome_chunk_bytes_int64": cells * np.dtype(np.int64).itemsize,
+            "biome_chunks_total_bytes": self.map_chunks.bytes,
+            "biome_chunks_total_bytes_int64": len(self.map_chunks) * cells * np.dtype(np.int64).itemsize,
+            "spilled_chunks": len(self.spilled_chunks),
+            "noise_chunks": len(self.perlin_temperature.chunks),
+            "noise_chunks_total_bytes": self.perlin_temperature.chunks.bytes
+        }
 
-    def get_area_around_chunk(self, chunk_coords, width, height):
-        # Get an area of <area_size> x <area_size> chunks around the current chunk, concatenated into one 2D array
+    def report(self):
+        # Memory footprint and path finding counters
+        report = self.memory_report()
+        for name, value in self.path_cache.report().items():
+            report[f"path_cache_{name}"] = value
+        for name, value in self.path_service.report().items():
+            report[f"path_service_{name}"] = value
+        return report
+
+    def get_region(self, chunk_coords, width, height):
+        # Generate the missing chunks of the area with one batched noise computation
+        missing_chunks = []
+        for i in range(width):
+            for j in range(height):
+                actual_chunk_coords = Point(chunk_coords.x + i, chunk_coords.y + j)
+                missing = actual_chunk_coords not in self.map_chunks
+                if missing and actual_chunk_coords not in self.spilled_chunks:
+                    missing_chunks.append(actual_chunk_coords)
+                elif missing:
+                    self.get_chunk(actual_chunk_coords)
+                self.prefetcher.record(actual_chunk_coords, missing)
+
+        if len(missing_chunks) > 0:
+            min_x = min(coords.x for coords in missing_chunks)
+            min_y = min(coords.y for coords in missing_chunks)
+            max_x = max(coords.x for coords in missing_chunks)
+            max_y = max(coords.y for coords in missing_chunks)
+            self.perlin_temperature.generate_region(min_x, min_y, max_x - min_x + 1, max_y - min_y + 1)
+            for actual_chunk_coords in missing_chunks:
+                self.get_chunk(actual_chunk_coords)
+
+        # Concatenate the area into one 2D array
         rows = []
         chunks = []
         for i in range(width):
@@ -197,42 +317,184 @@ class Map:
 
         return np.concatenate(rows, axis = 0)
 
-    def try_place_structure(self, structure):
-        center = structure.coords
-        i = 0
-        l = len(structure.points)
-        while i < l and self.occupied_coords.get(center + structure.points[i], None) is None:
-            i += 1
+    def get_area_around_chunk(self, chunk_coords, width, height):
+        # Get an area of <area_size> x <area_size> chunks around the current chunk, concatenated into one 2D array
+        return self.get_region(chunk_coords, width, height)
 
-        return i == l
+    def try_place_structure(self, structure):
+        return self.occupancy.is_free(structure)
 
     def place_structure(self, structure):
         can_place = self.try_place_structure(structure)
         if can_place:
-            center = structure.coords
-            for relative_point in structure.points:
-                absolute_point = center + relative_point
-                self.occupied_coords[absolute_point] = structure
-                chunk_coords = absolute_point // Perlin.CHUNK_SIZE
-                if self.chunk_occupied_coords.get(chunk_coords, None) is None:
-                    self.chunk_occupied_coords[chunk_coords] = []
-                self.chunk_occupied_coords[chunk_coords].append(absolute_point)
+            self.occupancy.add(structure)
 
             if structure.structure_type == StructureType.BUILDING:
-                self.buildings.append(structure)
-                type = structure.type
-                if self.building_type.get(type, None) is None:
-                    self.building_type[type] = []
-                self.building_type[type].append(structure)
+                self.buildings.add(structure.sid, structure, getattr(structure, "player", None), structure.type)
+                self.building_index.add(structure)
 
         return can_place
     
+    def get_cost_chunk(self, chunk_coords, profile = "walk"):
+        # Movement costs of the cells of a chunk (x, y), built from its biomes on first use and kept as long as the chunk
+        cost_chunks = self.cost_chunks.setdefault(profile, {})
+        cost_chunk = cost_chunks.get(chunk_coords, None)
+        if cost_chunk is None:
+            cost_chunk = Map.PROFILES[profile][self.get_chunk(Point(chunk_coords[0], chunk_coords[1]))]
+            cost_chunks[chunk_coords] = cost_chunk
+        return cost_chunk
+
+    def drop_cost_chunk(self, chunk_coords):
+        for cost_chunks in self.cost_chunks.values():
+            cost_chunks.pop(chunk_coords, None)
+
+    def chunk_changed(self, chunk_coords):
+        # Passability of a chunk changed (structure placed or removed, biome modified)
+        self.path_cache.invalidate_chunk(chunk_coords)
+        for chunk_graph in self.chunk_graphs.values():
+            chunk_graph.invalidate_chunk(chunk_coords)
+        for flow_field in self.flow_fields.values():
+            flow_field.invalidate_chunk(chunk_coords)
+        self.path_service.invalidate_chunk(chunk_coords)
+
+    def structure_changed(self, structure, added):
+        if added:
+            self.structure_hash.add(structure, (int(structure.coords.x), int(structure.coords.y)))
+        else:
+            self.structure_hash.remove(structure)
+
+    def get_chunk_graph(self, profile):
+        chunk_graph = self.chunk_graphs.get(profile, None)
+        if chunk_graph is None:
+            chunk_graph = ChunkGraph(self, profile)
+            self.chunk_graphs[profile] = chunk_graph
+        return chunk_graph
+
+    def get_flow_field(self, end):
+        # Flow field of the deposit building whose center is the end cell, if any
+        building = self.occupancy.get_cell(end[0], end[1])
+        if building is None or building.structure_type != StructureType.BUILDING or building.type not in Map.FLOW_FIELD_BUILDINGS:
+            return None
+        if (int(building.coords.x), int(building.coords.y)) != end:
+            return None
+        flow_field = self.flow_fields.get(building, None)
+        if flow_field is None:
+            flow_field = FlowField(self, building, "walk")
+            self.flow_fields[building] = flow_field
+        return flow_field
+
+    def find_path(self, start, end, profile = "walk"):
+        # Path of cell centers in pixels between two cells, None if there is none. Shared by every human
+        cells = self.find_path_cells((int(start.x), int(start.y)), (int(end.x), int(end.y)), profile)
+        if cells is None:
+            return None
+        return cells_to_path(cells, Map.CELL_SIZE)
+
+    def find_path_cells(self, start, end, profile = "walk"):
+        # Cells (x, y) between two cells (x, y), None if there is none
+        found, cells = self.path_cache.get((start, end, profile))
+        if not found:
+            cells = self.solve_path_cells(start, end, profile)
+        return cells
+
+    def solve_path_cells(self, start, end, profile = "walk"):
+        # Cells searched between two cells and added to the path cache, for a path known not to be in it
+        cells = None
+        # Humans going to a deposit building follow its flow field when they are in it
+        flow_field = self.get_flow_field(end) if profile == "walk" else None
+        if flow_field is not None:
+            cells = flow_field.get_cells(start)
+            chunks = flow_field.chunks
+        if cells is None:
+            chunk_distance = max(abs(start[0] // Perlin.CHUNK_SIZE - end[0] // Perlin.CHUNK_SIZE), abs(start[1] // Perlin.CHUNK_SIZE - end[1] // Perlin.CHUNK_SIZE))
+            if chunk_distance >= Map.HIERARCHICAL_DISTANCE:
+                cells, chunks = self.get_chunk_graph(profile).find_cells(start, end, get_allowed_structures(self, [start, end]))
+            else:
+                cells, chunks = find_cells(Point(*start), Point(*end), self, profile)
+        if self.smooth_paths and cells is not None:
+            cells = self.smooth_path(cells, Obstacles(self, profile, get_allowed_structures(self, [start, end])))
+        self.path_cache.add((start, end, profile), cells, chunks)
+        return cells
+
+    def smooth_path(self, cells, obstacles):
+        # Waypoints of the cells when the paths are smoothed
+        if not self.smooth_paths or cells is None:
+            return cells
+        return smooth_cells(cells, obstacles)
+
+    def find_nearest_path(self, start, ends, profile = "walk"):
+        # Closest of the end cells by path and the path to it in pixels, (None, None) if none is reachable
+        start = (int(start.x), int(start.y))
+        ends = frozenset((int(end.x), int(end.y)) for end in ends)
+        if len(ends) == 0:
+            return None, None
+        key = (start, ends, profile)
+        found, cells = self.path_cache.get(key)
+        if not found:
+            obstacles = Obstacles(self, profile, get_allowed_structures(self, [start, *ends]))
+            cells = self.smooth_path(search_nearest(start, ends, obstacles), obstacles)
+            self.path_cache.add(key, cells, obstacles.chunks.keys())
+        if cells is None:
+            return None, None
+        return Point(*cells[-1]), cells_to_path(cells, Map.CELL_SIZE)
+
+    def get_formation_slots(self, goal, count, obstacles):
+        # Free cells (x, y) closest to the goal, the goal first
+        slots = []
+        for radius in range(Map.FORMATION_RADIUS + 1):
+            ring = [(goal[0] + dx, goal[1] + dy) for dx in range(-radius, radius + 1) for dy in range(-radius, radius + 1) if max(abs(dx), abs(dy)) == radius]
+            ring.sort(key = lambda cell: octile(cell[0], cell[1], goal[0], goal[1]))
+            for cell in ring:
+                if not obstacles.is_blocked(cell[0], cell[1]):
+                    slots.append(cell)
+                    if len(slots) == count:
+                        return slots
+        return slots
+
+    def move_group(self, humans, location, profile = "walk"):
+        # Sends humans to a cell with a single search of the path service, see GroupMove
+        if len(humans) < 2 or self.occupancy.get(location, None) is not None:
+            for human in humans:
+                human.set_target_location(location)
+            return
+
+        starts = [(int(cell.x), int(cell.y)) for cell in (human.current_location // Map.CELL_SIZE for human in humans)]
+        center = (sum(start[0] for start in starts) / len(starts), sum(start[1] for start in starts) / len(starts))
+        leader_start = min(starts, key = lambda start: octile(start[0], start[1], center[0], center[1]))
+        group = GroupMove(self, list(zip(humans, starts)), center, leader_start, location, profile)
+        for human in humans:
+            human.set_target_location(location, wait = True)
+        self.path_service.request_group(group, leader_start, group.goal, profile)
+
+    def get_cell(self, map_position):
+        # Cell (x, y) of a position in pixels
+        return (int(map_position.x) // Map.CELL_SIZE, int(map_position.y) // Map.CELL_SIZE)
+
     def place_human(self, human, map_position):
-        chunk_pos = map_position // Map.CELL_SIZE // Perlin.CHUNK_SIZE
-        if self.chunk_humans.get(chunk_pos, None) is None:
-            self.chunk_humans[chunk_pos] = []
-        self.chunk_humans[chunk_pos].append(human)
-        self.humans.append(human)
+        human.cell = self.get_cell(map_position)
+        chunk_pos = Point(human.cell[0] // Perlin.CHUNK_SIZE, human.cell[1] // Perlin.CHUNK_SIZE)
+        self.chunk_humans.setdefault(chunk_pos, {})[human] = None
+        self.humans.add(human.hid, human, human.player, human.type)
+        self.human_hash.add(human, human.cell)
+
+    def human_moved(self, human, cell):
+        # Called by a human whose cell changed
+        if human not in self.human_hash:
+            human.cell = cell
+            return
+        old_chunk_pos = Point(human.cell[0] // Perlin.CHUNK_SIZE, human.cell[1] // Perlin.CHUNK_SIZE)
+        chunk_pos = Point(cell[0] // Perlin.CHUNK_SIZE, cell[1] // Perlin.CHUNK_SIZE)
+        human.cell = cell
+        self.human_hash.move(human, cell)
+        if chunk_pos != old_chunk_pos:
+            self.remove_chunk_human(old_chunk_pos, human)
+            self.chunk_humans.setdefault(chunk_pos, {})[human] = None
+
+    def remove_chunk_human(self, chunk_pos, human):
+        chunk_humans = self.chunk_humans[chunk_pos]
+        del chunk_humans[human]
+        if len(chunk_humans) == 0:
+            del self.chunk_humans[chunk_pos]
 
     def tree_chopped_callback(self, tree):
         try:
@@ -240,13 +502,7 @@ class Map:
         except ValueError:
             pass
 
-        for point in tree.points:
-            try:
-                actual_chunk_pos = (tree.coords + point) // Perlin.CHUNK_SIZE
-                self.occupied_coords.pop(tree.coords + point)
-                self.chunk_occupied_coords[actual_chunk_pos].remove(tree.coords + point)
-            except Exception:
-                pass
+        self.occupancy.remove(tree)
     
     def ore_mined_callback(self, ore):
         try:
@@ -254,44 +510,43 @@ class Map:
         except ValueError:
             pass
 
-        for point in ore.points:
-            try:
-                actual_chunk_pos = (ore.coords + point) // Perlin.CHUNK_SIZE
-                self.occupied_coords.pop(ore.coords + point)
-                self.chunk_occupied_coords[actual_chunk_pos].remove(ore.coords + point)
-            except Exception:
-                pass
+        self.occupancy.remove(ore)
 
     def remove_building(self, building):
-        self.buildings.remove(building)
-        self.building_type[building.type].remove(building)
-        for point in building.points:
-            self.occupied_coords.pop(building.coords + point)
-            actual_chunk_pos = (building.coords + point) // Perlin.CHUNK_SIZE
-            self.chunk_occupied_coords[actual_chunk_pos].remove(building.coords + point)
+        self.buildings.remove(building.sid)
+        self.building_index.remove(building)
+        flow_field = self.flow_fields.pop(building, None)
+        if flow_field is not None:
+            flow_field.cancel_build()
+        self.occupancy.remove(building)
 
     def remove_human(self, human):
-        self.humans.remove(human)
-        self.chunk_humans[human.current_location // Map.CELL_SIZE // Perlin.CHUNK_SIZE].remove(human)
+        self.humans.remove(human.hid)
+        self.path_service.cancel(human)
+        self.human_hash.remove(human)
+        self.remove_chunk_human(Point(human.cell[0] // Perlin.CHUNK_SIZE, human.cell[1] // Perlin.CHUNK_SIZE), human)
+        self.human_table.remove(human)
 
     def update(self, duration):
         need_render = False
 
+        # Paths solved since the last frame
+        self.path_service.update()
+
         for building in self.buildings:
             if building.update(duration):
                 need_render = True
 
-        chunk_humans = self.chunk_humans.copy()
-        for chunk_coords, humans in self.chunk_humans.items():
-            for human in humans:
-                if human.update(duration):
-                    need_render = True
-                    new_chunk_coords = human.current_location // Map.CELL_SIZE // Perlin.CHUNK_SIZE
-                    if new_chunk_coords != chunk_coords:
-                        if chunk_humans.get(new_chunk_coords, None) is None:
-                            chunk_humans[new_chunk_coords] = []
-                        chunk_humans[new_chunk_coords].append(human)
-                        chunk_humans[chunk_coords].remove(human)
-        self.chunk_humans = chunk_humans
+        # The humans walking inside a segment of their path are moved at once, the others update one by one.
+        # The humans whose cell changes move themselves in human_hash and chunk_humans
+        rows, cells = self.human_table.move(duration, Map.CELL_SIZE)
+        for row, cell in zip(rows.tolist(), cells.tolist()):
+            self.human_moved(self.human_table.humans[row], tuple(cell))
+        moved = self.human_table.moved
+        for human in self.humans:
+            if moved[human.row]:
+                need_render = True
+            elif human.update(duration):
+                need_render = True
 
         return need_render
@@ -0,0 +1,145 @@
+import numpy as np
+
+from model.Geometry import Point
+from model.Perlin import Perlin
+
+# Occupied cells of the map: one int32 grid of structure ids per chunk, 0 being a free cell.
+# The ids are local to the index, they do not depend on the structure sid (loaded saves reuse old sids).
+class Occupancy:
+    __slots__ = ["chunks", "chunk_structures", "structures", "ids", "next_id", "listeners", "structure_listeners"]
+
+    def __init__(self) -> None:
+        self.chunks = {} # {(x, y) (chunk coords): np.ndarray[int32]}
+        self.chunk_structures = {} # {(x, y) (chunk coords): {id}}
+        self.structures = {} # {id: Structure}
+        self.ids = {} # {Structure: id}
+        self.next_id = 1
+        self.listeners = [] # Called with the chunk coords (x, y) of every chunk whose occupancy changes
+        self.structure_listeners = [] # Called with every structure added or removed and whether it was added
+
+    def get_cell(self, x, y, default = None):
+        grid = self.chunks.get((x // Perlin.CHUNK_SIZE, y // Perlin.CHUNK_SIZE), None)
+        if grid is None:
+            return default
+        structure_id = grid[x % Perlin.CHUNK_SIZE, y % Perlin.CHUNK_SIZE]
+        if structure_id == 0:
+            return default
+        return self.structures[structure_id]
+
+    def get(self, cell, default = None):
+        return self.get_cell(int(cell.x), int(cell.y), default)
+
+    def __contains__(self, cell):
+        return self.get(cell) is not None
+
+    def get_id(self, structure):
+        structure_id = self.ids.get(structure, None)
+        if structure_id is None:
+            structure_id = self.next_id
+            self.next_id += 1
+            self.ids[structure] = structure_id
+            self.structures[structure_id] = structure
+        return structure_id
+
+    def get_grid(self, chunk_coords):
+        grid = self.chunks.get(chunk_coords, None)
+        if grid is None:
+            grid = np.zeros((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype = np.int32)
+            self.chunks[chunk_coords] = grid
+        return grid
+
+    def changed(self, chunk_coords):
+        for listener in self.listeners:
+            listener(chunk_coords)
+
+    def structure_changed(self, structure, added):
+        for listener in self.structure_listeners:
+            listener(structure, added)
+
+    def footprint(self, structure):
+        # Absolute cells of the structure, split by chunk: [((chunk x, chunk y), cells x, cells y)]
+        cells = np.array([(point.x, point.y) for point in structure.points], dtype = np.int64).reshape(-1, 2)
+        cells += np.array([int(structure.coords.x), int(structure.coords.y)], dtype = np.int64)
+        chunk_coords = cells // Perlin.CHUNK_SIZE
+        local_cells = cells % Perlin.CHUNK_SIZE
+        first_chunk = chunk_coords[0]
+        if (chunk_coords == first_chunk).all():
+            return [((int(first_chunk[0]), int(first_chunk[1])), local_cells[:, 0], local_cells[:, 1])]
+
+        parts = []
+        for actual_chunk_coords in np.unique(chunk_coords, axis = 0):
+            mask = (chunk_coords == actual_chunk_coords).all(axis = 1)
+            parts.append(((int(actual_chunk_coords[0]), int(actual_chunk_coords[1])), local_cells[mask, 0], local_cells[mask, 1]))
+        return parts
+
+    def is_free(self, structure):
+        for chunk_coords, xs, ys in self.footprint(structure):
+            grid = self.chunks.get(chunk_coords, None)
+            if grid is not None and grid[xs, ys].any():
+                return False
+        return True
+
+    def add(self, structure):
+        structure_id = self.get_id(structure)
+        for chunk_coords, xs, ys in self.footprint(structure):
+            self.get_grid(chunk_coords)[xs, ys] = structure_id
+            self.chunk_structures.setdefault(chunk_coords, set()).add(structure_id)
+            self.changed(chunk_coords)
+        self.structure_changed(structure, True)
+
+    def set(self, cell, structure):
+        # Occupy a single cell, used when loading a save
+        chunk_coords = (int(cell.x) // Perlin.CHUNK_SIZE, int(cell.y) // Perlin.CHUNK_SIZE)
+        structure_id = self.get_id(structure)
+        self.get_grid(chunk_coords)[int(cell.x) % Perlin.CHUNK_SIZE, int(cell.y) % Perlin.CHUNK_SIZE] = structure_id
+        self.chunk_structures.setdefault(chunk_coords, set()).add(structure_id)
+        self.changed(chunk_coords)
+        self.structure_changed(structure, True)
+
+    def remove(self, structure):
+        structure_id = self.ids.pop(structure, None)
+        if structure_id is None:
+            return
+        self.structures.pop(structure_id)
+        for chunk_coords, xs, ys in self.footprint(structure):
+            grid = self.chunks.get(chunk_coords, None)
+            if grid is None:
+                continue
+            cells = grid[xs, ys]
+            grid[xs, ys] = np.where(cells == structure_id, 0, cells)
+            chunk_structures = self.chunk_structures.get(chunk_coords, None)
+            if chunk_structures is not None:
+                chunk_structures.discard(structure_id)
+            self.changed(chunk_coords)
+        self.structure_changed(structure, False)
+
+    def get_chunk_structures(self, chunk_coords):
+        return [self.structures[structure_id] for structure_id in self.chunk_structures.get(chunk_coords, ())]
+
+    def __len__(self):
+        # Number of occupied cells
+        return sum(int(np.count_nonzero(grid)) for grid in self.chunks.values())
+
+    def chunk_cells(self):
+        # Occupied cells of each chunk: (Point (chunk coords), [Point])
+        for (chunk_x, chunk_y), grid in self.chunks.items():
+            xs, ys = np.nonzero(grid)
+            if len(xs) > 0:
+                offset_x = chunk_x * Perlin.CHUNK_SIZE
+                offset_y = chunk_y * Perlin.CHUNK_SIZE
+                yield Point(chunk_x, chunk_y), [Point(offset_x + int(x), offset_y + int(y)) for x, y in zip(xs, ys)]
+
+    def items(self):
+        # Every occupied cell with its structure: (Point, Structure)
+        for (chunk_x, chunk_y), grid in self.chunks.items():
+            xs, ys = np.nonzero(grid)
+            offset_x = chunk_x * Perlin.CHUNK_SIZE
+            offset_y = chunk_y * Perlin.CHUNK_SIZE
+            for x, y in zip(xs, ys):
+                yield Point(offset_x + int(x), offset_y + int(y)), self.structures[grid[x, y]]
+
+    def clear(self):
+        self.chunks.clear()
+        self.chunk_structures.clear()
+        self.structures.clear()
+        self.ids.clear()
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+# Paths found by A*, keyed by (start cell, end cell, passability profile).
+# Each entry depends on the chunks the search read, it is dropped when one of them changes.
+class PathCache:
+    __slots__ = ["paths", "chunk_keys", "max_paths", "hits", "misses", "invalidations"]
+
+    MAX_PATHS = 2048
+
+    def __init__(self, max_paths = MAX_PATHS) -> None:
+        self.paths = OrderedDict() # {(start, end, profile): ([(x, y)] or None, [(x, y) (chunk coords)])}
+        self.chunk_keys = {} # {(x, y) (chunk coords): {(start, end, profile)}}
+        self.max_paths = max_paths
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        # (found, cells), cells being None for a cached unreachable end
+        entry = self.paths.get(key, None)
+        if entry is None:
+            self.misses += 1
+            return False, None
+        self.paths.move_to_end(key)
+        self.hits += 1
+        return True, entry[0]
+
+    def add(self, key, cells, chunks):
+        self.remove(key)
+        chunks = list(chunks)
+        self.paths[key] = (cells, chunks)
+        for chunk_coords in chunks:
+            self.chunk_keys.setdefault(chunk_coords, set()).add(key)
+        while len(self.paths) > self.max_paths:
+            self.remove(next(iter(self.paths)))
+
+    def remove(self, key):
+        entry = self.paths.pop(key, None)
+        if entry is None:
+            return
+        for chunk_coords in entry[1]:
+            keys = self.chunk_keys.get(chunk_coords, None)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self.chunk_keys[chunk_coords]
+
+    def invalidate_chunk(self, chunk_coords):
+        keys = self.chunk_keys.get(chunk_coords, None)
+        if keys is None:
+            return
+        for key in list(keys):
+            self.remove(key)
+            self.invalidations += 1
+
+    def report(self):
+        return {
+            "paths": len(self.paths),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
+
+    def clear(self):
+        self.paths.clear()
+        self.chunk_keys.clear()
@@ -0,0 +1,343 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from model.AStar import AStarSearch, JumpPointSearch, Obstacles, MAX_EXPANSIONS, cells_to_path, get_allowed_structures, get_search_box, get_jump_bounds, search_with_jumps
+from model.Geometry import Point
+
+class PathRequest:
+    __slots__ = ["key", "future", "search", "obstacles", "bounds", "jump_bounds", "max_expansions", "versions", "unread_chunks", "humans"]
+
+    def __init__(self, key, search, obstacles, bounds, jump_bounds, max_expansions, versions) -> None:
+        self.key = key
+        self.future = None # Search run by a worker once the snapshot is read, in the threads mode
+        self.search = search # AStarSearch resumed on each frame, None in the threads mode
+        self.obstacles = obstacles # Snapshot of the blocked cells, only read by the worker
+        self.bounds = bounds # Cells of the snapshot
+        self.jump_bounds = jump_bounds # Cells of the jump point search tried first, None if there is none
+        self.max_expansions = max_expansions
+        self.versions = versions # {(x, y) (chunk coords): version} when the snapshot was taken
+        self.unread_chunks = [] # (x, y) (chunk coords) still to read into the snapshot before the worker starts
+        self.humans = []
+
+    def start(self, executor):
+        # Search run by a worker, or resumed on each frame in the sliced mode (no executor)
+        start, end, _ = self.key
+        if executor is not None:
+            self.future = executor.submit(search_with_jumps, start, end, self.obstacles, self.max_expansions, self.bounds, self.jump_bounds)
+        elif self.jump_bounds is None:
+            self.search = AStarSearch(start, end, self.obstacles, self.max_expansions, self.bounds)
+        else:
+            self.search = JumpPointSearch(start, end, self.obstacles, self.max_expansions, self.jump_bounds)
+
+    def done(self):
+        if self.search is not None:
+            return self.search.finished
+        return self.future is not None and self.future.done()
+
+    def result(self):
+        return self.search.result if self.future is None else self.future.result()
+
+    def cancel(self):
+        return True if self.future is None else self.future.cancel()
+
+# Solves the paths of the humans in worker threads so that a long search does not stall the frame.
+# The workers only read a snapshot of the chunks around the start and the end, taken on the main thread
+# (over several updates for the long paths), and the paths are handed to the humans by update on a later frame.
+# In the sliced mode, the searches run on the main thread instead, resumed on each update with a shared budget of expansions.
+# The flow fields of the deposit buildings are rebuilt the same way, the humans going to one of them waiting for its build.
+class PathService:
+    __slots__ = ["map", "mode", "frame_budget", "executor", "requests", "human_requests", "ready", "fields", "field_humans", "groups", "chunk_versions", "submitted", "deduplicated", "cancelled", "stale", "expansions"]
+
+    MODES = ["threads", "sliced"]
+    MODE = "threads"
+    FRAME_BUDGET = 2000 # Expansions shared by the searches on each update in the sliced mode
+    MIN_SLICE = 50 # Expansions given at least to a search on its turn
+    FIELD_ITERATIONS = 8 # Relaxations of a flow field on each update in the sliced mode
+    WORKERS = 2
+    SNAPSHOT_MARGIN = 1 # Chunks around the start and the end that the search can use
+    MAX_SNAPSHOT_CHUNKS = 25 # Snapshots read at once when the path is requested, the bigger ones being read over several updates
+    SNAPSHOT_CHUNKS_PER_UPDATE = 8 # Chunks read on each update into the bigger snapshots
+
+    def __init__(self, map) -> None:
+        self.map = map
+        self.mode = PathService.MODE
+        self.frame_budget = PathService.FRAME_BUDGET
+        self.executor = None
+        self.requests = {} # {(start, end, profile): PathRequest}
+        self.human_requests = {} # {Human: (start, end, profile)}
+        self.ready = {} # {Human: ((x, y) (end), [(x, y)] or None)}, solved without the workers
+        self.fields = {} # {FlowField: {Human: (start, end, profile)}}, humans waiting for the build of a flow field
+        self.field_humans = {} # {Human: FlowField}
+        self.groups = {} # {Human: GroupMove}, members of a group move waiting for the path of its leader
+        self.chunk_versions = {} # {(x, y) (chunk coords): int}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.cancelled = 0
+        self.stale = 0
+        self.expansions = 0 # In the sliced mode
+
+    def invalidate_chunk(self, chunk_coords):
+        self.chunk_versions[chunk_coords] = self.chunk_versions.get(chunk_coords, 0) + 1
+
+    def request(self, human, start, end, profile = "walk"):
+        # The human receives its path through set_path on a later update
+        self.cancel(human)
+        key = ((int(start.x), int(start.y)), (int(end.x), int(end.y)), profile)
+        found, cells = self.map.path_cache.get(key)
+        if found:
+            self.ready[human] = (key[1], cells)
+            return
+
+        # Humans going to a deposit building follow its flow field when they are in it, waiting for it if it has to be built
+        flow_field = self.map.get_flow_field(key[1]) if profile == "walk" else None
+        if flow_field is not None and flow_field.contains(key[0]):
+            if flow_field.dirty:
+                flow_field.start_build(self.get_executor())
+                self.fields.setdefault(flow_field, {})[human] = key
+                self.field_humans[human] = flow_field
+                return
+            if self.follow_field(human, key, flow_field):
+                return
+        self.request_search(human, key)
+
+    def request_group(self, group, start, end, profile = "walk"):
+        # The path of the leader is given to the group, which hands out the paths of its members
+        for human, _ in group.members:
+            self.groups[human] = group
+        self.request(group, Point(*start), Point(*end), profile)
+
+    def request_search(self, human, key):
+        request = self.requests.get(key, None)
+        if request is None:
+            request = self.submit(key)
+        else:
+            self.deduplicated += 1
+        request.humans.append(human)
+        self.human_requests[human] = key
+
+    def follow_field(self, human, key, flow_field):
+        # True if the human got its path from the flow field, which is up to date
+        start, end, profile = key
+        cells = flow_field.get_cells(start)
+        if cells is None:
+            return False
+        cells = self.map.smooth_path(cells, Obstacles(self.map, profile, get_allowed_structures(self.map, [start, end])))
+        self.map.path_cache.add(key, cells, flow_field.chunks)
+        self.ready[human] = (end, cells)
+        return True
+
+    def get_executor(self):
+        # Workers of the threads mode, None in the sliced mode
+        if self.mode == "sliced":
+            return None
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers = PathService.WORKERS, thread_name_prefix = "path_service")
+        return self.executor
+
+    def submit(self, key):
+        start, end, profile = key
+        chunks, bounds = get_search_box(start, end, PathService.SNAPSHOT_MARGIN)
+        obstacles = Obstacles(self.map, profile, get_allowed_structures(self.map, [start, end]))
+        # Jump point search first when start and end are far enough and most walkable cells around them cost the same
+        jump_bounds = get_jump_bounds(self.map, start, end, profile)
+        # The search of a long path can expand every cell of its snapshot, it runs off the frame anyway
+        max_expansions = max(MAX_EXPANSIONS, (bounds[2] - bounds[0] + 1) * (bounds[3] - bounds[1] + 1))
+
+        request = PathRequest(key, None, obstacles, bounds, jump_bounds, max_expansions, {})
+        if len(chunks) > PathService.MAX_SNAPSHOT_CHUNKS:
+            # Read by update, a few chunks at a time
+            request.unread_chunks = chunks
+        elif self.mode == "sliced":
+            # The chunks are read on the main thread when the search reaches them
+            request.versions = self.get_versions(chunks)
+            request.start(None)
+        else:
+            request.unread_chunks = chunks
+            self.read_snapshot(request, len(chunks))
+        self.requests[key] = request
+        self.submitted += 1
+        return request
+
+    def read_snapshot(self, request, count):
+        # Reads up to count chunks into the snapshot of a request, its search starting once they are all read.
+        # Returns how many were read
+        if self.is_stale(request):
+            # A chunk already read changed (generating the next ones can place structures on it): the snapshot is taken again
+            self.stale += 1
+            start, end, profile = request.key
+            request.obstacles = Obstacles(self.map, profile, get_allowed_structures(self.map, [start, end]))
+            request.versions = {}
+            request.unread_chunks = get_search_box(start, end, PathService.SNAPSHOT_MARGIN)[0]
+        chunks = request.unread_chunks[-count:]
+        del request.unread_chunks[-count:]
+        for chunk_coords in chunks:
+            request.obstacles.get_chunk(*chunk_coords)
+            request.versions[chunk_coords] = self.chunk_versions.get(chunk_coords, 0)
+        if len(request.unread_chunks) == 0:
+            request.start(None if self.mode == "sliced" else self.get_executor())
+        return len(chunks)
+
+    def read_snapshots(self):
+        # Shares the chunks read on each update between the snapshots of the long paths, the oldest requests first
+        count = PathService.SNAPSHOT_CHUNKS_PER_UPDATE
+        for request in self.requests.values():
+            if count <= 0:
+                break
+            if request.future is None and request.search is None:
+                count -= self.read_snapshot(request, count)
+
+    def cancel(self, human):
+        # Forget the pending request of a human, whose orders changed
+        self.ready.pop(human, None)
+        group = self.groups.pop(human, None)
+        if group is not None:
+            group.remove(human)
+            if len(group.members) == 0:
+                self.cancel(group)
+            return
+        flow_field = self.field_humans.pop(human, None)
+        if flow_field is not None:
+            # The build goes on for the next humans going to the building
+            humans = self.fields[flow_field]
+            del humans[human]
+            if len(humans) == 0:
+                del self.fields[flow_field]
+            return
+        key = self.human_requests.pop(human, None)
+        if key is None:
+            return
+        request = self.requests.get(key, None)
+        if request is None:
+            return
+        request.humans.remove(human)
+        if len(request.humans) == 0 and request.cancel():
+            del self.requests[key]
+            self.cancelled += 1
+
+    def get_end(self, human):
+        # End cell (x, y) of the path the human waits for, None if it waits for none
+        if human in self.ready:
+            return self.ready[human][0]
+        group = self.groups.get(human, None)
+        if group is not None:
+            return group.goal
+        flow_field = self.field_humans.get(human, None)
+        if flow_field is not None:
+            return self.fields[flow_field][human][1]
+        key = self.human_requests.get(human, None)
+        return None if key is None else key[1]
+
+    def get_versions(self, chunks):
+        # {(x, y) (chunk coords): version} of the chunks, to know later whether one of them changed
+        return {chunk_coords: self.chunk_versions.get(chunk_coords, 0) for chunk_coords in chunks}
+
+    def is_current(self, versions):
+        return all(self.chunk_versions.get(chunk_coords, 0) == version for chunk_coords, version in versions.items())
+
+    def is_stale(self, request):
+        return not self.is_current(request.versions)
+
+    def run_searches(self):
+        # Shares the budget of the frame between the pending searches, the ones that expanded the least first
+        searches = []
+        for request in self.requests.values():
+            if request.search is None or request.search.finished:
+                continue
+            if self.is_stale(request):
+                # Solved again from the new map by update
+                request.search.finished = True
+                continue
+            searches.append(request.search)
+        searches.sort(key = lambda astar_search: astar_search.expansions)
+
+        budget = self.frame_budget
+        while budget > 0 and len(searches) > 0:
+            share = max(PathService.MIN_SLICE, budget // len(searches))
+            for astar_search in searches:
+                expansions = astar_search.step(min(share, budget))
+                budget -= expansions
+                self.expansions += expansions
+                if budget <= 0:
+                    break
+            searches = [astar_search for astar_search in searches if not astar_search.finished]
+
+    def update_fields(self):
+        # Paths of the humans waiting for flow fields built since the last update
+        for flow_field in list(self.fields.keys()):
+            if self.map.flow_fields.get(flow_field.building, None) is not flow_field:
+                # The building was removed: the humans search their path
+                flow_field.cancel_build()
+                for human, key in self.fields.pop(flow_field).items():
+                    del self.field_humans[human]
+                    self.request(human, Point(*key[0]), Point(*key[1]), key[2])
+                continue
+            flow_field.step_build(PathService.FIELD_ITERATIONS)
+            if not flow_field.collect_build():
+                if flow_field.solver is None:
+                    # Its chunks changed during the build: built again from the new map
+                    self.stale += 1
+                    flow_field.start_build(self.get_executor())
+                continue
+            for human, key in self.fields.pop(flow_field).items():
+                del self.field_humans[human]
+                if not self.follow_field(human, key, flow_field):
+                    self.request_search(human, key)
+
+    def update(self):
+        self.update_fields()
+
+        ready = self.ready
+        self.ready = {}
+        for human, (_, cells) in ready.items():
+            human.set_path(None if cells is None else cells_to_path(cells, self.map.CELL_SIZE))
+
+        self.read_snapshots()
+        self.run_searches()
+
+        for request in self.requests.values():
+            if isinstance(request.search, JumpPointSearch) and request.search.finished and request.search.result is None and not self.is_stale(request):
+                # No path around start and end, searched again over the whole snapshot on the next update
+                start, end, _ = request.key
+                request.search = AStarSearch(start, end, request.obstacles, request.max_expansions, request.bounds)
+
+        done = [request for request in self.requests.values() if request.done()]
+        for request in done:
+            del self.requests[request.key]
+            for human in request.humans:
+                self.human_requests.pop(human, None)
+            cells = request.result()
+
+            if self.is_stale(request):
+                # The map changed since the snapshot: solve it again
+                self.stale += 1
+                start, end, profile = request.key
+                for human in request.humans:
+                    self.request(human, Point(*start), Point(*end), profile)
+                continue
+
+            cells = self.map.smooth_path(cells, request.obstacles)
+            self.map.path_cache.add(request.key, cells, request.versions.keys())
+            for human in request.humans:
+                human.set_path(None if cells is None else cells_to_path(cells, self.map.CELL_SIZE))
+
+    def report(self):
+        return {
+            "pending": len(self.requests),
+            "waiting_fields": len(self.field_humans),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "cancelled": self.cancelled,
+            "stale": self.stale,
+            "expansions": self.expansions
+        }
+
+    def clear(self):
+        for request in self.requests.values():
+            request.cancel()
+        self.requests.clear()
+        self.human_requests.clear()
+        self.ready.clear()
+        for flow_field in self.fields.keys():
+            flow_field.cancel_build()
+        self.fields.clear()
+        self.field_humans.clear()
+        self.groups.clear()
@@ -2,40 +2,52 @@ import random
 import numpy as np
 import math
 
+from model.ChunkCache import ChunkCache
+
 class Perlin:
-    __slots__ = ["seed", "octave", "persistence", "lacunarity", "scale", "amplitude", "chunks", "gradients", "permutation", "x_offset", "y_offset"]
+    __slots__ = ["seed", "octave", "persistence", "lacunarity", "scale", "amplitude", "chunks", "gradients", "permutation", "gradient_table", "permutation_table", "x_offset", "y_offset"]
 
     CHUNK_SIZE = 32
+    CACHE_BUDGET = 16 * 1024 * 1024 # Bytes of noise kept in memory, evicted chunks are regenerated on demand
 
-    def __init__(self, seed = 1, octave = 1, persistence = 1.0, lacunarity = 1.0, scale = 1.0, amplitude = 1.0) -> None:
+    def __init__(self, seed = 1, octave = 1, persistence = 1.0, lacunarity = 1.0, scale = 1.0, amplitude = 1.0, cache_budget = CACHE_BUDGET) -> None:
         self.seed = seed
         self.octave = octave
         self.persistence = persistence
         self.lacunarity = lacunarity
         self.scale = scale
         self.amplitude = amplitude
-        self.chunks = {}
+        self.chunks = ChunkCache(cache_budget, lambda chunk: chunk[0].nbytes)
         self.gradients = []
         self.permutation = []
 
         self.set_seed(seed)
 
     def set_seed(self, seed):
-        random.seed(seed)
-        self.x_offset = random.randrange(-100, 100)
-        self.y_offset = random.randrange(-100, 100)
-        
-        self.generate_permutation_table()
-        self.generate_gradients()
+        self.seed = seed
+        self.chunks.clear()
+
+        # Instance generator, the global random stream is left untouched
+        rng = random.Random(seed)
+        self.x_offset = rng.randrange(-100, 100)
+        self.y_offset = rng.randrange(-100, 100)
         
-    def generate_permutation_table(self):
+        self.generate_permutation_table(rng)
+        self.generate_gradients(rng)
+
+        # Array copies of the tables used by the vectorized noise
+        self.permutation_table = np.array(self.permutation, dtype=np.int64)
+        self.gradient_table = np.array(self.gradients, dtype=float)
+
+    def generate_permutation_table(self, rng):
         permutation = list(range(256))
-        random.shuffle(permutation)
+        rng.shuffle(permutation)
         self.permutation = permutation * 2
 
-    def generate_gradients(self):
+    def generate_gradients(self, rng):
+        self.gradients = []
         for _ in range(256):
-            self.gradients.append((random.uniform(-1, 1), random.uniform(-1, 1)))
+            self.gradients.append((rng.uniform(-1, 1), rng.uniform(-1, 1)))
 
     def fade(self, t):
         return 6 * t ** 5 - 15 * t ** 4 + 10 * t ** 3 # t*t*t*(t*(t*6 - 15) + 10)
@@ -80,48 +92,81 @@ class Perlin:
 
         return self.lerp(x1, x2, v)
 
-    def generate_chunk(self, x, y):
-        chunk = np.empty((self.CHUNK_SIZE, self.CHUNK_SIZE), dtype=float)
+    def noise_array(self, x, y):
+        # Same as noise(), computed on arrays of coordinates
+        x_floor = np.floor(x)
+        y_floor = np.floor(y)
+        X = x_floor.astype(np.int64) & 255
+        Y = y_floor.astype(np.int64) & 255
 
-        # Set min / max
-        max_noise_height = -math.inf
-        min_noise_height = +math.inf
+        xf = x - x_floor
+        yf = y - y_floor
 
-        for xi in range(self.CHUNK_SIZE):
-            for yi in range(self.CHUNK_SIZE):
-                amplitude = self.amplitude
-                freq = 1
-                noise_height = 0
+        u = self.fade(xf)
+        v = self.fade(yf)
 
-                for _ in range(self.octave):
-                    px = (self.CHUNK_SIZE * x + xi + self.x_offset) / self.scale * freq + self.x_offset
-                    py = (self.CHUNK_SIZE * y + yi + self.y_offset) / self.scale * freq + self.y_offset
+        # Hash coordinates of the 4 corners
+        permutation = self.permutation_table
+        aa = permutation[X] + Y
+        ab = aa + 1
+        ba = permutation[X + 1] + Y
+        bb = ba + 1
 
-                    perlin_value = self.noise(px, py)
-                    noise_height += perlin_value * amplitude
+        # Gradient vectors
+        g_aa = self.gradient_table[permutation[aa] % 256]
+        g_ab = self.gradient_table[permutation[ab] % 256]
+        g_ba = self.gradient_table[permutation[ba] % 256]
+        g_bb = self.gradient_table[permutation[bb] % 256]
 
-                    # Increase amp and freq
-                    amplitude *= self.persistence
-                    freq *= self.lacunarity
+        # Dot products
+        n_aa = g_aa[..., 0] * xf + g_aa[..., 1] * yf
+        n_ab = g_ab[..., 0] * xf + g_ab[..., 1] * (yf - 1)
+        n_ba = g_ba[..., 0] * (xf - 1) + g_ba[..., 1] * yf
+        n_bb = g_bb[..., 0] * (xf - 1) + g_bb[..., 1] * (yf - 1)
+
+        # Interpolation
+        x1 = self.lerp(n_aa, n_ba, u)
+        x2 = self.lerp(n_ab, n_bb, u)
 
-                # Adjust min and Max
-                if noise_height > max_noise_height:
-                    max_noise_height = noise_height
-                elif noise_height < min_noise_height:
-                    min_noise_height = noise_height
+        return self.lerp(x1, x2, v)
 
-                chunk[xi, yi] = noise_height
+    def generate_noise(self, cells_x, cells_y):
+        # Noise height of every cell of the grid cells_x * cells_y, all octaves at once
+        octaves = np.arange(self.octave)
+        freq = (float(self.lacunarity) ** octaves)[:, None, None]
+        amplitude = (self.amplitude * float(self.persistence) ** octaves)[:, None, None]
 
-        self.chunks[(x, y)] = (chunk, min_noise_height, max_noise_height)
+        px = (cells_x[None, :, None] + self.x_offset) / self.scale * freq + self.x_offset
+        py = (cells_y[None, None, :] + self.y_offset) / self.scale * freq + self.y_offset
+        px, py = np.broadcast_arrays(px, py)
+
+        return (self.noise_array(px, py) * amplitude).sum(axis=0)
+
+    def generate_chunk(self, x, y):
+        cells = np.arange(self.CHUNK_SIZE)
+        chunk = self.generate_noise(self.CHUNK_SIZE * x + cells, self.CHUNK_SIZE * y + cells)
+
+        self.chunks[(x, y)] = (chunk, chunk.min(), chunk.max())
+
+    def generate_region(self, x, y, width, height):
+        # Generate the noise of width x height chunks in one pass, then split it into the chunk cache
+        cells_x = np.arange(self.CHUNK_SIZE * x, self.CHUNK_SIZE * (x + width))
+        cells_y = np.arange(self.CHUNK_SIZE * y, self.CHUNK_SIZE * (y + height))
+        region = self.generate_noise(cells_x, cells_y)
+
+        for i in range(width):
+            for j in range(height):
+                if self.chunks.get((x + i, y + j)) is None:
+                    chunk = region[i * self.CHUNK_SIZE:(i + 1) * self.CHUNK_SIZE, j * self.CHUNK_SIZE:(j + 1) * self.CHUNK_SIZE].copy()
+                    self.chunks[(x + i, y + j)] = (chunk, chunk.min(), chunk.max())
     
     def get_chunk(self, x, y):
-        if self.chunks.get((x, y)) == None:
+        chunk = self.chunks.get((x, y))
+        if chunk is None:
             self.generate_chunk(x, y)
+            chunk = self.chunks[(x, y)]
 
-        return self.chunks[(x, y)]
+        return chunk
     
     def get_chunk_data(self, x, y):
-        if self.chunks.get((x, y)) == None:
-            self.generate_chunk(x, y)
-
-        return self.chunks[(x, y)][0]
\ No newline at end of file
+        return self.get_chunk(x, y)[0]
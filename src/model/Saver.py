@@ -44,13 +44,11 @@ class Saver:
             
             # Chunks
             f.write(struct.pack('i', Perlin.CHUNK_SIZE))
-            f.write(struct.pack('i', len(map.map_chunks)))
-            for chunk_coords, chunk in map.map_chunks.items():
+            f.write(struct.pack('i', len(map.generated_chunks)))
+            for chunk_coords, chunk in map.get_chunks():
                 f.write(struct.pack('ii', chunk_coords.x, chunk_coords.y))
                 f.write(struct.pack('i', len(chunk)))
-                for row in chunk:
-                    for value in row:
-                        f.write(struct.pack('B', value))
+                f.write(chunk.astype(np.uint8, copy = False).tobytes())
 
             # Player
             self.save_player(f, self.game_vue.player)
@@ -83,16 +81,16 @@ class Saver:
                 structs[building.sid] = True
 
             # Buildings by types
-            f.write(struct.pack('i', len(map.building_type)))
-            for building_type, buildings in map.building_type.items():
+            f.write(struct.pack('i', len(map.buildings.types)))
+            for building_type, buildings in map.buildings.types.items():
                 f.write(struct.pack('B', building_type.value))
                 f.write(struct.pack('i', len(buildings)))
-                for building in buildings:
-                    f.write(struct.pack('i', building.sid))
+                for sid in buildings:
+                    f.write(struct.pack('i', sid))
 
             # Occupied coords
-            f.write(struct.pack('i', len(map.occupied_coords)))
-            for coord, structure in map.occupied_coords.items():
+            f.write(struct.pack('i', len(map.occupancy)))
+            for coord, structure in map.occupancy.items():
                 f.write(struct.pack('ii', int(coord.x), int(coord.y)))
                 f.write(struct.pack('i', structure.sid))
                 if not structs.get(structure.sid, False): 
@@ -107,8 +105,9 @@ class Saver:
                         self.save_ore(f, structure)
 
             # Chunk occupied coords
-            f.write(struct.pack('i', len(map.chunk_occupied_coords)))
-            for coord, points in map.chunk_occupied_coords.items():
+            chunk_occupied_coords = list(map.occupancy.chunk_cells())
+            f.write(struct.pack('i', len(chunk_occupied_coords)))
+            for coord, points in chunk_occupied_coords:
                 f.write(struct.pack('ii', coord.x, coord.y))
                 f.write(struct.pack('i', len(points)))
                 for point in points:
@@ -173,6 +172,14 @@ class Saver:
         f.write(struct.pack('B', human.going_to_work))
         f.write(struct.pack('B', human.going_to_target))
         f.write(struct.pack('B', human.going_to_deposit))
+
+        # End of the path the human waits for, requested again when loading
+        end = human.map.path_service.get_end(human) if human.waiting_for_path else None
+        f.write(struct.pack('B', end is not None))
+        if end is not None:
+            f.write(struct.pack('ii', end[0], end[1]))
+        else:
+            f.write(struct.pack('ii', -1, -1))
         
         f.write(struct.pack('B', human.target_location is not None))
         if human.target_location is not None:
@@ -205,7 +212,7 @@ class Saver:
         f.write(struct.pack('i', human.damage))
         f.write(struct.pack('i', human.ressource_type.value if human.ressource_type is not None else 0))
         f.write(struct.pack('i', human.deposit_speed))
-        f.write(struct.pack('i', human.speed))
+        f.write(struct.pack('i', int(human.speed)))
         f.write(struct.pack('f', human.progression))
         f.write(struct.pack('i', human.hid))
         f.write(struct.pack('i', len(human.ressources)))
@@ -244,17 +251,20 @@ class Saver:
             
             # Map seed
             map.perlin_temperature.set_seed(struct.unpack('i', f.read(4))[0])
+            map.prefetcher.clear()
+            map.cost_chunks.clear()
+            map.path_cache.clear()
+            map.chunk_graphs.clear()
+            map.flow_fields.clear()
+            map.path_service.clear()
 
             # Chunks
             Perlin.CHUNK_SIZE = struct.unpack('i', f.read(4))[0]
             for _ in range(struct.unpack('i', f.read(4))[0]):
                 chunk_coords = Point(struct.unpack('i', f.read(4))[0], struct.unpack('i', f.read(4))[0])
                 len_chunk = struct.unpack('i', f.read(4))[0]
-                chunk = np.empty((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype=int)
-                for i in range(Perlin.CHUNK_SIZE):
-                    for j in range(Perlin.CHUNK_SIZE):
-                        chunk[i, j] = struct.unpack('B', f.read(1))[0]
-                map.map_chunks[chunk_coords] = chunk
+                chunk = np.frombuffer(f.read(Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE), dtype=np.uint8).reshape((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE)).copy()
+                map.set_chunk(chunk_coords, chunk)
 
             players = {}
 
@@ -289,17 +299,15 @@ class Saver:
             # Buildings
             for _ in range(struct.unpack('i', f.read(4))[0]):
                 building = self.load_building(f, players)
-                map.buildings.append(building)
                 structs[building.sid] = building
+                building.sid = self.get_free_id(map.buildings, building.sid, Structure)
+                map.buildings.add(building.sid, building, building.player, building.type)
+                map.building_index.add(building)
 
-            # Buildings by types
+            # Buildings by types, already known from the buildings
             for _ in range(struct.unpack('i', f.read(4))[0]):
-                building_type = BuildingType(struct.unpack('B', f.read(1))[0])
-                buildings = []
-                for _ in range(struct.unpack('i', f.read(4))[0]):
-                    building = structs[struct.unpack('i', f.read(4))[0]]
-                    buildings.append(building)
-                map.building_type[building_type] = buildings
+                f.read(1)
+                f.read(4 * struct.unpack('i', f.read(4))[0])
             
             # Occupied coords
             l = struct.unpack('i', f.read(4))[0]
@@ -317,38 +325,50 @@ class Saver:
                     elif structure_type == StructureType.ORE:
                         structure = self.load_ore(f)
                     structs[sid] = structure
-                map.occupied_coords[coords] = structure
+                map.occupancy.set(coords, structure)
 
-            # Chunk occupied coords
+            # Chunk occupied coords, already known from the occupied coords
             for _ in range(struct.unpack('i', f.read(4))[0]):
-                coords = Point(struct.unpack('i', f.read(4))[0], struct.unpack('i', f.read(4))[0])
-                points = []
-                for _ in range(struct.unpack('i', f.read(4))[0]):
-                    point = Point(struct.unpack('i', f.read(4))[0], struct.unpack('i', f.read(4))[0])
-                    points.append(point)
-                map.chunk_occupied_coords[coords] = points
+                f.read(8)
+                f.read(8 * struct.unpack('i', f.read(4))[0])
 
             humans = {}
+            pending = {} # {Human: Point}, end of the path the human waited for
 
             # Humans
             l = struct.unpack('i', f.read(4))[0]
             for _ in range(l):
-                human = self.load_human(f, players)
-                map.humans.append(human)
+                human = self.load_human(f, players, pending)
                 humans[human.hid] = human
+                human.hid = self.get_free_id(map.humans, human.hid, Human)
+                map.place_human(human, human.current_location)
+
+            # Target entities, saved as hids
+            for human in humans.values():
+                if human.target_entity is not None:
+                    human.target_entity = humans.get(human.target_entity, None)
+
+            # Paths the humans waited for when saving
+            for human, end in pending.items():
+                human.create_path(end)
             
-            # Humans by chunks
+            # Humans by chunks, already known from the humans
             for _ in range(struct.unpack('i', f.read(4))[0]):
-                chunk_coords = Point(struct.unpack('f', f.read(4))[0], struct.unpack('f', f.read(4))[0])
-                humans_map = []
-                for _ in range(struct.unpack('i', f.read(4))[0]):
-                    human = humans[struct.unpack('i', f.read(4))[0]]
-                    humans_map.append(human)
-                map.chunk_humans[chunk_coords] = humans_map
+                f.read(8)
+                f.read(4 * struct.unpack('i', f.read(4))[0])
 
             ## GAMEVUE
             self.game_vue.camera_pos = Point(struct.unpack('f', f.read(4))[0], struct.unpack('f', f.read(4))[0])
 
+    def get_free_id(self, registry, entity_id, entity_class):
+        # The saved id if the registry does not have it yet (the camps placed before loading do), a new one otherwise
+        counter = "HID" if entity_class is Human else "SID"
+        if entity_id in registry:
+            setattr(entity_class, counter, getattr(entity_class, counter) + 1)
+            return getattr(entity_class, counter)
+        setattr(entity_class, counter, max(getattr(entity_class, counter), entity_id))
+        return entity_id
+
     def load_structure(self, f):
         sid = struct.unpack('i', f.read(4))[0]
         structure_type = StructureType(struct.unpack('B', f.read(1))[0])
@@ -396,7 +416,7 @@ class Saver:
         ore.sid = o[0]
         return ore
     
-    def load_human(self, f, players):
+    def load_human(self, f, players, pending):
         type = HumanType(struct.unpack('B', f.read(1))[0])
         location = Point(struct.unpack('f', f.read(4))[0], struct.unpack('f', f.read(4))[0])
         player = players[struct.unpack('i', f.read(4))[0]]
@@ -411,6 +431,11 @@ class Saver:
         h.going_to_target = struct.unpack('B', f.read(1))[0]
         h.going_to_deposit = struct.unpack('B', f.read(1))[0]
 
+        if struct.unpack('B', f.read(1))[0]:
+            pending[h] = Point(struct.unpack('i', f.read(4))[0], struct.unpack('i', f.read(4))[0])
+        else:
+            f.read(8)
+
         if struct.unpack('B', f.read(1))[0]:
             h.target_location = Point(struct.unpack('f', f.read(4))[0], struct.unpack('f', f.read(4))[0])
         else:
@@ -424,7 +449,6 @@ class Saver:
             h.building_location = None
         
         if struct.unpack('B', f.read(1))[0]:
-            # TODO : loop over the humans to find the target entity after loading them
             h.target_entity = struct.unpack('i', f.read(4))[0]
         else:
             f.read(4)
@@ -0,0 +1,129 @@
+from math import inf, hypot
+
+# Entities bucketed by position on a uniform grid of square buckets, to find the ones in an area without going through all of them.
+# The positions are cells (x, y); an entity that moves only notifies the hash when its cell changes.
+class SpatialHash:
+    __slots__ = ["bucket_size", "buckets", "positions"]
+
+    BUCKET_SIZE = 8 # Cells on each side of a bucket
+
+    def __init__(self, bucket_size = BUCKET_SIZE) -> None:
+        self.bucket_size = bucket_size
+        self.buckets = {} # {(x, y) (bucket coords): {entity: (x, y)}}, dicts to keep the insertion order
+        self.positions = {} # {entity: (x, y)}
+
+    def get_bucket(self, x, y):
+        return (int(x) // self.bucket_size, int(y) // self.bucket_size)
+
+    def add(self, entity, position):
+        if entity in self.positions:
+            self.move(entity, position)
+            return
+        self.positions[entity] = position
+        self.buckets.setdefault(self.get_bucket(*position), {})[entity] = position
+
+    def remove(self, entity):
+        position = self.positions.pop(entity, None)
+        if position is None:
+            return
+        bucket_coords = self.get_bucket(*position)
+        bucket = self.buckets[bucket_coords]
+        del bucket[entity]
+        if len(bucket) == 0:
+            del self.buckets[bucket_coords]
+
+    def move(self, entity, position):
+        # Called when the cell of an entity changes
+        old_position = self.positions.get(entity, None)
+        if old_position is None:
+            self.add(entity, position)
+            return
+        old_bucket_coords = self.get_bucket(*old_position)
+        bucket_coords = self.get_bucket(*position)
+        self.positions[entity] = position
+        if bucket_coords == old_bucket_coords:
+            self.buckets[bucket_coords][entity] = position
+            return
+        bucket = self.buckets[old_bucket_coords]
+        del bucket[entity]
+        if len(bucket) == 0:
+            del self.buckets[old_bucket_coords]
+        self.buckets.setdefault(bucket_coords, {})[entity] = position
+
+    def get_buckets(self, min_x, min_y, max_x, max_y):
+        # Buckets overlapping the rectangle, going through the non empty ones when there are fewer of them
+        min_bucket_x, min_bucket_y = self.get_bucket(min_x, min_y)
+        max_bucket_x, max_bucket_y = self.get_bucket(max_x, max_y)
+        if (max_bucket_x - min_bucket_x + 1) * (max_bucket_y - min_bucket_y + 1) > len(self.buckets):
+            return [bucket for (x, y), bucket in self.buckets.items() if min_bucket_x <= x <= max_bucket_x and min_bucket_y <= y <= max_bucket_y]
+        buckets = []
+        for x in range(min_bucket_x, max_bucket_x + 1):
+            for y in range(min_bucket_y, max_bucket_y + 1):
+                bucket = self.buckets.get((x, y), None)
+                if bucket is not None:
+                    buckets.append(bucket)
+        return buckets
+
+    def query_rect(self, min_x, min_y, max_x, max_y, condition = None):
+        # Entities whose cell is in the rectangle, bounds included, the ones not meeting the condition being ignored
+        entities = []
+        for bucket in self.get_buckets(min_x, min_y, max_x, max_y):
+            for entity, (x, y) in bucket.items():
+                if min_x <= x <= max_x and min_y <= y <= max_y and (condition is None or condition(entity)):
+                    entities.append(entity)
+        return entities
+
+    def query_radius(self, x, y, radius, condition = None):
+        # Entities whose cell is at most radius cells away from (x, y)
+        entities = []
+        for bucket in self.get_buckets(x - radius, y - radius, x + radius, y + radius):
+            for entity, (entity_x, entity_y) in bucket.items():
+                if hypot(entity_x - x, entity_y - y) <= radius and (condition is None or condition(entity)):
+                    entities.append(entity)
+        return entities
+
+    def nearest(self, x, y, count, condition = None, max_distance = inf):
+        # The <count> entities closest to (x, y), searched ring of buckets by ring of buckets until no closer one can be left
+        center_x, center_y = self.get_bucket(x, y)
+        found = [] # [(distance, entity)]
+        ring = 0
+        while True:
+            if (2 * ring + 1) ** 2 >= len(self.buckets):
+                # The ring covers more buckets than there are: finish with the buckets not seen yet
+                for (bucket_x, bucket_y), bucket in self.buckets.items():
+                    if max(abs(bucket_x - center_x), abs(bucket_y - center_y)) >= ring:
+                        self.add_found(found, bucket, x, y, condition, max_distance)
+                break
+            for bucket_x in range(center_x - ring, center_x + ring + 1):
+                for bucket_y in range(center_y - ring, center_y + ring + 1):
+                    if max(abs(bucket_x - center_x), abs(bucket_y - center_y)) == ring:
+                        bucket = self.buckets.get((bucket_x, bucket_y), None)
+                        if bucket is not None:
+                            self.add_found(found, bucket, x, y, condition, max_distance)
+            # Every entity outside the rings seen is further than this
+            covered = ring * self.bucket_size
+            if covered >= max_distance:
+                break
+            if len(found) >= count:
+                found.sort(key = lambda item: item[0])
+                if found[count - 1][0] <= covered:
+                    break
+            ring += 1
+        found.sort(key = lambda item: item[0])
+        return [entity for _, entity in found[:count]]
+
+    def add_found(self, found, bucket, x, y, condition, max_distance):
+        for entity, (entity_x, entity_y) in bucket.items():
+            distance = hypot(entity_x - x, entity_y - y)
+            if distance <= max_distance and (condition is None or condition(entity)):
+                found.append((distance, entity))
+
+    def __contains__(self, entity):
+        return entity in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def clear(self):
+        self.buckets.clear()
+        self.positions.clear()
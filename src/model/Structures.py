@@ -230,9 +230,8 @@ class BaseCamp(Building):
             self.player.add_ressource(RessourceType.STONE, -600)
             self.player.add_ressource(RessourceType.CRYSTAL, -500)
             self.player.upgrades.BUILDING_HEALTH_MULTIPLIER = 2
-            for building in self.gamevue.map.buildings:
-                if building.player == self.player:
-                    building.health *= 2
+            for building in self.gamevue.map.buildings.by_owner(self.player):
+                building.health *= 2
 
     def technology_extra_materials(self):
         if self.player.get_ressource(RessourceType.STONE) >= 400 and self.player.get_ressource(RessourceType.IRON) >= 400 and self.player.get_ressource(RessourceType.GOLD) >= 300:
@@ -111,7 +111,7 @@ class Core:
 
     def default_config(self) -> None:
         """
-        Writes the default configuration to a file. The default configuration includes the game version, fullscreen mode, screen width and height, and volume.
+        Writes the default configuration to a file. The default configuration includes the game version, fullscreen mode, screen width and height, volume, chunk prefetch radius and pathfinding mode with its expansion budget per frame.
         """
         with open("config.json", "w") as configFile:
             json.dump(
@@ -121,6 +121,9 @@ class Core:
                     width=2560,
                     height=1600,
                     volume=0.1,
+                    prefetch_radius=2,
+                    path_mode="threads",
+                    path_budget=2000,
                 ),
                 configFile,
             )
@@ -13,6 +13,8 @@ from model.Tools import Colors, Directions
 from model.Map import Map, Biomes
 from model.Geometry import Point, Rectangle, Circle
 from model.Perlin import Perlin
+from model.ChunkPrefetcher import ChunkPrefetcher
+from model.PathService import PathService
 from model.Player import Player
 from model.Ressource import RessourceType
 from model.Structures import StructureType, BuildingType, BuildingState, OreType, BaseCamp, Farm, get_struct_class_from_type
@@ -48,6 +50,10 @@ class GameVue(Scene):
         self.player = Player(self.ressource_update_callback)
 
         self.map = Map()
+        self.map.prefetcher.radius = self.parameter.get("prefetch_radius", ChunkPrefetcher.RADIUS)
+        if self.parameter.get("path_mode", PathService.MODE) in PathService.MODES:
+            self.map.path_service.mode = self.parameter.get("path_mode", PathService.MODE)
+        self.map.path_service.frame_budget = self.parameter.get("path_budget", PathService.FRAME_BUDGET)
         self.actual_chunks = None
         self.buildings = []
 
@@ -122,9 +128,10 @@ class GameVue(Scene):
         for ressource_type in RessourceType:
             self.ressource_icons[ressource_type] = pygame.transform.scale(pygame.image.load("assets/icons/" + ressource_type.name.lower() + ".png").convert_alpha(), (26, 26))
 
-        self.biomes_textures = {}
+        # Indexed by biome value, to be looked up directly with the uint8 values of the chunks
+        self.biomes_textures = [None] * (max(biome.value for biome in Biomes) + 1)
         for biome in Biomes:
-            self.biomes_textures[biome] = pygame.transform.scale(pygame.image.load("assets/icons/" + biome.name.lower() + ".jpg").convert_alpha(), (Map.CELL_SIZE, Map.CELL_SIZE))
+            self.biomes_textures[biome.value] = pygame.transform.scale(pygame.image.load("assets/icons/" + biome.name.lower() + ".jpg").convert_alpha(), (Map.CELL_SIZE, Map.CELL_SIZE))
 
         self.tree_texture = pygame.transform.scale(pygame.image.load("assets/Textures/Tree.png").convert_alpha(), (Map.CELL_SIZE * 3, Map.CELL_SIZE * 3))
 
@@ -255,24 +262,20 @@ class GameVue(Scene):
                     elif len(self.selected_humans) > 0:
                         self.left_clicking = False
                         cell = (mouse_point + self.camera_pos - self.screen_size // 2) // Map.CELL_SIZE
-                        for human in self.selected_humans:
-                            human.set_target_location(cell)
+                        self.map.move_group(self.selected_humans, cell)
                         self.selected_humans.clear()
                         self.frame_render = True
                     else:
                         pos_point = mouse_point + self.camera_pos - self.screen_size // 2
                         cell_pos = pos_point // Map.CELL_SIZE
-                        chunk_pos = cell_pos // Perlin.CHUNK_SIZE
-                        chunk_humans = self.map.chunk_humans.get(chunk_pos, None)
-                        if chunk_humans is not None:
-                            for human in chunk_humans:
-                                if Circle(human.current_location, Map.CELL_SIZE).contains(pos_point + self.camera_pos):
-                                    self.selected_humans.append(human)
-                                    self.selecting = False
-                                    break
-                            self.frame_render = len(self.selected_humans) > 0
-
-                        building = self.map.occupied_coords.get(cell_pos, None)
+                        # Closest human around the clicked cell, kept if the click is on it
+                        humans = self.map.human_hash.nearest(cell_pos.x, cell_pos.y, 1, None, 2)
+                        if len(humans) > 0 and Circle(humans[0].current_location, Map.CELL_SIZE).contains(pos_point):
+                            self.selected_humans.append(humans[0])
+                            self.selecting = False
+                        self.frame_render = len(self.selected_humans) > 0
+
+                        building = self.map.occupancy.get(cell_pos, None)
                         if building is not None and building.structure_type == StructureType.BUILDING and building.state == BuildingState.BUILT:
                             if self.building_interface_displayed:
                                 self.clicked_building = None
@@ -323,12 +326,8 @@ class GameVue(Scene):
                 if event.key == pygame.K_s: # TODO: temporary
                     self.saver.save()
                 if event.key == pygame.K_h: # TODO: For debug, remove for the final version
-                    chunk_pos = self.camera_pos // Map.CELL_SIZE // Perlin.CHUNK_SIZE
-                    if self.map.chunk_humans.get(chunk_pos, None) is None:
-                        self.map.chunk_humans[chunk_pos] = []
                     human = Colon(self.map, self.camera_pos, self.player, self.human_died_callback)
-                    self.map.chunk_humans[chunk_pos].append(human)
-                    self.map.humans.append(human)
+                    self.map.place_human(human, human.current_location)
                     self.frame_render = True
                 if event.key == pygame.K_r: # TODO: For debug, remove for the final version
                     self.player.add_ressource(RessourceType.WOOD, 1000)
@@ -352,6 +351,8 @@ class GameVue(Scene):
         if self.map.update(duration):
             self.frame_render = True
 
+        self.map.prefetcher.update(self.camera_pos, self.screen_size, duration)
+
     def render(self):
         if self.selecting or self.frame_render or self.render_until_event:
             if self.frame_render:
@@ -406,36 +407,34 @@ class GameVue(Scene):
         self.actual_chunks = chunks
 
         # RENDER MAP
+        biomes = chunks.tolist()
         for i in range(0, cells_size.x):
             for j in range(0, cells_size.y):
                 x = i + cell_offset.x
                 y = j + cell_offset.y
-                self.screen.blit(self.biomes_textures[Biomes(int(chunks[x][y]))], (i * Map.CELL_SIZE - camera_offset.x, j * Map.CELL_SIZE - camera_offset.y))
+                self.screen.blit(self.biomes_textures[biomes[x][y]], (i * Map.CELL_SIZE - camera_offset.x, j * Map.CELL_SIZE - camera_offset.y))
 
         # RENDER STRUCTURES
-        shown_trees = {}
-        shown_buildings = {}
+        shown_structures = {}
         for x in range(tl_chunk.x, tl_chunk.x + chunks_size.x + 1):
             for y in range(tl_chunk.y, tl_chunk.y + chunks_size.y + 1):
-                actual_chunk_occupied_coords = self.map.chunk_occupied_coords.get(Point(x, y), None)
-                if actual_chunk_occupied_coords is not None:
-                    for point in actual_chunk_occupied_coords:
-                        struct = self.map.occupied_coords.get(point, None)
-                        if struct is not None:
-                            if struct.structure_type == StructureType.BUILDING and shown_buildings.get(struct, None) is None:
-                                absolute_point = (struct.coords + struct.upper_left) * Map.CELL_SIZE - camera_pos + screen_center_rounded
-                                self.screen.blit(self.building_textures[struct.type] if self.building_textures.get(struct.type, None) != None else self.missing_texture, (absolute_point.x, absolute_point.y))
-                                shown_buildings[struct] = True
-                                if struct.state == BuildingState.BUILDING or struct.state == BuildingState.PLACED:
-                                    pygame.draw.rect(self.screen, self.colors[Colors.WHITE], (absolute_point.x + (struct.rect_size.x * Map.CELL_SIZE - Map.CELL_SIZE * 2) // 2, absolute_point.y - Map.CELL_SIZE, Map.CELL_SIZE * 2, Map.CELL_SIZE // 2))
-                                    pygame.draw.rect(self.screen, self.colors[Colors.BLUE], (absolute_point.x + (struct.rect_size.x * Map.CELL_SIZE - Map.CELL_SIZE * 2) // 2, absolute_point.y - Map.CELL_SIZE, int(Map.CELL_SIZE * 2 * (struct.building_time / struct.building_duration)), Map.CELL_SIZE // 2))
-                            elif struct.structure_type == StructureType.ORE:
-                                absolute_point = point * Map.CELL_SIZE - camera_pos + screen_center_rounded
-                                self.screen.blit(self.ore_textures[struct.type] if self.ore_textures.get(struct.type, None) != None else self.missing_texture, (absolute_point.x, absolute_point.y))
-                            elif struct.structure_type == StructureType.TREE and shown_trees.get(struct, None) is None:
-                                absolute_point = (struct.coords + Point(-1, -1)) * Map.CELL_SIZE - camera_pos + screen_center_rounded
-                                self.screen.blit(self.tree_texture, (absolute_point.x, absolute_point.y))
-                                shown_trees[struct] = True
+                for struct in self.map.occupancy.get_chunk_structures((x, y)):
+                    if shown_structures.get(struct, None) is None:
+                        shown_structures[struct] = True
+                        if struct.structure_type == StructureType.BUILDING:
+                            absolute_point = (struct.coords + struct.upper_left) * Map.CELL_SIZE - camera_pos + screen_center_rounded
+                            self.screen.blit(self.building_textures[struct.type] if self.building_textures.get(struct.type, None) != None else self.missing_texture, (absolute_point.x, absolute_point.y))
+                            if struct.state == BuildingState.BUILDING or struct.state == BuildingState.PLACED:
+                                pygame.draw.rect(self.screen, self.colors[Colors.WHITE], (absolute_point.x + (struct.rect_size.x * Map.CELL_SIZE - Map.CELL_SIZE * 2) // 2, absolute_point.y - Map.CELL_SIZE, Map.CELL_SIZE * 2, Map.CELL_SIZE // 2))
+                                pygame.draw.rect(self.screen, self.colors[Colors.BLUE], (absolute_point.x + (struct.rect_size.x * Map.CELL_SIZE - Map.CELL_SIZE * 2) // 2, absolute_point.y - Map.CELL_SIZE, int(Map.CELL_SIZE * 2 * (struct.building_time / struct.building_duration)), Map.CELL_SIZE // 2))
+                        elif struct.structure_type == StructureType.ORE:
+                            ore_texture = self.ore_textures[struct.type] if self.ore_textures.get(struct.type, None) != None else self.missing_texture
+                            for point in struct.points:
+                                absolute_point = (struct.coords + point) * Map.CELL_SIZE - camera_pos + screen_center_rounded
+                                self.screen.blit(ore_texture, (absolute_point.x, absolute_point.y))
+                        elif struct.structure_type == StructureType.TREE:
+                            absolute_point = (struct.coords + Point(-1, -1)) * Map.CELL_SIZE - camera_pos + screen_center_rounded
+                            self.screen.blit(self.tree_texture, (absolute_point.x, absolute_point.y))
 
         # RENDER PLACE BUILDING
         if self.building is not None:
@@ -445,7 +444,7 @@ class GameVue(Scene):
             for point in self.building.points:
                 absolute_point = (relative_center + point) * Map.CELL_SIZE + screen_center_rounded - camera_offset
                 color = Colors.BLACK
-                if self.map.occupied_coords.get(point + relative_position, None) is not None:
+                if self.map.occupancy.get(point + relative_position, None) is not None:
                     color = Colors.RED
                 pygame.draw.rect(self.screen, self.colors[color], (absolute_point.x, absolute_point.y, Map.CELL_SIZE, Map.CELL_SIZE))
 
@@ -454,10 +453,13 @@ class GameVue(Scene):
             
 
         if self.selecting:
-            self.selected_humans.clear()
+            # Humans in the cells under the selection, the ones drawn inside it being selected
             selection_rect = Rectangle.fromPoints(self.select_start, self.select_end)
-        else:
-            ids = [id(h) for h in self.selected_humans]
+            first_cell = (Point(selection_rect.x1, selection_rect.y1) + camera_pos - screen_center_rounded) // Map.CELL_SIZE
+            last_cell = (Point(selection_rect.x2, selection_rect.y2) + camera_pos - screen_center_rounded) // Map.CELL_SIZE
+            candidates = self.map.human_hash.query_rect(first_cell.x - 1, first_cell.y - 1, last_cell.x + 1, last_cell.y + 1)
+            self.selected_humans = [human for human in candidates if selection_rect.containsPoint(human.current_location - camera_pos + screen_center_rounded)]
+        ids = [id(h) for h in self.selected_humans]
                 
         # RENDER HUMANS
         for x in range(tl_chunk.x, tl_chunk.x + chunks_size.x + 1):
@@ -466,15 +468,7 @@ class GameVue(Scene):
                 if actual_chunk_humans is not None:
                     for human in actual_chunk_humans:
                         absolute_point = human.current_location - camera_pos + screen_center_rounded
-
-                        if self.selecting:
-                            selected = selection_rect.containsPoint(absolute_point)
-                            if selected:
-                                self.selected_humans.append(human)
-                        else:
-                            selected = id(human) in ids
-
-                        if selected:
+                        if id(human) in ids:
                             pygame.draw.circle(self.screen, self.colors[Colors.AQUA], (absolute_point.x + 1, absolute_point.y), 10)
                         self.screen.blit(self.humans_textures[human.type][human.orientation], (absolute_point.x - Map.CELL_SIZE // 2, absolute_point.y - Map.CELL_SIZE // 2))
                 
@@ -553,9 +547,5 @@ class GameVue(Scene):
 
     def add_human(self, human_type, position):
         human = get_human_class_from_type(human_type)(self.map, position * Map.CELL_SIZE, self.player, self.human_died_callback)
-        chunk_pos = position // Perlin.CHUNK_SIZE
-        if self.map.chunk_humans.get(chunk_pos, None) is None:
-            self.map.chunk_humans[chunk_pos] = []
-        self.map.chunk_humans[chunk_pos].append(human)
-        self.map.humans.append(human)
+        self.map.place_human(human, human.current_location)
         self.frame_render = True
@@ -0,0 +1,264 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.AStar import AStar, AStarSearch, JumpPointSearch, GridPathfinder, Obstacles, search, get_cost_grid, get_grid_pathfinder, jump_point_search, get_path_cost, get_jump_cost, line_of_sight, smooth_cells, search_nearest, dijkstra
+from model.Perlin import Perlin
+from model.Structures import Tree, Orientation
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+def get_biome(map, cell):
+    return map.get_chunk(cell // Perlin.CHUNK_SIZE)[cell.x % Perlin.CHUNK_SIZE, cell.y % Perlin.CHUNK_SIZE]
+
+
+class AStarTest(unittest.TestCase):
+    def test_pixel_path(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        path = AStar(Point(0, 0), Point(5, 0), map)
+        center = Point(Map.CELL_SIZE, Map.CELL_SIZE) // 2
+        self.assertEqual(path, [Point(x, 0) * Map.CELL_SIZE + center for x in range(6)])
+
+    def test_diagonal(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        self.assertEqual(len(AStar(Point(0, 0), Point(4, 4), map)), 5)
+
+    def test_avoids_obstacles(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        for y in range(-5, 6):
+            map.set_biome(Point(3, y), Biomes.LAVA)
+        tree = Tree(Point(10, 0), None, Orientation.NORTH)
+        map.place_structure(tree)
+
+        path = AStar(Point(0, 0), Point(10, 0), map)
+        self.assertIsNotNone(path)
+        cells = [point // Map.CELL_SIZE for point in path]
+        for cell in cells:
+            # Only the target structure can be walked through
+            self.assertIn(map.occupancy.get(cell), [None, tree])
+            self.assertFalse(Map.IMPASSABLE[get_biome(map, cell)])
+        # No corner cutting around the end of the wall
+        for previous, cell in zip(cells, cells[1:]):
+            self.assertLessEqual(max(abs(cell.x - previous.x), abs(cell.y - previous.y)), 1)
+            if cell.x != previous.x and cell.y != previous.y:
+                self.assertNotEqual(get_biome(map, Point(cell.x, previous.y)), Biomes.LAVA.value)
+                self.assertNotEqual(get_biome(map, Point(previous.x, cell.y)), Biomes.LAVA.value)
+
+    def test_unreachable(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        for x in range(-1, 2):
+            for y in range(-1, 2):
+                if x != 0 or y != 0:
+                    map.set_biome(Point(20 + x, 20 + y), Biomes.LAVA)
+        self.assertIsNone(AStar(Point(0, 0), Point(20, 20), map, 2000))
+
+    def test_blocked_end(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        map.set_biome(Point(10, 0), Biomes.LAVA)
+        tree = Tree(Point(10, 6), None, Orientation.NORTH)
+        map.place_structure(tree)
+        obstacles = Obstacles(map)
+
+        # An end on an impassable biome is rejected before any expansion
+        self.assertIsNone(AStar(Point(0, 0), Point(10, 0), map))
+        astar_search = AStarSearch((0, 0), (10, 0), obstacles)
+        self.assertTrue(astar_search.finished)
+        self.assertEqual(astar_search.expansions, 0)
+        self.assertIsNone(search((0, 0), (10, 0), obstacles, bounds = (-32, -32, 31, 31)))
+        self.assertIsNone(jump_point_search((0, 0), (10, 0), obstacles, bounds = (-8, -8, 18, 8)))
+        self.assertIsNone(search_nearest((0, 0), [(10, 0)], obstacles))
+        reached, _ = dijkstra([(9, 0)], {(10, 0)}, obstacles)
+        self.assertEqual(reached, {})
+
+        # An end blocked only by a structure is reached, here the edge of the tree
+        self.assertTrue(obstacles.is_blocked(9, 6))
+        self.assertEqual(search((0, 0), (9, 6), obstacles)[-1], (9, 6))
+        self.assertEqual(jump_point_search((0, 0), (9, 6), obstacles, bounds = (-8, -8, 18, 14))[-1], (9, 6))
+        self.assertEqual(search_nearest((0, 0), [(10, 0), (9, 6)], obstacles)[-1], (9, 6))
+
+    def test_biome_costs(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        # A snowy peak band with a gap, cheaper to go around than through
+        for x in range(-40, 41):
+            if x != 3:
+                for y in range(5, 8):
+                    map.set_biome(Point(x, y), Biomes.SNOWY_PEAK)
+        cells = search((0, 0), (0, 12), Obstacles(map))
+        for x, y in cells:
+            self.assertNotEqual(get_biome(map, Point(x, y)), Biomes.SNOWY_PEAK.value)
+
+        # Through the band once the gap is closed
+        for y in range(5, 8):
+            map.set_biome(Point(3, y), Biomes.SNOWY_PEAK)
+        obstacles = Obstacles(map)
+        cells = search((0, 0), (0, 12), obstacles)
+        self.assertEqual(len(cells), 13)
+        self.assertAlmostEqual(get_path_cost(cells, obstacles), 9 + 3 * 3)
+
+    def test_cost_chunks(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        cost_chunk = map.get_cost_chunk((0, 0))
+        self.assertIs(map.get_cost_chunk((0, 0)), cost_chunk)
+        self.assertEqual(cost_chunk[3, 4], 1)
+        map.set_biome(Point(3, 4), Biomes.LAVA)
+        self.assertEqual(map.get_cost_chunk((0, 0))[3, 4], np.inf)
+
+    def test_jump_point_search(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        rng = np.random.default_rng(3)
+        for x, y in rng.integers(-30, 30, (400, 2)):
+            map.set_biome(Point(int(x), int(y)), Biomes.LAVA)
+        bounds = (-32, -32, 31, 31)
+        for start, end in [((-25, -20), (25, 20)), ((0, -28), (3, 28)), ((-28, 5), (28, 5)), ((10, 10), (10, 10))]:
+            if Map.IMPASSABLE[get_biome(map, Point(*start))] or Map.IMPASSABLE[get_biome(map, Point(*end))]:
+                continue
+            obstacles = Obstacles(map)
+            cells = jump_point_search(start, end, obstacles, bounds = bounds)
+            optimal = search(start, end, obstacles, bounds = bounds)
+            self.assertAlmostEqual(get_path_cost(cells), get_path_cost(optimal))
+            for (x1, y1), (x2, y2) in zip(cells, cells[1:]):
+                self.assertEqual(max(abs(x2 - x1), abs(y2 - y1)), 1)
+                self.assertFalse(obstacles.is_blocked(x2, y2))
+
+        # Mixed costs: the cells of another cost are expanded one by one, the paths staying optimal
+        for x, y in rng.integers(-30, 30, (150, 2)):
+            biome = Biomes.SWAMP if x % 2 == 0 else Biomes.MOUNTAIN
+            for i in range(3):
+                for j in range(3):
+                    map.set_biome(Point(int(x) + i, int(y) + j), biome)
+        for start, end in [((-25, -20), (25, 20)), ((0, -28), (3, 28)), ((-28, 5), (28, 5)), ((20, -25), (-20, 25))]:
+            obstacles = Obstacles(map)
+            if obstacles.is_blocked(*start) or obstacles.is_blocked(*end):
+                continue
+            cells = jump_point_search(start, end, obstacles, bounds = bounds)
+            optimal = search(start, end, obstacles, bounds = bounds)
+            self.assertAlmostEqual(get_path_cost(cells, obstacles), get_path_cost(optimal, obstacles))
+            for (x1, y1), (x2, y2) in zip(cells, cells[1:]):
+                self.assertEqual(max(abs(x2 - x1), abs(y2 - y1)), 1)
+                self.assertFalse(obstacles.is_blocked(x2, y2))
+
+        # Fewer nodes expanded in the open
+        obstacles = Obstacles(map)
+        jps = JumpPointSearch((-60, -60), (60, 60), obstacles, bounds = (-64, -64, 63, 63))
+        astar_search = AStarSearch((-60, -60), (60, 60), obstacles, bounds = (-64, -64, 63, 63))
+        jps.step(100000)
+        astar_search.step(100000)
+        self.assertAlmostEqual(get_path_cost(jps.result), get_path_cost(astar_search.result))
+        self.assertLess(jps.expansions, astar_search.expansions)
+
+    def test_grid_pathfinder(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        rng = np.random.default_rng(5)
+        for x, y in rng.integers(-30, 30, (300, 2)):
+            map.set_biome(Point(int(x), int(y)), Biomes.LAVA)
+        for x, y in rng.integers(-30, 30, (300, 2)):
+            map.set_biome(Point(int(x), int(y)), Biomes.SWAMP)
+        bounds = (-40, -35, 31, 40)
+        obstacles = Obstacles(map)
+        pathfinder = GridPathfinder(get_cost_grid(obstacles, bounds), 1, bounds[:2])
+        # The same cells as the dict based search, with the grid reused by every search
+        for start, end in [((-25, -20), (25, 20)), ((0, -28), (3, 28)), ((-28, 5), (28, 5)), ((30, 39), (-40, -35))]:
+            astar_search = AStarSearch(start, end, obstacles, bounds = bounds)
+            astar_search.step(100000)
+            self.assertEqual(pathfinder.find_cells(start, end), astar_search.result)
+        self.assertIsNone(pathfinder.find_cells((0, 0), (100, 0)))
+
+    def test_reused_pathfinder(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        for y in range(-5, 6):
+            map.set_biome(Point(3, y), Biomes.LAVA)
+        bounds = (-32, -32, 31, 31)
+        obstacles = Obstacles(map)
+        pathfinder = get_grid_pathfinder(obstacles, bounds)
+        self.assertIs(get_grid_pathfinder(obstacles, bounds), pathfinder)
+        self.assertIsNot(get_grid_pathfinder(obstacles, (0, 0, 31, 31)), pathfinder)
+        # Searches in the same bounds share the pathfinder, each one finding the cells of a new search
+        for start, end in [((0, 0), (10, 0)), ((10, 0), (0, 0)), ((-20, 20), (20, -20)), ((0, 0), (10, 0))]:
+            astar_search = AStarSearch(start, end, obstacles, bounds = bounds)
+            astar_search.step(100000)
+            self.assertEqual(search(start, end, obstacles, bounds = bounds), astar_search.result)
+        self.assertIs(obstacles.pathfinders[bounds], pathfinder)
+
+        # A chunk forgotten drops the pathfinders over it
+        obstacles.forget_chunk((0, 0))
+        self.assertNotIn(bounds, obstacles.pathfinders)
+        self.assertNotIn((0, 0, 31, 31), obstacles.pathfinders)
+        get_grid_pathfinder(obstacles, (-32, -32, -1, -1))
+        obstacles.forget_chunk((0, 0))
+        self.assertIn((-32, -32, -1, -1), obstacles.pathfinders)
+
+    def test_boolean_grid(self):
+        walls = np.zeros((6, 4), dtype=bool)
+        walls[2, :3] = True
+        pathfinder = GridPathfinder(walls, 10)
+        self.assertEqual(pathfinder.get_cell((35, 19)), (3, 1))
+        self.assertTrue(pathfinder.is_blocked((2, 0)))
+        cells = pathfinder.find_cells(pathfinder.get_cell((5, 5)), pathfinder.get_cell((55, 5)))
+        self.assertIn((2, 3), cells)
+        self.assertEqual(cells[-1], (5, 0))
+        walls[2, 3] = True
+        self.assertIsNone(GridPathfinder(walls).find_cells((0, 0), (5, 0)))
+
+    def test_jump_cost(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        map.set_biome(Point(5, 5), Biomes.LAVA)
+        self.assertEqual(get_jump_cost(map, (-10, -10, 50, 20)), 1)
+        # A few cells of another cost keep the jumps
+        map.set_biome(Point(40, 5), Biomes.MOUNTAIN)
+        self.assertEqual(get_jump_cost(map, (-10, -10, 50, 20)), 1)
+        # Not when most cells cost something else
+        for x in range(-10, 51):
+            for y in range(-10, 16):
+                map.set_biome(Point(x, y), Biomes.SWAMP if x % 2 == 0 else Biomes.MOUNTAIN)
+        self.assertIsNone(get_jump_cost(map, (-10, -10, 50, 20)))
+        self.assertEqual(get_jump_cost(map, (-10, -10, -10, 20)), 1.5)
+
+    def test_resumable_search(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        for y in range(-10, 11):
+            map.set_biome(Point(8, y), Biomes.LAVA)
+        obstacles = Obstacles(map)
+        astar_search = AStarSearch((0, 0), (16, 3), obstacles)
+        steps = 0
+        while not astar_search.finished:
+            self.assertLessEqual(astar_search.step(10), 10)
+            steps += 1
+        self.assertGreater(steps, 1)
+        self.assertEqual(astar_search.result, search((0, 0), (16, 3), obstacles))
+
+    def test_line_of_sight(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        map.set_biome(Point(5, 5), Biomes.LAVA)
+        obstacles = Obstacles(map)
+        self.assertTrue(line_of_sight((0, 0), (20, 3), obstacles))
+        self.assertFalse(line_of_sight((0, 0), (10, 10), obstacles))
+        self.assertFalse(line_of_sight((0, 5), (10, 5), obstacles))
+        self.assertTrue(line_of_sight((0, 6), (10, 6), obstacles))
+        # Through the corner of the lava cell
+        self.assertFalse(line_of_sight((4, 6), (6, 4), obstacles))
+        self.assertFalse(line_of_sight((3, 7), (7, 3), obstacles))
+
+    def test_smooth_cells(self):
+        map = create_plain_map((-2, -2), (2, 2))
+        for y in range(-10, 11):
+            map.set_biome(Point(8, y), Biomes.LAVA)
+        obstacles = Obstacles(map)
+        cells = search((0, 0), (16, 0), obstacles)
+        smoothed = smooth_cells(cells, obstacles)
+        self.assertLess(len(smoothed), 6)
+        self.assertEqual(smoothed[0], (0, 0))
+        self.assertEqual(smoothed[-1], (16, 0))
+        for a, b in zip(smoothed, smoothed[1:]):
+            self.assertTrue(line_of_sight(a, b, obstacles))
+            self.assertIn(b, cells)
+
+
+if __name__ == "__main__":
+    unittest.main()
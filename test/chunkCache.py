@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.ChunkCache import ChunkCache
+from model.Map import Map, Biomes
+from model.Perlin import Perlin
+from model.Geometry import Point
+
+CHUNK_BYTES = Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE # One uint8 biome chunk
+CHUNKS = [Point(x, y) for x in range(-3, 4) for y in range(-3, 4)]
+
+
+def get_structures(map):
+    # Trees and ores of the generated chunks, each one listed as many times as it is on the map
+    trees = sorted((tree.x, tree.y) for chunk_trees in map.trees.values() for tree in chunk_trees)
+    ores = sorted((ore_type.value, ore.x, ore.y) for chunk_ores in map.ores.values() for ore_type, ores in chunk_ores.items() for ore in ores)
+    return trees, ores
+
+
+class ChunkCacheTest(unittest.TestCase):
+    def test_byte_budget(self):
+        evicted = []
+        cache = ChunkCache(3 * CHUNK_BYTES, evict_callback = lambda key, chunk: evicted.append(key))
+        for key in range(3):
+            cache[key] = np.zeros((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype=np.uint8)
+        self.assertEqual(cache.bytes, 3 * CHUNK_BYTES)
+        self.assertEqual(evicted, [])
+
+        # The least recently used chunk leaves first
+        cache.get(0)
+        cache[3] = np.zeros((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype=np.uint8)
+        self.assertEqual(evicted, [1])
+        self.assertEqual(list(cache), [2, 0, 3])
+        self.assertEqual(cache.bytes, 3 * CHUNK_BYTES)
+
+        cache.set_max_bytes(CHUNK_BYTES)
+        self.assertEqual(evicted, [1, 2, 0])
+        self.assertEqual(cache.bytes, CHUNK_BYTES)
+
+        # The last chunk stays even over the budget
+        cache[4] = np.zeros((2 * Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype=np.uint8)
+        self.assertEqual(list(cache), [4])
+        self.assertEqual(cache.bytes, 2 * CHUNK_BYTES)
+        cache.pop(4)
+        self.assertEqual(cache.bytes, 0)
+
+    def test_spilled_chunks(self):
+        map = Map(42, chunk_cache_budget = 4 * CHUNK_BYTES)
+        for chunk_coords in CHUNKS:
+            map.get_chunk(chunk_coords)
+        self.assertLessEqual(map.map_chunks.bytes, 4 * CHUNK_BYTES)
+        structures = get_structures(map)
+        self.assertGreater(len(structures[0]), 0)
+        chunks = {(chunk_coords.x, chunk_coords.y): map.get_chunk(chunk_coords).copy() for chunk_coords in CHUNKS}
+
+        # An edited chunk is written to disk when it leaves the cache
+        edited = Point(0, 0)
+        map.set_biome(Point(5, 7), Biomes.LAVA)
+        chunks[(0, 0)][5, 7] = Biomes.LAVA.value
+        for chunk_coords in CHUNKS[-4:]:
+            map.get_chunk(chunk_coords)
+        self.assertNotIn(edited, map.map_chunks)
+        self.assertIn(edited, map.spilled_chunks)
+        spill_path = map.get_spill_path(edited)
+        self.assertTrue(os.path.exists(spill_path))
+
+        # and read back from it, while the other chunks are generated again without their structures
+        np.testing.assert_array_equal(map.get_chunk(edited), chunks[(0, 0)])
+        self.assertNotIn(edited, map.spilled_chunks)
+        self.assertFalse(os.path.exists(spill_path))
+        for chunk_coords in CHUNKS:
+            np.testing.assert_array_equal(map.get_chunk(chunk_coords), chunks[(chunk_coords.x, chunk_coords.y)])
+            self.assertEqual(map.get_chunk(chunk_coords).dtype, np.uint8)
+        self.assertEqual(map.spilled_chunks, {edited})
+        self.assertEqual(get_structures(map), structures)
+        self.assertLessEqual(map.map_chunks.bytes, 4 * CHUNK_BYTES)
+
+
+if __name__ == "__main__":
+    unittest.main()
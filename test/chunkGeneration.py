@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.Perlin import Perlin
+from model.Geometry import Point
+
+SEED = 42
+CHUNKS = [(x, y) for x in range(-3, 4) for y in range(-3, 4)]
+
+
+def get_height_biome(height):
+    # Biome of a noise height as chosen cell by cell before the chunks were classified with np.digitize
+    if height > 4.5:
+        return Biomes.SNOWY_PEAK.value
+    elif height > 2.5:
+        return Biomes.MOUNTAIN.value
+    elif height > 0:
+        return Biomes.FOREST.value
+    elif height > -2.75:
+        return Biomes.PLAIN.value
+    elif height > -4:
+        return Biomes.VOLCANO.value
+    else:
+        return Biomes.LAVA.value
+
+def generate_chunks(order):
+    # Run in a separate process: generate the chunks in the given order and describe them
+    random.seed(os.getpid())
+    map = Map(SEED)
+    for x, y in order:
+        map.get_chunk(Point(x, y))
+
+    result = {}
+    for x, y in CHUNKS:
+        chunk_coords = Point(x, y)
+        trees = sorted((tree.x, tree.y) for tree in map.trees.get(chunk_coords, []))
+        ores = sorted((ore_type.value, ore.x, ore.y) for ore_type, chunk_ores in map.ores.get(chunk_coords, {}).items() for ore in chunk_ores)
+        result[(x, y)] = (map.get_chunk(chunk_coords).tobytes(), trees, ores)
+    return result
+
+
+class TestChunkGeneration(unittest.TestCase):
+    def test_generation_does_not_depend_on_chunk_order(self):
+        orders = [list(CHUNKS)]
+        shuffler = random.Random(0)
+        for _ in range(3):
+            order = list(CHUNKS)
+            shuffler.shuffle(order)
+            orders.append(order)
+
+        with multiprocessing.get_context("spawn").Pool(len(orders)) as pool:
+            results = pool.map(generate_chunks, orders)
+
+        self.assertTrue(any(len(trees) > 0 for _, trees, _ in results[0].values()))
+        self.assertTrue(any(len(ores) > 0 for _, _, ores in results[0].values()))
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_generation_does_not_use_global_random(self):
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        map = Map(SEED)
+        map.get_region(Point(-1, -1), 3, 3)
+        self.assertEqual(random.random(), expected)
+
+    def test_biomes_match_height_tresholds(self):
+        # Each treshold, the closest heights around it and random heights, on both sides of 0
+        heights = []
+        for treshold in [-4, -2.75, 0, 2.5, 4.5]:
+            heights.extend([treshold, np.nextafter(treshold, -np.inf), np.nextafter(treshold, np.inf), treshold - 0.01, treshold + 0.01])
+        heights.extend([-np.inf, np.inf, -1e9, 1e9])
+        rng = np.random.default_rng(6)
+        heights.extend(rng.uniform(-7, 7, Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE - len(heights)))
+        chunk_data = np.array(heights, dtype=np.float64).reshape((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE))
+
+        map = Map(SEED)
+        processed_chunk = map.process_chunk(chunk_data, None, Point(0, 0), False)
+        expected = np.vectorize(get_height_biome)(chunk_data)
+        np.testing.assert_array_equal(processed_chunk, expected)
+        self.assertEqual(processed_chunk.dtype, np.uint8)
+        self.assertEqual(map.trees, {})
+        self.assertEqual(map.ores, {})
+
+        # The same on generated chunks
+        for x, y in CHUNKS:
+            chunk_data = map.perlin_temperature.get_chunk_data(x, y)
+            np.testing.assert_array_equal(map.get_chunk(Point(x, y)), np.vectorize(get_height_biome)(chunk_data))
+
+    def test_region_matches_chunks(self):
+        region_map = Map(SEED)
+        chunk_map = Map(SEED)
+        region = region_map.get_region(Point(-3, -2), 4, 3)
+        self.assertEqual(region.shape, (4 * Perlin.CHUNK_SIZE, 3 * Perlin.CHUNK_SIZE))
+        for i in range(4):
+            for j in range(3):
+                chunk = region[i * Perlin.CHUNK_SIZE:(i + 1) * Perlin.CHUNK_SIZE, j * Perlin.CHUNK_SIZE:(j + 1) * Perlin.CHUNK_SIZE]
+                np.testing.assert_array_equal(chunk, chunk_map.get_chunk(Point(i - 3, j - 2)))
+        # The structures of the chunks too
+        self.assertEqual(region_map.trees, chunk_map.trees)
+        self.assertEqual(region_map.ores, chunk_map.ores)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.AStar import find_cells, get_path_cost
+from model.ChunkGraph import ChunkGraph
+from model.Perlin import Perlin
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+class ChunkGraphTest(unittest.TestCase):
+    def check_path(self, map, cells, start, end):
+        self.assertEqual(cells[0], start)
+        self.assertEqual(cells[-1], end)
+        for (x1, y1), (x2, y2) in zip(cells, cells[1:]):
+            self.assertLessEqual(max(abs(x2 - x1), abs(y2 - y1)), 1)
+            self.assertFalse(Map.IMPASSABLE[map.get_chunk(Point(x2, y2) // Perlin.CHUNK_SIZE)[x2 % Perlin.CHUNK_SIZE, y2 % Perlin.CHUNK_SIZE]])
+
+    def test_close_to_optimal(self):
+        map = create_plain_map((-2, -2), (7, 4))
+        graph = map.get_chunk_graph("walk")
+        start, end = (3, 5), (200, 90)
+        cells, chunks = graph.find_cells(start, end)
+        self.check_path(map, cells, start, end)
+        optimal, _ = find_cells(Point(*start), Point(*end), map, "walk", 100000)
+        self.assertLessEqual(get_path_cost(cells), get_path_cost(optimal) * 1.15)
+        self.assertIn((0, 0), chunks)
+
+    def test_wall(self):
+        map = create_plain_map((-2, -2), (7, 4))
+        graph = map.get_chunk_graph("walk")
+        start, end = (3, 5), (150, 5)
+        graph.find_cells(start, end)
+        built_chunks = graph.built_chunks
+
+        # Lava wall across the map with a single gap at y = 100
+        for y in range(-320, 320):
+            if y != 100:
+                map.set_biome(Point(64, y), Biomes.LAVA)
+        cells, _ = graph.find_cells(start, end)
+        self.check_path(map, cells, start, end)
+        self.assertIn((64, 100), cells)
+        # Only the chunks around the wall are rebuilt
+        self.assertLess(graph.built_chunks - built_chunks, 30)
+
+    def test_unreachable_end(self):
+        map = create_plain_map((-2, -2), (7, 4))
+        graph = map.get_chunk_graph("walk")
+        # An end on lava is rejected without building any chunk
+        map.set_biome(Point(200, 90), Biomes.LAVA)
+        cells, chunks = graph.find_cells((3, 5), (200, 90))
+        self.assertIsNone(cells)
+        self.assertEqual(graph.built_chunks, 0)
+        self.assertIn((6, 2), chunks)
+
+        # An end enclosed by lava makes the graph search spread over the world, until it falls back to A*
+        for x in range(196, 205):
+            for y in range(36, 45):
+                if max(abs(x - 200), abs(y - 40)) == 4:
+                    map.set_biome(Point(x, y), Biomes.LAVA)
+        cells, chunks = graph.find_cells((3, 5), (200, 40))
+        self.assertIsNone(cells)
+        self.assertEqual(graph.fallbacks, 1)
+        self.assertLessEqual(graph.built_chunks, ChunkGraph.MAX_BUILT_CHUNKS + 6 * ChunkGraph.BUILT_CHUNKS_PER_DISTANCE + 1)
+        self.assertIn((6, 1), chunks)
+
+    def test_map_find_path(self):
+        map = create_plain_map((-2, -2), (7, 4))
+        path = map.find_path(Point(3, 5), Point(200, 90))
+        self.assertEqual(path[0], Point(3, 5) * Map.CELL_SIZE + Point(Map.CELL_SIZE, Map.CELL_SIZE) // 2)
+        self.assertEqual(len(map.chunk_graphs), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
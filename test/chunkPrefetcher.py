@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.ChunkCache import ChunkCache
+from model.Map import Map
+from model.Geometry import Point
+
+VIEW_SIZE = Point(1200, 900) # The visible chunks are (-1, -1) to (0, 0) with the camera at the origin
+
+
+class RecordingCache(ChunkCache):
+    # Chunk cache remembering the threads that filled it
+    __slots__ = ["threads"]
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+
+    def __setitem__(self, key, chunk):
+        self.threads.add(threading.current_thread())
+        super().__setitem__(key, chunk)
+
+
+def wait(prefetcher):
+    # Chunks generated by the workers handed to the map
+    while len(prefetcher.pending) > 0:
+        for future in list(prefetcher.pending.values()):
+            future.result()
+        prefetcher.collect()
+
+
+class ChunkPrefetcherTest(unittest.TestCase):
+    def test_moving_camera(self):
+        map = Map(42)
+        map.map_chunks = RecordingCache(Map.CHUNK_CACHE_BUDGET, evict_callback = map.chunk_evicted)
+        prefetcher = map.prefetcher
+        prefetcher.update(Point(0, 0), VIEW_SIZE, 0.1)
+        map.get_region(Point(-1, -1), 2, 2)
+        self.assertEqual(prefetcher.misses, 4)
+        self.assertEqual(prefetcher.hits, 0)
+        self.assertEqual(len(prefetcher.pending), 0) # Nothing ahead of a still camera
+
+        # The chunks right of the view are generated when the camera moves right
+        prefetcher.update(Point(200, 0), VIEW_SIZE, 0.1)
+        self.assertEqual(prefetcher.direction, Point(1, 0))
+        ahead = [Point(x, y) for x in range(1, 3) for y in range(-1, 1)]
+        self.assertEqual(sorted(prefetcher.pending, key = lambda chunk_coords: (chunk_coords.x, chunk_coords.y)), ahead)
+        for future in list(prefetcher.pending.values()):
+            future.result()
+        for chunk_coords in ahead:
+            self.assertNotIn(chunk_coords, map.map_chunks) # Only the noise is computed by the workers
+        wait(prefetcher)
+        self.assertEqual(map.map_chunks.threads, {threading.main_thread()})
+        expected = Map(42)
+        for chunk_coords in ahead:
+            self.assertIn(chunk_coords, map.map_chunks)
+            np.testing.assert_array_equal(map.map_chunks.get(chunk_coords), expected.get_chunk(chunk_coords))
+        self.assertEqual(prefetcher.prefetched, set(ahead))
+
+        # The view reaching them finds them ready
+        map.get_region(Point(-1, -1), 4, 2)
+        self.assertEqual(prefetcher.hits, 4)
+        self.assertEqual(prefetcher.misses, 4)
+        self.assertEqual(prefetcher.prefetched, set())
+        map.get_region(Point(3, -1), 1, 2)
+        self.assertEqual(prefetcher.misses, 6)
+
+        # Nothing is requested once the camera stops
+        prefetcher.update(Point(200, 0), VIEW_SIZE, 0.1)
+        self.assertEqual(prefetcher.direction, Point(0, 0))
+        self.assertEqual(len(prefetcher.pending), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.EntityRegistry import EntityRegistry
+from model.Map import Map
+from model.Human import Colon, HumanType
+from model.Player import Player
+from model.Structures import BaseCamp, BuildingType
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+class EntityRegistryTest(unittest.TestCase):
+    def test_slots(self):
+        registry = EntityRegistry()
+        entities = {}
+        for entity_id in range(1, 21):
+            entities[entity_id] = f"entity {entity_id}"
+            registry.add(entity_id, entities[entity_id], entity_id % 3, entity_id % 2)
+        with self.assertRaises(KeyError):
+            registry.add(5, "other")
+
+        # Removing from the start, the middle and the end keeps the other ids pointing to their entity
+        for entity_id in [1, 10, 20, 7]:
+            self.assertEqual(registry.remove(entity_id), entities.pop(entity_id))
+        self.assertIsNone(registry.remove(10))
+        self.assertEqual(len(registry), len(entities))
+        self.assertEqual(sorted(registry), sorted(entities.values()))
+        for entity_id, entity in entities.items():
+            self.assertIn(entity_id, registry)
+            self.assertEqual(registry.get(entity_id), entity)
+        self.assertNotIn(7, registry)
+        self.assertIsNone(registry.get(7))
+
+        self.assertEqual(sorted(registry.by_owner(1)), sorted(entity for entity_id, entity in entities.items() if entity_id % 3 == 1))
+        self.assertEqual(sorted(registry.by_type(0)), sorted(entity for entity_id, entity in entities.items() if entity_id % 2 == 0))
+        self.assertEqual(registry.by_owner(5), [])
+
+        registry.clear()
+        self.assertEqual(len(registry), 0)
+        self.assertEqual(registry.by_type(0), [])
+
+    def test_map(self):
+        map = create_plain_map((-1, -1), (1, 1))
+        player = Player(None)
+        other = Player(None)
+        camp = BaseCamp(Point(0, 0), player, None, None)
+        map.place_structure(camp)
+        humans = [Colon(map, Point(3, i) * Map.CELL_SIZE, player if i % 2 == 0 else other, None) for i in range(4)]
+        for human in humans:
+            map.place_human(human, human.current_location)
+
+        self.assertIs(map.buildings.get(camp.sid), camp)
+        self.assertEqual(map.buildings.by_type(BuildingType.BASE_CAMP), [camp])
+        self.assertEqual(map.humans.by_owner(other), [humans[1], humans[3]])
+        self.assertEqual(len(map.humans.by_type(HumanType.COLON)), 4)
+
+        map.remove_human(humans[1])
+        self.assertNotIn(humans[1].hid, map.humans)
+        self.assertIs(map.humans.get(humans[3].hid), humans[3])
+        self.assertEqual(map.humans.by_owner(other), [humans[3]])
+
+        map.remove_building(camp)
+        self.assertEqual(map.buildings.by_owner(player), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.PathService import PathService
+from model.Human import Colon
+from model.Player import Player
+from model.Perlin import Perlin
+from model.Structures import TypedStructure, StructureType, Orientation
+from model.Geometry import Point, Rectangle
+from model.Saver import Saver
+
+# Objects shared by the tests
+
+
+def create_plain_map(first_chunk = (-3, -3), last_chunk = (3, 3), mode = PathService.MODE):
+    # Map whose chunks from first_chunk to last_chunk, included, are plains
+    map = Map(42)
+    map.path_service.mode = mode
+    for x in range(first_chunk[0], last_chunk[0] + 1):
+        for y in range(first_chunk[1], last_chunk[1] + 1):
+            map.set_chunk(Point(x, y), np.full((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), Biomes.PLAIN.value, dtype=np.uint8))
+    return map
+
+def create_building(type, coords):
+    # 3x3 building without player
+    return TypedStructure(type, StructureType.BUILDING, coords, Rectangle(-1, -1, 1, 1).toPointList(), Orientation.NORTH)
+
+def create_human(map, cell, player = None):
+    return Colon(map, cell * Map.CELL_SIZE, Player(None) if player is None else player, None)
+
+def wait(map):
+    # Paths of the workers handed to the humans, the long ones once their snapshot is read
+    while any(len(request.unread_chunks) > 0 for request in map.path_service.requests.values()):
+        map.path_service.update()
+    for request in list(map.path_service.requests.values()):
+        request.future.result()
+    map.path_service.update()
+
+def create_game(map, player = None):
+    # What the saver reads from the game vue
+    return SimpleNamespace(map = map, player = Player(None) if player is None else player, camera_pos = Point(0, 0), building_destroyed_callback = None, human_died_callback = None)
+
+def save_and_load(game):
+    # New game loaded from a save of the game, written in a temporary directory
+    loaded = create_game(Map(0))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            Saver(game, "test").save()
+            Saver(loaded, "test").load()
+        finally:
+            os.chdir(cwd)
+    return loaded
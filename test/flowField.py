@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.AStar import Obstacles, find_cells, get_path_cost
+from model.Human import Human, Colon
+from model.Player import Player
+from model.Structures import BuildingType, Tree, Orientation
+from model.Geometry import Point
+
+from fixtures import create_plain_map, create_building
+
+
+class FlowFieldTest(unittest.TestCase):
+    def test_shortest_paths(self):
+        map = create_plain_map()
+        pantry = create_building(BuildingType.PANTRY, Point(10, 10))
+        map.place_structure(pantry)
+        for y in range(-20, 25):
+            map.set_biome(Point(0, y), Biomes.LAVA)
+
+        flow_field = map.get_flow_field((10, 10))
+        for start in [(-10, 0), (-30, 40), (50, 60), (11, 9)]:
+            cells = flow_field.get_cells(start)
+            optimal, _ = find_cells(Point(*start), Point(10, 10), map, "walk", 100000)
+            self.assertEqual(cells[0], start)
+            self.assertEqual(cells[-1], (10, 10))
+            self.assertAlmostEqual(get_path_cost(cells), get_path_cost(optimal))
+        self.assertEqual(flow_field.builds, 1)
+
+        # Outside of the field
+        self.assertIsNone(flow_field.get_cells((100, 0)))
+
+    def test_biome_costs(self):
+        map = create_plain_map()
+        pantry = create_building(BuildingType.PANTRY, Point(10, 10))
+        map.place_structure(pantry)
+        for x in range(-20, 30):
+            for y in range(0, 4):
+                map.set_biome(Point(x, y), Biomes.MOUNTAIN)
+
+        flow_field = map.get_flow_field((10, 10))
+        obstacles = Obstacles(map, "walk", [pantry])
+        for start in [(-10, -10), (25, -5), (0, 30)]:
+            cells = flow_field.get_cells(start)
+            optimal, _ = find_cells(Point(*start), Point(10, 10), map, "walk", 100000)
+            self.assertAlmostEqual(get_path_cost(cells, obstacles), get_path_cost(optimal, obstacles))
+
+    def test_refresh(self):
+        map = create_plain_map()
+        map.smooth_paths = False # One point per cell
+        camp = create_building(BuildingType.LUMBER_CAMP, Point(10, 10))
+        map.place_structure(camp)
+        path = map.find_path(Point(20, 10), Point(10, 10))
+        flow_field = map.flow_fields[camp]
+        self.assertEqual(flow_field.builds, 1)
+        self.assertEqual(len(path), 11)
+
+        tree = Tree(Point(15, 10), None, Orientation.NORTH)
+        map.place_structure(tree)
+        self.assertTrue(flow_field.dirty)
+        path = map.find_path(Point(20, 10), Point(10, 10))
+        self.assertEqual(flow_field.builds, 2)
+        for point in path:
+            self.assertIsNot(map.occupancy.get(point // Map.CELL_SIZE), tree)
+
+        map.remove_building(camp)
+        self.assertNotIn(camp, map.flow_fields)
+
+    def test_deferred_build(self):
+        for mode in ["threads", "sliced"]:
+            map = create_plain_map()
+            map.path_service.mode = mode
+            camp = create_building(BuildingType.LUMBER_CAMP, Point(10, 10))
+            map.place_structure(camp)
+            humans = [Colon(map, Point(x, 20) * Map.CELL_SIZE, Player(None), None) for x in range(20, 23)]
+            for human in humans:
+                human.create_path(Point(10, 10))
+            # Built once off the update for the humans going to the camp
+            flow_field = map.flow_fields[camp]
+            self.assertEqual(flow_field.builds, 0)
+            self.assertEqual(len(map.path_service.field_humans), 3)
+
+            # Changed during the build: built again from the new map
+            tree = Tree(Point(15, 15), None, Orientation.NORTH)
+            map.place_structure(tree)
+            for _ in range(1000):
+                time.sleep(0.001) # For the workers
+                map.path_service.update()
+                if not any(human.waiting_for_path for human in humans):
+                    break
+            self.assertEqual(flow_field.builds, 1)
+            self.assertEqual(map.path_service.stale, 1)
+            for human in humans:
+                self.assertFalse(human.waiting_for_path)
+                self.assertLessEqual(human.path[-1].distance(Point(10, 10) * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+                for point in human.path:
+                    self.assertIsNot(map.occupancy.get(point // Map.CELL_SIZE), tree)
+            self.assertEqual(map.path_service.submitted, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.Human import Human, HumanState
+from model.Geometry import Point
+
+from fixtures import create_plain_map, create_human, wait
+
+
+class GroupMoveTest(unittest.TestCase):
+    def test_one_search(self):
+        map = create_plain_map()
+        humans = [create_human(map, Point(x, y)) for x in range(3) for y in range(3)]
+        map.move_group(humans, Point(40, 10))
+        # The leader searches its path off the main thread, the members wait for it
+        self.assertEqual(map.path_cache.report()["misses"], 1)
+        self.assertEqual(map.path_service.submitted, 1)
+        self.assertEqual(len(map.path_service.groups), len(humans))
+        for human in humans:
+            self.assertTrue(human.waiting_for_path)
+        wait(map)
+        self.assertEqual(len(map.path_service.groups), 0)
+        self.assertEqual(map.path_service.submitted, 1)
+
+        slots = set()
+        for human in humans:
+            self.assertFalse(human.waiting_for_path)
+            self.assertEqual(human.state, HumanState.MOVING)
+            slot = human.target_location
+            self.assertLessEqual(max(abs(slot.x - 40), abs(slot.y - 10)), 1)
+            slots.add((slot.x, slot.y))
+        self.assertEqual(len(slots), len(humans))
+
+        # The center of the group leads to the clicked cell, and the members keep their side of the group
+        self.assertEqual(humans[4].target_location, Point(40, 10))
+        self.assertEqual(humans[0].target_location, Point(39, 9))
+        self.assertEqual(humans[8].target_location, Point(41, 11))
+
+        for _ in range(100):
+            for human in humans:
+                human.update(0.5)
+        for human in humans:
+            self.assertEqual(human.state, HumanState.IDLE)
+            self.assertLessEqual(human.current_location.distance(human.target_location * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+
+    def test_slots_avoid_obstacles(self):
+        map = create_plain_map()
+        map.set_biome(Point(21, 20), Biomes.LAVA)
+        map.set_biome(Point(19, 20), Biomes.LAVA)
+        humans = [create_human(map, Point(x, 0)) for x in range(5)]
+        map.move_group(humans, Point(20, 20))
+        wait(map)
+        for human in humans:
+            self.assertNotIn((human.target_location.x, human.target_location.y), [(21, 20), (19, 20)])
+            for point in human.path[:-1]:
+                cell = point // Map.CELL_SIZE
+                self.assertNotIn((cell.x, cell.y), [(21, 20), (19, 20)])
+
+    def test_single_human(self):
+        map = create_plain_map()
+        human = create_human(map, Point(0, 0))
+        map.move_group([human], Point(10, 10))
+        self.assertTrue(human.waiting_for_path)
+        self.assertEqual(human.target_location, Point(10, 10))
+
+    def test_changed_orders(self):
+        map = create_plain_map()
+        humans = [create_human(map, Point(x, 0)) for x in range(4)]
+        map.move_group(humans, Point(30, 30))
+        # A member given another order leaves the group
+        humans[0].set_target_location(Point(-10, 0))
+        humans[1].stop()
+        wait(map)
+        self.assertEqual(humans[0].target_location, Point(-10, 0))
+        self.assertLessEqual(humans[0].path[-1].distance(Point(-10, 0) * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+        self.assertEqual(humans[1].state, HumanState.IDLE)
+        for human in humans[2:]:
+            self.assertFalse(human.waiting_for_path)
+            self.assertLessEqual(max(abs(human.target_location.x - 30), abs(human.target_location.y - 30)), 1)
+
+        # Without members left, the search of the leader is cancelled
+        map.move_group(humans, Point(-20, 20))
+        for human in humans:
+            human.stop()
+        self.assertEqual(len(map.path_service.human_requests), 0)
+        wait(map)
+        for human in humans:
+            self.assertEqual(human.state, HumanState.IDLE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map
+from model.Human import Colon, HumanState
+from model.Player import Player
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+def place_walkers(map, count):
+    # Humans walking a path of several segments, each one a few cells long
+    humans = []
+    player = Player(None)
+    for i in range(count):
+        human = Colon(map, Point(i % 10, i // 10) * Map.CELL_SIZE, player, None)
+        map.place_human(human, human.current_location)
+        start = human.current_location
+        path = [start, start + Point(7, 0) * Map.CELL_SIZE, start + Point(7, 5 + i % 3) * Map.CELL_SIZE, start + Point(-4, 9) * Map.CELL_SIZE]
+        human.state = HumanState.MOVING
+        human.set_path(path)
+        human.path[-1] = path[-2] + Point(-11, 4) * Map.CELL_SIZE # Without the random offset of set_path
+        humans.append(human)
+    return humans
+
+
+class HumanTableTest(unittest.TestCase):
+    def test_vectorized_move(self):
+        vectorized_map = create_plain_map((-2, -2), (2, 2), "sliced")
+        scalar_map = create_plain_map((-2, -2), (2, 2), "sliced")
+        vectorized = place_walkers(vectorized_map, 25)
+        scalar = place_walkers(scalar_map, 25)
+
+        moved = 0
+        for _ in range(150):
+            vectorized_map.update(0.1)
+            moved += int(np.count_nonzero(vectorized_map.human_table.moved[:len(vectorized)]))
+            for human in scalar:
+                human.update(0.1)
+        # Most steps are done by the table, and they end where Human.move alone ends
+        self.assertGreater(moved, 25 * 150 // 2)
+        for vectorized_human, scalar_human in zip(vectorized, scalar):
+            location, scalar_location = vectorized_human.current_location, scalar_human.current_location
+            self.assertEqual((location.x, location.y), (scalar_location.x, scalar_location.y))
+            self.assertEqual(vectorized_human.state, scalar_human.state)
+            self.assertEqual(vectorized_human.orientation, scalar_human.orientation)
+            self.assertEqual(vectorized_human.cell, vectorized_map.get_cell(location))
+        self.assertTrue(all(human.state == HumanState.IDLE for human in vectorized))
+
+    def test_rows(self):
+        map = create_plain_map((-2, -2), (2, 2), "sliced")
+        humans = place_walkers(map, 100) # More than the rows allocated at first
+        locations = {human: human.current_location for human in humans}
+        for human in humans[::3]:
+            map.remove_human(human)
+        self.assertEqual(len(map.human_table), len(map.humans))
+        for row, human in enumerate(map.human_table.humans):
+            self.assertEqual(human.row, row)
+        for human in humans:
+            # The removed humans keep their values
+            self.assertEqual(human.current_location.x, locations[human].x)
+            self.assertEqual(human.current_location.y, locations[human].y)
+            self.assertEqual(human.state, HumanState.MOVING)
+
+
+if __name__ == "__main__":
+    unittest.main()
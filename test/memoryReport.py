@@ -0,0 +1,68 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.Perlin import Perlin
+from model.Geometry import Point
+
+from fixtures import create_game, save_and_load
+
+CELLS = Perlin.CHUNK_SIZE * Perlin.CHUNK_SIZE
+
+
+class MemoryReportTest(unittest.TestCase):
+    def test_uint8_chunks(self):
+        map = Map(42)
+        self.assertEqual(map.get_chunk(Point(-2, 3)).dtype, np.uint8)
+        self.assertEqual(map.get_region(Point(-1, -1), 3, 2).dtype, np.uint8)
+        map.set_biome(Point(-40, 100), Biomes.LAVA)
+        self.assertEqual(map.get_chunk(Point(-2, 3)).dtype, np.uint8)
+        self.assertEqual(map.get_chunk(Point(-2, 3))[24, 4], Biomes.LAVA.value)
+
+    def test_memory_report(self):
+        map = Map(42)
+        map.get_region(Point(-1, -1), 3, 2)
+        report = map.memory_report()
+        self.assertEqual(report, {
+            "biome_chunks": 6,
+            "biome_chunk_bytes": CELLS,
+            "biome_chunk_bytes_int64": 8 * CELLS,
+            "biome_chunks_total_bytes": 6 * CELLS,
+            "biome_chunks_total_bytes_int64": 6 * 8 * CELLS,
+            "spilled_chunks": 0,
+            "noise_chunks": 6,
+            "noise_chunks_total_bytes": 6 * 8 * CELLS # float64 noise
+        })
+
+        # The report of the debug key adds the path finding counters
+        full_report = map.report()
+        for name, value in report.items():
+            self.assertEqual(full_report[name], value)
+        self.assertEqual(full_report["path_cache_misses"], 0)
+        self.assertEqual(full_report["path_service_submitted"], 0)
+
+    def test_saved_chunks(self):
+        map = Map(42)
+        map.get_region(Point(-2, -1), 3, 3)
+        map.set_biome(Point(-50, 10), Biomes.LAVA)
+        map.set_biome(Point(5, 70), Biomes.OCEAN)
+        chunks = {(chunk_coords.x, chunk_coords.y): chunk.copy() for chunk_coords, chunk in map.get_chunks()}
+
+        loaded = save_and_load(create_game(map)).map
+        self.assertEqual(loaded.generated_chunks, map.generated_chunks)
+        for chunk_coords, chunk in loaded.get_chunks():
+            self.assertEqual(chunk.dtype, np.uint8)
+            self.assertEqual(chunk.shape, (Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE))
+            np.testing.assert_array_equal(chunk, chunks[(chunk_coords.x, chunk_coords.y)])
+        self.assertEqual(loaded.get_chunk(Point(-2, 0))[14, 10], Biomes.LAVA.value)
+        self.assertEqual(loaded.get_chunk(Point(0, 2))[5, 6], Biomes.OCEAN.value)
+        self.assertEqual(loaded.memory_report()["biome_chunks_total_bytes"], len(chunks) * CELLS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.BuildingIndex import BuildingIndex
+from model.Structures import BuildingType
+from model.Geometry import Point
+
+from fixtures import create_plain_map, create_building
+
+
+class NearestBuildingTest(unittest.TestCase):
+    def test_index(self):
+        index = BuildingIndex()
+        near = create_building(BuildingType.PANTRY, Point(40, 5))
+        far = create_building(BuildingType.PANTRY, Point(-200, 300))
+        camp = create_building(BuildingType.BASE_CAMP, Point(2, 2))
+        for building in [near, far, camp]:
+            index.add(building)
+
+        self.assertEqual(index.nearest([BuildingType.PANTRY], Point(0, 0), 1), [near])
+        self.assertEqual(index.nearest([BuildingType.PANTRY, BuildingType.BASE_CAMP], Point(0, 0), 2), [camp, near])
+        self.assertEqual(index.nearest([BuildingType.PANTRY], Point(0, 0), 1, lambda building: building is not near), [far])
+        self.assertEqual(index.query([BuildingType.PANTRY], (0, 0), 1), [near])
+
+        index.remove(near)
+        self.assertEqual(index.nearest([BuildingType.PANTRY], Point(0, 0), 1), [far])
+        self.assertEqual(index.nearest([BuildingType.FARM], Point(0, 0), 1), [])
+
+    def test_nearest_by_path(self):
+        map = create_plain_map()
+        # Closest in a straight line, but behind a lava wall
+        behind_wall = create_building(BuildingType.PANTRY, Point(10, 0))
+        reachable = create_building(BuildingType.PANTRY, Point(-20, 0))
+        map.place_structure(behind_wall)
+        map.place_structure(reachable)
+        for x in range(5, 16):
+            map.set_biome(Point(x, -5), Biomes.LAVA)
+            map.set_biome(Point(x, 5), Biomes.LAVA)
+        for y in range(-5, 6):
+            map.set_biome(Point(5, y), Biomes.LAVA)
+            map.set_biome(Point(15, y), Biomes.LAVA)
+
+        end, path = map.find_nearest_path(Point(0, 0), [behind_wall.coords, reachable.coords])
+        self.assertEqual(end, reachable.coords)
+        self.assertEqual(path[-1] // Map.CELL_SIZE, reachable.coords)
+
+        map.remove_building(reachable)
+        self.assertEqual(map.find_nearest_path(Point(0, 0), [behind_wall.coords]), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
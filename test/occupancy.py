@@ -0,0 +1,52 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Occupancy import Occupancy
+from model.Structures import Tree, Ore, OreType, Orientation
+from model.Geometry import Point
+
+
+class OccupancyTest(unittest.TestCase):
+    def test_add_and_remove(self):
+        occupancy = Occupancy()
+        tree = Tree(Point(31, 5), None, Orientation.NORTH) # Spans chunks (0, 0) and (1, 0)
+        self.assertTrue(occupancy.is_free(tree))
+        occupancy.add(tree)
+
+        self.assertIs(occupancy.get(Point(32, 6)), tree)
+        self.assertIs(occupancy.get(Point(30, 4)), tree)
+        self.assertIsNone(occupancy.get(Point(33, 5)))
+        self.assertEqual(len(occupancy), 9)
+        self.assertEqual(occupancy.get_chunk_structures((1, 0)), [tree])
+
+        ore = Ore(OreType.IRON, Point(33, 5), None, Orientation.NORTH)
+        self.assertFalse(occupancy.is_free(ore))
+
+        occupancy.remove(tree)
+        self.assertEqual(len(occupancy), 0)
+        self.assertIsNone(occupancy.get(Point(31, 5)))
+        self.assertEqual(occupancy.get_chunk_structures((0, 0)), [])
+        self.assertTrue(occupancy.is_free(ore))
+
+    def test_negative_cells(self):
+        occupancy = Occupancy()
+        ore = Ore(OreType.STONE, Point(-1, -33), None, Orientation.EAST)
+        occupancy.add(ore)
+        for point in ore.points:
+            self.assertIs(occupancy.get(ore.coords + point), ore)
+        self.assertEqual(sorted((cell.x, cell.y) for cell, _ in occupancy.items()), sorted((ore.coords.x + point.x, ore.coords.y + point.y) for point in ore.points))
+
+    def test_set_cell(self):
+        occupancy = Occupancy()
+        tree = Tree(Point(0, 0), None, Orientation.NORTH)
+        for point in tree.points:
+            occupancy.set(tree.coords + point, tree)
+        cells = {chunk_coords: len(points) for chunk_coords, points in occupancy.chunk_cells()}
+        self.assertEqual(cells, {Point(-1, -1): 1, Point(0, -1): 2, Point(-1, 0): 2, Point(0, 0): 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
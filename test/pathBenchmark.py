@@ -0,0 +1,205 @@
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map
+from model.Perlin import Perlin
+from model.Structures import Tree, Orientation
+from model.Geometry import Point
+from model.AStar import AStarSearch, JumpPointSearch, Obstacles, MAX_EXPANSIONS, get_allowed_structures, get_path_cost, get_jump_bounds
+
+# Replays the same path queries on maps built from fixed seeds through every search and saves the results as JSON,
+# to compare them between commits: python test/pathBenchmark.py new.json --compare old.json
+
+SEEDS = [1, 42, 1234]
+AREA = 160 # Queries start within this many cells around the origin
+DENSITIES = {"none": 0, "low": 8, "high": 24} # Trees added to each chunk around the origin
+LENGTHS = {"short": (4, 16), "medium": (16, 48), "long": (48, 128)} # Cells between the start and the end
+QUERIES = 10 # Per seed, density and length
+REFERENCE_EXPANSIONS = 10 ** 6 # The reference A* is not cut short
+
+
+def build_map(seed, trees):
+    map = Map(seed)
+    map.smooth_paths = False
+    rng = random.Random(seed)
+    chunks = range((-AREA - LENGTHS["long"][1]) // Perlin.CHUNK_SIZE - 1, (AREA + LENGTHS["long"][1]) // Perlin.CHUNK_SIZE + 2)
+    for x in chunks:
+        for y in chunks:
+            map.get_chunk(Point(x, y))
+    for x in chunks:
+        for y in chunks:
+            for _ in range(trees):
+                position = Point(x * Perlin.CHUNK_SIZE + rng.randrange(Perlin.CHUNK_SIZE), y * Perlin.CHUNK_SIZE + rng.randrange(Perlin.CHUNK_SIZE))
+                if map.place_structure(Tree(position, map.tree_chopped_callback, Orientation.NORTH)):
+                    map.trees.setdefault(Point(x, y), []).append(position)
+    return map
+
+def get_queries(map, seed, lengths, count):
+    # (start, end) cells that are not blocked, the same for a seed, a density and a length
+    rng = random.Random(seed * 1000 + lengths[0])
+    obstacles = Obstacles(map)
+    queries = []
+    while len(queries) < count:
+        start = (rng.randint(-AREA, AREA), rng.randint(-AREA, AREA))
+        length = rng.randint(*lengths)
+        angle = rng.random() * 2 * math.pi
+        end = (start[0] + round(length * math.cos(angle)), start[1] + round(length * math.sin(angle)))
+        if obstacles.is_blocked(start[0], start[1]) or obstacles.is_blocked(end[0], end[1]):
+            continue
+        queries.append((start, end))
+    return queries
+
+# Searches compared, returning the cells or None and the nodes expanded or None when they are not counted
+
+def run_astar(map, start, end, max_expansions = MAX_EXPANSIONS):
+    obstacles = Obstacles(map, "walk", get_allowed_structures(map, [start, end]))
+    astar_search = AStarSearch(start, end, obstacles, max_expansions)
+    astar_search.step(max_expansions)
+    return astar_search.result, astar_search.expansions
+
+def run_jump_point(map, start, end):
+    # Jump point search where it pays off, then A* as in the game
+    jump_bounds = get_jump_bounds(map, start, end)
+    expansions = 0
+    if jump_bounds is not None:
+        obstacles = Obstacles(map, "walk", get_allowed_structures(map, [start, end]))
+        jump_search = JumpPointSearch(start, end, obstacles, MAX_EXPANSIONS, jump_bounds)
+        jump_search.step(MAX_EXPANSIONS)
+        if jump_search.result is not None:
+            return jump_search.result, jump_search.expansions
+        expansions = jump_search.expansions
+    cells, astar_expansions = run_astar(map, start, end)
+    return cells, expansions + astar_expansions
+
+def run_chunk_graph(map, start, end):
+    # The graph of the map, built on the way by the queries as in the game
+    cells, _ = map.get_chunk_graph("walk").find_cells(start, end, get_allowed_structures(map, [start, end]))
+    return cells, None
+
+def run_map(map, start, end):
+    # The path finding of the game without its cache
+    map.path_cache.clear()
+    return map.find_path_cells(start, end), None
+
+SEARCHES = {
+    "astar": run_astar,
+    "jump_point": run_jump_point,
+    "chunk_graph": run_chunk_graph,
+    "map": run_map
+}
+
+def is_valid(obstacles, cells, start, end):
+    # Neighbor cells from start to end without blocked cells nor corner cutting
+    if cells[0] != start or cells[-1] != end:
+        return False
+    for (x1, y1), (x2, y2) in zip(cells, cells[1:]):
+        if max(abs(x2 - x1), abs(y2 - y1)) != 1 or (x2, y2) != end and obstacles.is_blocked(x2, y2):
+            return False
+        if x1 != x2 and y1 != y2 and (obstacles.is_blocked(x2, y1) or obstacles.is_blocked(x1, y2)):
+            return False
+    return True
+
+def summarize(samples, count):
+    durations = sorted(samples["durations"])
+    expansions = samples["expansions"]
+    ratios = samples["ratios"]
+    return {
+        "queries": count,
+        "solved": samples["solved"],
+        "invalid": samples["invalid"],
+        "mean_ms": sum(durations) / len(durations) * 1000,
+        "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000,
+        "mean_expansions": sum(expansions) / len(expansions) if len(expansions) > 0 else None,
+        "mean_cost_ratio": sum(ratios) / len(ratios) if len(ratios) > 0 else None, # Against the reference A*, 1 being optimal
+        "max_cost_ratio": max(ratios) if len(ratios) > 0 else None
+    }
+
+def benchmark(searches, queries_count):
+    # {search: {density: {length: summary}}}
+    samples = {name: {density: {length_name: {"durations": [], "expansions": [], "ratios": [], "solved": 0, "invalid": 0} for length_name in LENGTHS} for density in DENSITIES} for name in searches}
+    for density, trees in DENSITIES.items():
+        for seed in SEEDS:
+            map = build_map(seed, trees)
+            for length_name, lengths in LENGTHS.items():
+                for start, end in get_queries(map, seed, lengths, queries_count):
+                    obstacles = Obstacles(map, "walk", get_allowed_structures(map, [start, end]))
+                    reference, _ = run_astar(map, start, end, REFERENCE_EXPANSIONS)
+                    reference_cost = None if reference is None else get_path_cost(reference, obstacles)
+                    for name in searches:
+                        query_samples = samples[name][density][length_name]
+                        begin = time.perf_counter()
+                        cells, expansions = SEARCHES[name](map, start, end)
+                        query_samples["durations"].append(time.perf_counter() - begin)
+                        if expansions is not None:
+                            query_samples["expansions"].append(expansions)
+                        if cells is None:
+                            continue
+                        if not is_valid(obstacles, cells, start, end):
+                            query_samples["invalid"] += 1
+                            continue
+                        query_samples["solved"] += 1
+                        if reference_cost is not None and reference_cost > 0:
+                            query_samples["ratios"].append(get_path_cost(cells, obstacles) / reference_cost)
+
+    count = len(SEEDS) * queries_count
+    return {name: {density: {length_name: summarize(length_samples, count) for length_name, length_samples in density_samples.items()} for density, density_samples in search_samples.items()} for name, search_samples in samples.items()}
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results):
+    for name, densities in results.items():
+        for density, lengths in densities.items():
+            for length_name, summary in lengths.items():
+                expansions = "-" if summary["mean_expansions"] is None else f"{summary['mean_expansions']:.0f}"
+                ratio = "-" if summary["mean_cost_ratio"] is None else f"{summary['mean_cost_ratio']:.3f}"
+                print(f"{name:12} {density:5} {length_name:7} {summary['mean_ms']:8.3f} ms {expansions:>7} expansions  cost x{ratio}  solved {summary['solved']}/{summary['queries']}")
+
+def compare(results, previous):
+    # Changes against a previous run, for the entries in both
+    for name, densities in results.items():
+        for density, lengths in densities.items():
+            for length_name, summary in lengths.items():
+                old = previous.get(name, {}).get(density, {}).get(length_name, None)
+                if old is None:
+                    continue
+                line = f"{name:12} {density:5} {length_name:7} time x{summary['mean_ms'] / old['mean_ms']:.2f}"
+                if summary["mean_expansions"] is not None and old["mean_expansions"]:
+                    line += f"  expansions x{summary['mean_expansions'] / old['mean_expansions']:.2f}"
+                if summary["mean_cost_ratio"] is not None and old["mean_cost_ratio"] is not None:
+                    line += f"  cost {old['mean_cost_ratio']:.3f} -> {summary['mean_cost_ratio']:.3f}"
+                if summary["solved"] != old["solved"] or summary["invalid"] != old["invalid"]:
+                    line += f"  solved {old['solved']} -> {summary['solved']}  invalid {old['invalid']} -> {summary['invalid']}"
+                print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description = "Path finding benchmark")
+    parser.add_argument("output", nargs = "?", default = "pathBenchmark.json", help = "JSON file of the results")
+    parser.add_argument("--compare", help = "JSON file of a previous run")
+    parser.add_argument("--queries", type = int, default = QUERIES, help = "queries per seed, density and length")
+    parser.add_argument("--searches", nargs = "+", default = list(SEARCHES), choices = list(SEARCHES))
+    args = parser.parse_args()
+
+    results = benchmark(args.searches, args.queries)
+    print_results(results)
+    with open(args.output, "w") as file:
+        json.dump({"commit": get_commit(), "seeds": SEEDS, "queries": args.queries, "results": results}, file, indent = 4)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            compare(results, json.load(file)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.Structures import Tree, Orientation
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+class PathCacheTest(unittest.TestCase):
+    def test_hit(self):
+        map = create_plain_map((-2, -2), (3, 3))
+        path = map.find_path(Point(0, 0), Point(40, 5))
+        self.assertEqual(map.path_cache.misses, 1)
+
+        path[0] = Point(0, 0)
+        cached_path = map.find_path(Point(0, 0), Point(40, 5))
+        self.assertEqual(map.path_cache.hits, 1)
+        self.assertEqual(cached_path[1:], path[1:])
+        self.assertNotEqual(cached_path[0], path[0]) # Callers get their own copy
+
+    def test_invalidation(self):
+        map = create_plain_map((-2, -2), (3, 3))
+        map.find_path(Point(0, 0), Point(40, 5))
+
+        # Far from the chunks read by the search
+        map.place_structure(Tree(Point(90, 90), None, Orientation.NORTH))
+        map.find_path(Point(0, 0), Point(40, 5))
+        self.assertEqual(map.path_cache.hits, 1)
+        self.assertEqual(map.path_cache.invalidations, 0)
+
+        tree = Tree(Point(20, 2), None, Orientation.NORTH)
+        map.place_structure(tree)
+        self.assertEqual(map.path_cache.invalidations, 1)
+        path = map.find_path(Point(0, 0), Point(40, 5))
+        self.assertEqual(map.path_cache.misses, 2)
+        for point in path:
+            self.assertIsNone(map.occupancy.get(point // Map.CELL_SIZE))
+
+        map.occupancy.remove(tree)
+        self.assertEqual(map.path_cache.invalidations, 2)
+
+        map.find_path(Point(0, 0), Point(40, 5))
+        map.set_biome(Point(35, 5), Biomes.LAVA)
+        self.assertEqual(map.path_cache.invalidations, 3)
+
+    def test_unreachable(self):
+        map = create_plain_map((-2, -2), (3, 3))
+        for x in range(-1, 2):
+            for y in range(-1, 2):
+                if x != 0 or y != 0:
+                    map.set_biome(Point(20 + x, 20 + y), Biomes.LAVA)
+        self.assertIsNone(map.find_path(Point(0, 0), Point(20, 20)))
+        self.assertIsNone(map.find_path(Point(0, 0), Point(20, 20)))
+        self.assertEqual(map.path_cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
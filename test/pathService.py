@@ -0,0 +1,212 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map, Biomes
+from model.Perlin import Perlin
+from model.Human import Human
+from model.Geometry import Point
+from model.AStar import JumpPointSearch
+
+from fixtures import create_plain_map, create_human, create_game, save_and_load, wait
+
+
+class PathServiceTest(unittest.TestCase):
+    def test_deferred_path(self):
+        map = create_plain_map()
+        human = create_human(map, Point(0, 0))
+        human.set_target_location(Point(20, 5))
+        self.assertTrue(human.waiting_for_path)
+        self.assertFalse(human.update(0.5)) # Does not move while waiting
+
+        wait(map)
+        self.assertFalse(human.waiting_for_path)
+        self.assertEqual(len(human.path), 2) # Straight line once smoothed
+        self.assertTrue(human.update(0.5))
+
+        # Solved once, then taken from the path cache
+        other = create_human(map, Point(0, 0))
+        other.set_target_location(Point(20, 5))
+        self.assertEqual(len(map.path_service.requests), 0)
+        map.path_service.update()
+        self.assertFalse(other.waiting_for_path)
+        self.assertEqual(map.path_service.submitted, 1)
+
+    def test_deduplication(self):
+        map = create_plain_map()
+        humans = [create_human(map, Point(0, 0)) for _ in range(3)]
+        for human in humans:
+            human.set_target_location(Point(-30, 12))
+        self.assertEqual(map.path_service.submitted, 1)
+        self.assertEqual(map.path_service.deduplicated, 2)
+        wait(map)
+        for human in humans:
+            self.assertFalse(human.waiting_for_path)
+
+    def test_cancellation(self):
+        map = create_plain_map()
+        human = create_human(map, Point(0, 0))
+        human.set_target_location(Point(40, 40))
+        human.set_target_location(Point(-10, -10))
+        self.assertEqual(list(map.path_service.human_requests.values()), [((0, 0), (-10, -10), "walk")])
+        wait(map)
+        self.assertLessEqual(human.path[-1].distance(Point(-10, -10) * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+
+        human.set_target_location(Point(10, 10))
+        human.stop()
+        self.assertNotIn(human, map.path_service.human_requests)
+
+    def test_sliced_mode(self):
+        map = create_plain_map()
+        map.path_service.mode = "sliced"
+        map.path_service.frame_budget = 300
+        # Swamp and mountain columns around the plain crossed by the paths, too mixed for the jumps: solved by A*
+        mixed = np.where(np.arange(Perlin.CHUNK_SIZE) % 2 == 0, Biomes.SWAMP.value, Biomes.MOUNTAIN.value).astype(np.uint8)
+        for x in range(-3, 2):
+            for y in range(-1, 2):
+                if y != 0 or x in (-3, 1):
+                    map.set_chunk(Point(x, y), np.repeat(mixed[:, None], Perlin.CHUNK_SIZE, axis = 1))
+        humans = [create_human(map, Point(0, i)) for i in range(3)]
+        for i, human in enumerate(humans):
+            human.set_target_location(Point(-40, 20 + i))
+        for request in map.path_service.requests.values():
+            self.assertIsNone(request.future)
+            self.assertNotIsInstance(request.search, JumpPointSearch)
+
+        # The budget of a frame is shared between the searches
+        map.path_service.update()
+        self.assertEqual(map.path_service.expansions, 300)
+        self.assertEqual([request.search.expansions for request in map.path_service.requests.values()], [100, 100, 100])
+
+        for _ in range(200):
+            map.path_service.update()
+            if len(map.path_service.requests) == 0:
+                break
+        for human in humans:
+            self.assertFalse(human.waiting_for_path)
+            self.assertEqual(len(human.path), 2)
+        self.assertLessEqual(map.path_service.expansions, 300 * 201)
+
+    def test_sliced_stale_search(self):
+        map = create_plain_map()
+        map.path_service.mode = "sliced"
+        map.path_service.frame_budget = 10
+        map.set_biome(Point(-5, -7), Biomes.SWAMP)
+        human = create_human(map, Point(0, 0))
+        human.set_target_location(Point(10, 0))
+        map.path_service.update()
+        for y in range(-5, 6):
+            map.set_biome(Point(5, y), Biomes.LAVA)
+
+        map.path_service.update()
+        self.assertEqual(map.path_service.stale, 1)
+        map.path_service.frame_budget = 2000
+        map.path_service.update()
+        map.path_service.update()
+        self.assertFalse(human.waiting_for_path)
+        for point in human.path[1:-1]:
+            cell = point // Map.CELL_SIZE
+            self.assertFalse(cell.x == 5 and -5 <= cell.y <= 5)
+
+    def test_jump_point_search(self):
+        map = create_plain_map()
+        map.path_service.mode = "sliced"
+        human = create_human(map, Point(0, 0))
+        human.set_target_location(Point(-40, 25))
+        request = next(iter(map.path_service.requests.values()))
+        self.assertIsInstance(request.search, JumpPointSearch)
+        map.path_service.update()
+        self.assertFalse(human.waiting_for_path)
+        self.assertLess(map.path_service.expansions, 10)
+
+        # A wall longer than the area of the jump point search, the path is found by A* around it
+        for y in range(-20, 21):
+            map.set_biome(Point(5, y), Biomes.LAVA)
+        human.set_target_location(Point(10, 0))
+        for _ in range(3):
+            map.path_service.update()
+        self.assertFalse(human.waiting_for_path)
+        self.assertGreater(len(human.path), 2)
+
+    def test_stale_snapshot(self):
+        map = create_plain_map()
+        human = create_human(map, Point(0, 0))
+        human.set_target_location(Point(10, 0))
+        for request in map.path_service.requests.values():
+            request.future.result()
+        for y in range(-5, 6):
+            map.set_biome(Point(5, y), Biomes.LAVA)
+
+        map.path_service.update()
+        self.assertEqual(map.path_service.stale, 1)
+        self.assertTrue(human.waiting_for_path)
+        wait(map)
+        for point in human.path[1:-1]:
+            cell = point // Map.CELL_SIZE
+            self.assertFalse(cell.x == 5 and -5 <= cell.y <= 5)
+
+    def test_single_cache_lookup(self):
+        map = create_plain_map()
+        human = create_human(map, Point(0, 0))
+        # Too long for a snapshot read at once: deferred to the worker, missed once in the path cache
+        human.set_target_location(Point(150, 150))
+        self.assertEqual(map.path_service.submitted, 1)
+        self.assertEqual(map.path_cache.report()["misses"], 1)
+        request = next(iter(map.path_service.requests.values()))
+        self.assertIsNone(request.future)
+        self.assertGreater(len(request.unread_chunks), map.path_service.SNAPSHOT_CHUNKS_PER_UPDATE)
+
+        # The snapshot is read over several updates
+        map.path_service.update()
+        self.assertTrue(human.waiting_for_path)
+        self.assertIsNone(request.future)
+        wait(map)
+        self.assertFalse(human.waiting_for_path)
+        self.assertEqual(map.path_cache.report()["misses"], 1)
+        self.assertLessEqual(human.path[-1].distance(Point(150, 150) * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+
+    def test_sliced_long_request(self):
+        map = create_plain_map(mode = "sliced")
+        map.path_service.frame_budget = 50
+        human = create_human(map, Point(0, 0))
+        human.set_target_location(Point(150, 150))
+        self.assertEqual(map.path_service.submitted, 1)
+
+        # Its snapshot read over several updates, then searched under the budget of each frame
+        request = next(iter(map.path_service.requests.values()))
+        while request.search is None:
+            self.assertEqual(map.path_service.expansions, 0)
+            map.path_service.update()
+        self.assertEqual(map.path_service.expansions, 50)
+        self.assertTrue(human.waiting_for_path)
+        for _ in range(100):
+            if not human.waiting_for_path:
+                break
+            map.path_service.update()
+        self.assertFalse(human.waiting_for_path)
+        self.assertLessEqual(human.path[-1].distance(Point(150, 150) * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+
+    def test_saved_request(self):
+        map = create_plain_map()
+        game = create_game(map)
+        human = create_human(map, Point(0, 0), game.player)
+        map.place_human(human, human.current_location)
+        human.set_target_location(Point(20, 5))
+        self.assertTrue(human.waiting_for_path)
+
+        # Requested again when loading
+        loaded = save_and_load(game)
+        loaded_human = next(iter(loaded.map.humans))
+        self.assertTrue(loaded_human.waiting_for_path)
+        self.assertEqual(loaded.map.path_service.get_end(loaded_human), (20, 5))
+        wait(loaded.map)
+        self.assertFalse(loaded_human.waiting_for_path)
+        self.assertLessEqual(loaded_human.path[-1].distance(Point(20, 5) * Map.CELL_SIZE + Human.CELL_CENTER), Map.CELL_SIZE * 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Perlin import Perlin
+
+
+def scalar_chunk(perlin, x, y):
+    chunk = np.empty((Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE), dtype=float)
+    for xi in range(Perlin.CHUNK_SIZE):
+        for yi in range(Perlin.CHUNK_SIZE):
+            amplitude = perlin.amplitude
+            freq = 1
+            noise_height = 0
+            for _ in range(perlin.octave):
+                px = (Perlin.CHUNK_SIZE * x + xi + perlin.x_offset) / perlin.scale * freq + perlin.x_offset
+                py = (Perlin.CHUNK_SIZE * y + yi + perlin.y_offset) / perlin.scale * freq + perlin.y_offset
+                noise_height += perlin.noise(px, py) * amplitude
+                amplitude *= perlin.persistence
+                freq *= perlin.lacunarity
+            chunk[xi, yi] = noise_height
+    return chunk
+
+
+class TestVectorizedNoise(unittest.TestCase):
+    def test_chunk_matches_scalar_noise(self):
+        for parameters in [(1, 4, 2, 1, 50, 1), (7, 3, 0.5, 2.0, 20, 1.5)]:
+            perlin = Perlin(*parameters)
+            for x, y in [(0, 0), (-3, 5), (10, -7)]:
+                chunk, min_height, max_height = perlin.get_chunk(x, y)
+                expected = scalar_chunk(perlin, x, y)
+                np.testing.assert_allclose(chunk, expected, rtol=0, atol=1e-9)
+                self.assertAlmostEqual(min_height, expected.min())
+                self.assertAlmostEqual(max_height, expected.max())
+
+    def test_noise_array_matches_noise(self):
+        perlin = Perlin(3)
+        xs = np.array([-12.75, -0.5, 0.0, 3.25, 255.5, 300.125])
+        ys = np.array([4.5, -7.25, 0.0, 1.0, 99.9, -256.5])
+        expected = [perlin.noise(x, y) for x, y in zip(xs, ys)]
+        np.testing.assert_allclose(perlin.noise_array(xs, ys), expected, rtol=0, atol=1e-12)
+
+    def test_region_matches_chunks(self):
+        # A region across the negative chunk coordinates, split at the same cells as the chunks
+        region_perlin = Perlin(5, 4, 2, 1, 50, 1)
+        chunk_perlin = Perlin(5, 4, 2, 1, 50, 1)
+        region_perlin.generate_region(-3, -2, 5, 4)
+        self.assertEqual(len(region_perlin.chunks), 20)
+        for x in range(-3, 2):
+            for y in range(-2, 2):
+                chunk, min_height, max_height = region_perlin.chunks.get((x, y))
+                chunk_perlin.generate_chunk(x, y)
+                expected, expected_min, expected_max = chunk_perlin.chunks.get((x, y))
+                self.assertEqual(chunk.shape, (Perlin.CHUNK_SIZE, Perlin.CHUNK_SIZE))
+                np.testing.assert_allclose(chunk, expected, rtol=0, atol=1e-12)
+                self.assertAlmostEqual(min_height, expected_min)
+                self.assertAlmostEqual(max_height, expected_max)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.Map import Map
+from model.Human import Colon, GatherState
+from model.Player import Player
+from model.Perlin import Perlin
+from model.Structures import Tree, BaseCamp, Orientation
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+def place_tree(map, cell):
+    tree = Tree(cell, map.tree_chopped_callback, Orientation.NORTH)
+    map.place_structure(tree)
+    map.trees.setdefault(cell // Perlin.CHUNK_SIZE, []).append(cell)
+    return tree
+
+def get_searches(map):
+    # Lookups done before any search: the path cache is read for every path and nearest building
+    return map.path_cache.hits + map.path_cache.misses + map.path_service.submitted
+
+def run_trips(map, human, trips):
+    # Updates the map until the human deposited its resources a number of times
+    for _ in range(10000):
+        was_depositing = human.gather_state == GatherState.DEPOSITING
+        map.update(0.1)
+        if was_depositing and human.gather_state == GatherState.GATHERING:
+            trips -= 1
+            if trips == 0:
+                return
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_cached_route(self):
+        map = create_plain_map(mode = "sliced")
+        player = Player(lambda: None)
+        map.place_structure(BaseCamp(Point(0, 0), player, None, None))
+        tree = place_tree(map, Point(20, 5))
+        human = Colon(map, Point(3, 3) * Map.CELL_SIZE, player, None)
+        map.place_human(human, human.current_location)
+        human.set_target_location(tree.coords)
+
+        run_trips(map, human, 1)
+        self.assertIsNotNone(human.route)
+        self.assertEqual(human.route_ends, (tree.coords, Point(0, 0)))
+        start = human.route[0] // Map.CELL_SIZE # Where the human stood at the tree
+        self.assertLessEqual(max(abs(start.x - tree.coords.x), abs(start.y - tree.coords.y)), 1)
+
+        # No search nor nearest building on the next trips
+        searches = get_searches(map)
+        run_trips(map, human, 2)
+        self.assertEqual(get_searches(map), searches)
+
+        # Searched again once the occupancy changed along the route
+        place_tree(map, Point(10, 12))
+        run_trips(map, human, 1)
+        self.assertGreater(get_searches(map), searches)
+
+    def test_depleted_target(self):
+        map = create_plain_map(mode = "sliced")
+        player = Player(lambda: None)
+        map.place_structure(BaseCamp(Point(0, 0), player, None, None))
+        tree = place_tree(map, Point(12, 0))
+        human = Colon(map, Point(3, 3) * Map.CELL_SIZE, player, None)
+        map.place_human(human, human.current_location)
+        human.set_target_location(tree.coords)
+
+        run_trips(map, human, 1)
+        tree.health = 1
+        run_trips(map, human, 1)
+        self.assertIsNone(map.occupancy.get(tree.coords, None))
+        self.assertFalse(human.has_route(tree.coords))
+
+
+if __name__ == "__main__":
+    unittest.main()
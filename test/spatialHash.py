@@ -0,0 +1,116 @@
+import os
+import sys
+import unittest
+from math import hypot
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from model.SpatialHash import SpatialHash
+from model.Map import Map
+from model.Human import Colon, Soldier, HumanState, HumanWork
+from model.Player import Player
+from model.Perlin import Perlin
+from model.Structures import Tree, Orientation
+from model.Geometry import Point
+
+from fixtures import create_plain_map
+
+
+class SpatialHashTest(unittest.TestCase):
+    def test_queries(self):
+        spatial_hash = SpatialHash(4)
+        rng = np.random.default_rng(2)
+        positions = {}
+        for entity, (x, y) in enumerate(rng.integers(-50, 50, (300, 2))):
+            positions[entity] = (int(x), int(y))
+            spatial_hash.add(entity, positions[entity])
+        # Some entities move, some are removed
+        for entity in range(0, 300, 7):
+            positions[entity] = (positions[entity][0] + 13, positions[entity][1] - 9)
+            spatial_hash.move(entity, positions[entity])
+        for entity in range(0, 300, 11):
+            del positions[entity]
+            spatial_hash.remove(entity)
+        self.assertEqual(len(spatial_hash), len(positions))
+
+        self.assertEqual(sorted(spatial_hash.query_rect(-10, -5, 20, 30)), sorted(entity for entity, (x, y) in positions.items() if -10 <= x <= 20 and -5 <= y <= 30))
+        self.assertEqual(sorted(spatial_hash.query_radius(3, -7, 12.5)), sorted(entity for entity, (x, y) in positions.items() if hypot(x - 3, y + 7) <= 12.5))
+
+        for count, condition in [(1, None), (5, None), (10, lambda entity: entity % 2 == 0), (1000, None)]:
+            expected = sorted((entity for entity in positions if condition is None or condition(entity)), key = lambda entity: hypot(positions[entity][0] - 8, positions[entity][1] - 2))[:count]
+            nearest = spatial_hash.nearest(8, 2, count, condition)
+            self.assertEqual([hypot(positions[entity][0] - 8, positions[entity][1] - 2) for entity in nearest], [hypot(positions[entity][0] - 8, positions[entity][1] - 2) for entity in expected])
+        self.assertEqual(spatial_hash.nearest(500, 500, 3, None, 10), [])
+        self.assertEqual(SpatialHash().nearest(0, 0, 3), [])
+
+    def test_map_humans(self):
+        map = create_plain_map(mode = "sliced")
+        human = Colon(map, Point(0, 0), Player(None), None)
+        map.place_human(human, human.current_location)
+        other = Colon(map, Point(50, 50) * Map.CELL_SIZE, Player(None), None)
+        map.place_human(other, other.current_location)
+
+        human.set_target_location(Point(40, 3))
+        for _ in range(300):
+            map.update(0.1)
+        # The hash and the chunks follow the human without being rebuilt
+        self.assertEqual(human.cell, map.get_cell(human.current_location))
+        self.assertEqual(map.human_hash.query_radius(human.cell[0], human.cell[1], 1), [human])
+        self.assertEqual(map.human_hash.nearest(45, 45, 1), [other])
+        self.assertIn(human, map.chunk_humans[Point(human.cell[0] // Perlin.CHUNK_SIZE, human.cell[1] // Perlin.CHUNK_SIZE)])
+        self.assertEqual(sum(len(humans) for humans in map.chunk_humans.values()), 2)
+
+        map.remove_human(human)
+        self.assertNotIn(human, map.human_hash)
+        self.assertEqual(sum(len(humans) for humans in map.chunk_humans.values()), 1)
+
+    def test_fighting(self):
+        map = create_plain_map(mode = "sliced")
+        player = Player(None)
+        enemy_player = Player(None)
+        soldier = Soldier(map, Point(0, 0), player, map.remove_human)
+        friend = Colon(map, Point(1, 0) * Map.CELL_SIZE, player, map.remove_human)
+        near = Colon(map, Point(1, 1) * Map.CELL_SIZE, enemy_player, map.remove_human)
+        far = Colon(map, Point(10, 0) * Map.CELL_SIZE, enemy_player, map.remove_human)
+        for human in (soldier, friend, near, far):
+            map.place_human(human, human.current_location)
+        health = far.health
+
+        # The target is out of range: the enemy in range is fought instead, not the friend
+        soldier.state = HumanState.WORKING
+        soldier.work = HumanWork.FIGHTING
+        soldier.target_entity = far
+        soldier.update(0.1)
+        self.assertLessEqual(near.health, 0)
+        self.assertNotIn(near, map.human_hash)
+        self.assertEqual(far.health, health)
+        self.assertEqual(friend.health, health)
+        self.assertEqual(soldier.work, HumanWork.IDLE)
+
+        # Alone, the target is followed until it is in range
+        soldier.state = HumanState.WORKING
+        soldier.work = HumanWork.FIGHTING
+        soldier.target_entity = far
+        soldier.update(0.1)
+        self.assertTrue(soldier.waiting_for_path)
+        soldier.stop()
+        map.human_moved(far, (2, 0))
+        soldier.state = HumanState.WORKING
+        soldier.work = HumanWork.FIGHTING
+        soldier.update(0.1)
+        self.assertLessEqual(far.health, 0)
+        self.assertEqual(friend.health, health)
+
+    def test_map_structures(self):
+        map = create_plain_map(mode = "sliced")
+        tree = Tree(Point(10, 10), map.tree_chopped_callback, Orientation.NORTH)
+        map.place_structure(tree)
+        self.assertEqual(map.structure_hash.query_rect(9, 9, 11, 11), [tree])
+        map.occupancy.remove(tree)
+        self.assertEqual(map.structure_hash.query_rect(9, 9, 11, 11), [])
+
+
+if __name__ == "__main__":
+    unittest.main()